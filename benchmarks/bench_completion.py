@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for the aiofut completion stream.
+
+Runs a large number of trivial tasks through the completion primitive and
+reports the time per task, so that the per-task overhead of the primitive,
+rather than the work itself, is measured.  Each task is keyed by a record,
+and the record is obtained for each completed task as the commands do.
+
+The "--legacy" option includes the prior as_completed implementation, which
+wrapped each task in a second future, passed the wrappers to the builtin
+asyncio.as_completed, and used a dictionary lookup of the task coroutine to
+obtain the record, for comparison.
+
+Usage:
+    python benchmarks/bench_completion.py [--legacy] [--tasks 100000]
+"""
+
+import argparse
+import asyncio
+from time import perf_counter
+
+from netcfgbu.aiofut import iter_completed
+
+
+async def work(value):
+    return value
+
+
+async def legacy_as_completed(aws):
+    loop = asyncio.get_running_loop()
+
+    def wrap_coro(coro):
+        fut = asyncio.ensure_future(coro)
+        wrapper = loop.create_future()
+        fut.add_done_callback(wrapper.set_result)
+        return wrapper
+
+    for next_completed in asyncio.as_completed([wrap_coro(coro) for coro in aws]):
+        yield await next_completed
+
+
+async def run_legacy(records):
+    tasks = {work(i): rec for i, rec in enumerate(records)}
+    count = 0
+    async for task in legacy_as_completed(tasks):
+        rec = tasks[task.get_coro()]
+        count += rec is not None
+    return count
+
+
+async def run_stream(records):
+    count = 0
+    async for rec, task in iter_completed(
+        (rec, work(i)) for i, rec in enumerate(records)
+    ):
+        count += rec is not None
+    return count
+
+
+def bench(name, run_fn, n_tasks):
+    records = [dict(host=f"switch{i}") for i in range(n_tasks)]
+    loop = asyncio.new_event_loop()
+    t_start = perf_counter()
+    count = loop.run_until_complete(run_fn(records))
+    elapsed = perf_counter() - t_start
+    loop.close()
+
+    assert count == n_tasks
+    print(
+        f"{name:>8}: {n_tasks:>7} tasks {elapsed:8.3f}s "
+        f"{elapsed / n_tasks * 1e6:8.2f} us/task"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--legacy", action="store_true", help="include legacy")
+    parser.add_argument("--tasks", type=int, default=100_000, help="task count")
+    opts = parser.parse_args()
+
+    bench("stream", run_stream, opts.tasks)
+    if opts.legacy:
+        bench("legacy", run_legacy, opts.tasks)
+
+
+if __name__ == "__main__":
+    main()
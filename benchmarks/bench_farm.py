@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+Load benchmark of the netcfgbu commands against the simulated device farm.
+
+Starts the device farm (see netcfgbu.simulator) in a background thread, writes
+the inventory and configuration file for the farm into a temporary directory,
+and runs each of the `probe`, `login`, and `backup` commands as a separate
+process.  For each command the report shows the hosts per second, the p99 of
+the device connection duration, as measured by the devices, and the peak RSS
+of the command process.
+
+Usage:
+    python benchmarks/bench_farm.py [--devices 1000] [--config-size 64k]
+        [--commands probe,login,backup] [--sessions 500] [--batch 100]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from time import perf_counter
+
+from netcfgbu.simulator import (
+    DeviceFarm,
+    make_devices,
+    parse_size,
+    FARM_USERNAME,
+    FARM_PASSWORD,
+)
+from netcfgbu.timing import percentile
+
+CONFIG_TEMPLATE = """
+[defaults]
+    inventory = "{workdir}/inventory.csv"
+    configs_dir = "{workdir}/configs"
+    state_dir = "{workdir}/state"
+    credentials.username = "{username}"
+    credentials.password = "{password}"
+
+[ssh_configs]
+    port = {port}
+
+[concurrency]
+    max_sessions = {sessions}
+    max_startups = {batch}
+
+[os_name.ios]
+    pre_get_config = "terminal length 0"
+    linter = "ios"
+
+[os_name.nxos]
+    get_config = 'show running-config | no-more'
+
+[os_name.junos]
+    pre_get_config = "set cli screen-length 0"
+    get_config = "show configuration | display set"
+
+[linters.ios]
+    config_starts_after = 'Current configuration'
+"""
+
+NETCFGBU_MAIN = "from netcfgbu.cli import main; main.run()"
+
+
+def start_farm(farm: DeviceFarm) -> asyncio.AbstractEventLoop:
+    """ Run the farm in its own event loop, in a background thread """
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(farm.start())
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return loop
+
+
+def run_command(command, config_file, workdir):
+    """
+    Run the netcfgbu command as a child process; returns the elapsed time, the
+    exit status, and the peak RSS of the child in MB.
+    """
+    env = dict(os.environ, PWD=str(workdir))
+    t_start = perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", NETCFGBU_MAIN, command, "-C", str(config_file)],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = (
+        os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+    )
+    elapsed = perf_counter() - t_start
+
+    # ru_maxrss is in KB on Linux.
+    return elapsed, proc.returncode, rusage.ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--devices", type=int, default=1000, help="device count")
+    parser.add_argument("--port", type=int, default=2222, help="device SSH port")
+    parser.add_argument("--os-name", default="ios,eos", help="device os_names")
+    parser.add_argument("--config-size", default="64k", help="configuration size")
+    parser.add_argument("--latency", type=float, default=0.0, help="latency (s)")
+    parser.add_argument("--bandwidth", help="output bandwidth per device")
+    parser.add_argument("--auth-fail", type=float, default=0.0, help="auth failures")
+    parser.add_argument("--hang", type=float, default=0.0, help="hung devices")
+    parser.add_argument("--commands", default="probe,login,backup", help="commands")
+    parser.add_argument("--sessions", type=int, default=500, help="max sessions")
+    parser.add_argument("--batch", type=int, default=100, help="max startups")
+    opts = parser.parse_args()
+
+    devices = make_devices(
+        count=opts.devices,
+        os_names=opts.os_name.split(","),
+        config_size=parse_size(opts.config_size),
+        latency=opts.latency,
+        bandwidth=parse_size(opts.bandwidth) if opts.bandwidth else None,
+        auth_fail=opts.auth_fail,
+        hang=opts.hang,
+    )
+
+    farm = DeviceFarm(devices, port=opts.port)
+    loop = start_farm(farm)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = Path(workdir)
+        farm.write_inventory(workdir / "inventory.csv")
+        config_file = workdir / "netcfgbu.toml"
+        config_file.write_text(
+            CONFIG_TEMPLATE.format(
+                workdir=workdir,
+                username=FARM_USERNAME,
+                password=FARM_PASSWORD,
+                port=farm.port,
+                sessions=opts.sessions,
+                batch=opts.batch,
+            )
+        )
+
+        print(
+            f"{'command':>8} {'hosts':>7} {'seconds':>9} {'hosts/s':>9} "
+            f"{'p99 (s)':>9} {'RSS (MB)':>9} {'status':>6}"
+        )
+
+        for command in opts.commands.split(","):
+            farm.stats.reset()
+            elapsed, status, rss_mb = run_command(command, config_file, workdir)
+            connections = sorted(farm.stats.connections)
+            print(
+                f"{command:>8} {opts.devices:>7} {elapsed:9.3f} "
+                f"{opts.devices / elapsed:9.1f} {percentile(connections, 99):9.3f} "
+                f"{rss_mb:9.1f} {status:>6}"
+            )
+
+    asyncio.run_coroutine_threadsafe(farm.stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == "__main__":
+    main()
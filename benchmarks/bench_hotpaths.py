@@ -0,0 +1,382 @@
+#!/usr/bin/env python
+"""
+Benchmark suite of the netcfgbu hot paths, with regression thresholds.
+
+Each case prepares its input once, and then times a number of rounds of the
+hot path, with the garbage collector disabled; a short hot path is called as
+many times in each round as needed for the round to take at least 0.2s.  The
+min, median, mean, and max of the time per call are reported.
+
+The cases are:
+
+    create_filter        filter a 100k row inventory by os_name and ipaddr
+    csv_load             load a 100k row inventory with CommentedCsvReader
+    inventory_load       load a 100k row Inventory, and filter it as create_filter
+    inventory_cache      load a 100k row Inventory from the warm inventory cache
+    lint_content         lint an 8 MB configuration
+    read_until_prompt    read a 16 MB output, in 8 KB chunks, to the prompt
+    init_jumphosts       select 200 jump host specs for a 10k row inventory
+    print_report         print the report of 10k failed hosts
+
+The "run" command saves the results as a JSON baseline; the "compare" command
+runs the suite, or loads the results of a prior run, and exits with status 1
+when any case is slower than the baseline by more than the threshold percent.
+
+Usage:
+    python benchmarks/bench_hotpaths.py run [--save .benchmarks/hotpaths.json]
+    python benchmarks/bench_hotpaths.py compare [--baseline FILE]
+        [--current FILE] [--threshold 10] [--stat min]
+
+    both commands accept [--rounds 5] [--filter lint,csv]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+
+from bench_read_until_prompt import make_connector, make_content
+
+from netcfgbu import jumphosts
+from netcfgbu.cli.report import Report
+from netcfgbu.config_model import JumphostSpec, LinterSpec
+from netcfgbu.connectors import BasicSSHConnector
+from netcfgbu.filetypes import CommentedCsvReader
+from netcfgbu.filtering import create_filter
+from netcfgbu.inventory import Inventory, load_inventory_file
+from netcfgbu.linter import lint_content
+
+DEFAULT_BASELINE = ".benchmarks/hotpaths.json"
+STATS = ("min", "median", "mean", "max")
+MIN_ROUND_TIME = 0.2
+OS_NAMES = ("ios", "eos", "nxos", "iosxr", "junos")
+
+CASES = dict()
+
+
+def case(name):
+    """
+    Register the benchmark case; the decorated function prepares the input,
+    and returns the function that is timed for each round.
+    """
+
+    def decorator(setup_fn):
+        CASES[name] = setup_fn
+        return setup_fn
+
+    return decorator
+
+
+def make_inventory(count: int):
+    return [
+        dict(
+            host=f"switch{i}",
+            ipaddr=f"10.{i // 65536}.{i // 256 % 256}.{i % 256}",
+            os_name=OS_NAMES[i % len(OS_NAMES)],
+            site=f"site{i % 100}",
+        )
+        for i in range(count)
+    ]
+
+
+# -----------------------------------------------------------------------------
+#                                 Cases
+# -----------------------------------------------------------------------------
+
+
+@case("create_filter")
+def bench_create_filter(workdir: Path):
+    inventory = make_inventory(100_000)
+    field_names = list(inventory[0])
+
+    def run():
+        filter_fn = create_filter(
+            constraints=["os_name=eos|nxos", "ipaddr=10.0.0.0/16"],
+            field_names=field_names,
+            include=True,
+        )
+        return sum(1 for rec in inventory if filter_fn(rec))
+
+    return run
+
+
+@case("csv_load")
+def bench_csv_load(workdir: Path):
+    filepath = workdir / "inventory.csv"
+    inventory = make_inventory(100_000)
+
+    with filepath.open("w") as ofile:
+        wr_csv = csv.DictWriter(ofile, fieldnames=list(inventory[0]))
+        wr_csv.writeheader()
+        for i, rec in enumerate(inventory):
+            if i % 1000 == 0:
+                ofile.write(f"# region {i // 1000}\n")
+            wr_csv.writerow(rec)
+
+    def run():
+        with filepath.open() as ifile:
+            return len(list(CommentedCsvReader(ifile)))
+
+    return run
+
+
+@case("inventory_load")
+def bench_inventory_load(workdir: Path):
+    filepath = workdir / "inventory.csv"
+    with filepath.open("w") as ofile:
+        wr_csv = csv.DictWriter(ofile, fieldnames=list(make_inventory(1)[0]))
+        wr_csv.writeheader()
+        wr_csv.writerows(make_inventory(100_000))
+
+    def run():
+        with filepath.open() as ifile:
+            inventory = Inventory.from_csv(ifile)
+        return len(inventory.select(["os_name=eos|nxos", "ipaddr=10.0.0.0/16"]))
+
+    return run
+
+
+@case("inventory_cache")
+def bench_inventory_cache(workdir: Path):
+    filepath = workdir / "inventory.csv"
+    with filepath.open("w") as ofile:
+        wr_csv = csv.DictWriter(ofile, fieldnames=list(make_inventory(1)[0]))
+        wr_csv.writeheader()
+        wr_csv.writerows(make_inventory(100_000))
+
+    load_inventory_file(filepath, workdir)
+
+    def run():
+        return len(load_inventory_file(filepath, workdir))
+
+    return run
+
+
+@case("lint_content")
+def bench_lint_content(workdir: Path):
+    content = (
+        "Building configuration...\n\nCurrent configuration : 8388608 bytes\n!\n"
+        + make_content(8).decode().replace("\r\n", "\n")
+        + "end\n"
+    )
+    lint_spec = LinterSpec(
+        config_starts_after="Current configuration", config_ends_at="end"
+    )
+
+    def run():
+        return len(lint_content(content, lint_spec))
+
+    return run
+
+
+@case("read_until_prompt")
+def bench_read_until_prompt(workdir: Path):
+    content = make_content(16)
+    loop = asyncio.new_event_loop()
+
+    def run():
+        conn = make_connector(content)
+        return len(loop.run_until_complete(BasicSSHConnector.read_until_prompt(conn)))
+
+    return run
+
+
+@case("init_jumphosts")
+def bench_init_jumphosts(workdir: Path):
+    inventory = make_inventory(10_000)
+    specs = [
+        JumphostSpec(
+            proxy=f"jumper@jh{i}.example.com:22",
+            include=[f"site=site{i % 100}$", f"ipaddr=10.0.{i}.0/24"],
+            exclude=["os_name=junos"],
+        )
+        for i in range(200)
+    ]
+
+    def run():
+        jumphosts.init_jumphosts(jumphost_specs=specs, inventory=inventory)
+        return len(jumphosts.JumpHost.available)
+
+    return run
+
+
+@case("print_report")
+def bench_print_report(workdir: Path):
+    report = Report()
+    report.start_timing()
+    report.stop_timing()
+    report.task_results[False] = [
+        (rec, asyncio.TimeoutError("Timeout awaiting prompt"))
+        for rec in make_inventory(10_000)
+    ]
+
+    def run():
+        # the report writes the failures.csv file into the current directory.
+
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                report.print_report()
+        finally:
+            os.chdir(cwd)
+
+        return len(output.getvalue())
+
+    return run
+
+
+# -----------------------------------------------------------------------------
+#                              Run & Compare
+# -----------------------------------------------------------------------------
+
+
+def time_round(run, number: int) -> float:
+    """ Returns the duration of one call, averaged over the round """
+    gc.collect()
+    gc.disable()
+    try:
+        t_start = perf_counter()
+        for _ in range(number):
+            run()
+        return (perf_counter() - t_start) / number
+    finally:
+        gc.enable()
+
+
+def calibrate(run) -> int:
+    """
+    Returns the number of calls in each round, so that each round takes at
+    least MIN_ROUND_TIME, as does timeit.
+    """
+    number = 1
+    while time_round(run, number) * number < MIN_ROUND_TIME:
+        number *= 2
+    return number
+
+
+def run_suite(rounds: int, names):
+    results = dict()
+
+    print(f"{'case':<20}" + "".join(f"{stat + '(s)':>12}" for stat in STATS))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            run = CASES[name](Path(workdir))
+
+            # the first call is not timed, so that the lazy initialization,
+            # such as the regular expression cache, is not measured.
+
+            run()
+            number = calibrate(run)
+            durations = [time_round(run, number) for _ in range(rounds)]
+
+            results[name] = dict(
+                rounds=rounds,
+                number=number,
+                min=min(durations),
+                median=statistics.median(durations),
+                mean=statistics.mean(durations),
+                max=max(durations),
+            )
+            print(
+                f"{name:<20}"
+                + "".join(f"{results[name][stat]:>12.4f}" for stat in STATS)
+            )
+
+    return dict(
+        created=datetime.now().isoformat(timespec="seconds"),
+        python=platform.python_version(),
+        machine=platform.platform(),
+        benchmarks=results,
+    )
+
+
+def compare(baseline: dict, current: dict, threshold: float, stat: str) -> bool:
+    """
+    Print the comparison of the current results to the baseline; returns False
+    if any case regressed by more than the threshold percent.
+    """
+    ok = True
+
+    print(f"\n{'case':<20}{'baseline(s)':>12}{'current(s)':>12}{'change':>9}  result")
+
+    for name, results in current["benchmarks"].items():
+        if (base_results := baseline["benchmarks"].get(name)) is None:
+            print(f"{name:<20}{'':>12}{results[stat]:>12.4f}{'':>9}  NEW")
+            continue
+
+        change = (results[stat] - base_results[stat]) / base_results[stat] * 100
+        regressed = change > threshold
+        ok = ok and not regressed
+        print(
+            f"{name:<20}{base_results[stat]:>12.4f}{results[stat]:>12.4f}"
+            f"{change:>+8.1f}%  {'REGRESSED' if regressed else 'OK'}"
+        )
+
+    print(
+        f"\nbaseline: {baseline['created']} python {baseline['python']} "
+        f"on {baseline['machine']}"
+    )
+
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the suite")
+    run_parser.add_argument("--save", help="save the results to the JSON file")
+
+    cmp_parser = commands.add_parser("compare", help="compare to the baseline")
+    cmp_parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline")
+    cmp_parser.add_argument("--current", help="results to compare, instead of a run")
+    cmp_parser.add_argument(
+        "--threshold", type=float, default=10.0, help="regression percent"
+    )
+    cmp_parser.add_argument("--stat", choices=STATS, default="min", help="statistic")
+
+    for cmd_parser in (run_parser, cmp_parser):
+        cmd_parser.add_argument("--rounds", type=int, default=5, help="round count")
+        cmd_parser.add_argument("--filter", help="comma separated case names")
+
+    opts = parser.parse_args()
+
+    names = list(CASES)
+    if opts.filter:
+        patterns = opts.filter.split(",")
+        names = [name for name in names if any(pat in name for pat in patterns)]
+
+    if opts.command == "run":
+        results = run_suite(opts.rounds, names)
+        if opts.save:
+            filepath = Path(opts.save)
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+            filepath.write_text(json.dumps(results, indent=2))
+        return
+
+    baseline = json.loads(Path(opts.baseline).read_text())
+
+    if opts.current:
+        current = json.loads(Path(opts.current).read_text())
+    else:
+        current = run_suite(opts.rounds, names)
+
+    if not compare(baseline, current, opts.threshold, opts.stat):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+Benchmark of the bulk probe engine sweeping a large number of hosts.
+
+The hosts are loopback addresses, 127.2.0.0/16 and up, so that no network is
+needed; by default no process listens on the port, and each probe is
+refused.  The "--open" option starts a listener on all addresses that
+accepts and closes each connection, so that each probe succeeds.  For each
+implementation the report shows the hosts per second and the peak number of
+open file descriptors of the process.
+
+The "--legacy" option includes the prior implementation, which ran a task
+for each host that called loop.create_connection and did not close the
+transport, for comparison.
+
+Usage:
+    python benchmarks/bench_probe.py [--hosts 100000] [--open] [--legacy]
+        [--max-inflight 1000] [--rate 50000]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import threading
+from ipaddress import IPv4Address
+from time import perf_counter
+
+from netcfgbu.aiofut import iter_completed
+from netcfgbu.probe import BulkProbe
+from netcfgbu.simulator import raise_nofile_limit
+
+FIRST_ADDRESS = IPv4Address("127.2.0.0")
+
+
+def count_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+def start_listener(port: int):
+    """ Accept and close the connections in a background thread """
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(("0.0.0.0", port))
+    listener.listen(4096)
+
+    def accept():
+        while True:
+            conn, _ = listener.accept()
+            conn.close()
+
+    threading.Thread(target=accept, daemon=True).start()
+
+
+async def sample_fds(peak: list):
+    while True:
+        peak[0] = max(peak[0], count_fds())
+        await asyncio.sleep(0.01)
+
+
+async def run_bulk(hosts, port, opts):
+    prober = BulkProbe(timeout=5, rate=opts.rate, max_inflight=opts.max_inflight)
+    targets = ((host, host, port) for host in hosts)
+    return [res async for _, res in prober.run(targets)]
+
+
+async def run_legacy(hosts, port, opts):
+    loop = asyncio.get_running_loop()
+
+    async def legacy_probe(host):
+        coro = loop.create_connection(asyncio.BaseProtocol, host=host, port=port)
+        try:
+            await asyncio.wait_for(coro, timeout=5)
+            return True
+        except (asyncio.TimeoutError, OSError) as exc:
+            return exc
+
+    return [
+        task.result()
+        async for _, task in iter_completed(
+            (host, legacy_probe(host)) for host in hosts
+        )
+    ]
+
+
+def bench(name, run_fn, hosts, port, opts):
+    async def run():
+        peak = [count_fds()]
+        sampler = asyncio.ensure_future(sample_fds(peak))
+        try:
+            return await run_fn(hosts, port, opts), peak[0]
+        finally:
+            sampler.cancel()
+
+    loop = asyncio.new_event_loop()
+    t_start = perf_counter()
+    results, peak_fds = loop.run_until_complete(run())
+    elapsed = perf_counter() - t_start
+    loop.close()
+
+    ok_n = sum(1 for res in results if res is True)
+    print(
+        f"{name:>8}: {len(hosts):>7} hosts {elapsed:8.3f}s "
+        f"{len(hosts) / elapsed:10.1f} hosts/s  ok={ok_n}  peak-fds={peak_fds}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hosts", type=int, default=100_000, help="host count")
+    parser.add_argument("--port", type=int, default=2322, help="probe port")
+    parser.add_argument("--open", action="store_true", help="listen on the port")
+    parser.add_argument("--legacy", action="store_true", help="include legacy")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="max sockets")
+    parser.add_argument("--rate", type=float, help="probes per second")
+    opts = parser.parse_args()
+
+    hosts = [str(FIRST_ADDRESS + i) for i in range(opts.hosts)]
+
+    # the legacy implementation opens a socket for every host.
+
+    raise_nofile_limit(opts.hosts + 1024 if opts.legacy else opts.max_inflight + 1024)
+
+    if opts.open:
+        start_listener(opts.port)
+
+    bench("bulk", run_bulk, hosts, opts.port, opts)
+    if opts.legacy:
+        bench("legacy", run_legacy, hosts, opts.port, opts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for BasicSSHConnector.read_until_prompt.
+
+Feeds a multi-megabyte configuration, in 8 KB chunks, followed by the CLI
+prompt, and reports the time to find the prompt for increasing content sizes.
+The time per MB should remain constant as the content size grows, showing that
+the prompt scan is linear in the size of the output.
+
+The "--legacy" option includes the prior implementation, which accumulated
+the output into a bytes object and scanned the entire output on each read,
+for comparison.
+
+Usage:
+    python benchmarks/bench_read_until_prompt.py [--legacy] [--sizes 1,2,4,8,16]
+"""
+
+import argparse
+import asyncio
+import io
+from time import perf_counter
+from unittest.mock import Mock
+
+from netcfgbu.connectors import BasicSSHConnector
+
+CHUNK_SIZE = 8 * 1024
+PROMPT = b"switch1#"
+
+
+def make_content(size_mb: int) -> bytes:
+    line = b" description this is a sample configuration line for testing\r\n"
+    return line * (size_mb * 1024 * 1024 // len(line))
+
+
+def make_connector(content: bytes) -> BasicSSHConnector:
+    feed = content + PROMPT
+    offset = 0
+
+    async def read(_n):
+        nonlocal offset
+        chunk = feed[offset : offset + CHUNK_SIZE]
+        offset += CHUNK_SIZE
+        return chunk
+
+    # avoid the __init__ that requires application configuration; only the
+    # attributes used by read_until_prompt are needed.
+
+    conn = BasicSSHConnector.__new__(BasicSSHConnector)
+    conn.process = Mock()
+    conn.process.stdout.read = read
+    return conn
+
+
+async def legacy_read_until_prompt(self):
+    output = b""
+    while True:
+        output += await self.process.stdout.read(io.DEFAULT_BUFFER_SIZE)
+        nl_at = output.rfind(b"\n")
+        if mobj := self.PROMPT_PATTERN.match(output[nl_at + 1 :]):
+            self._cur_prompt = mobj.group(1)
+            return output[0:nl_at]
+
+
+def run_one(read_fn, content: bytes) -> float:
+    conn = make_connector(content)
+    loop = asyncio.get_event_loop()
+    start = perf_counter()
+    output = loop.run_until_complete(read_fn(conn))
+    duration = perf_counter() - start
+    assert len(output) == len(content) - 1
+    return duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--legacy", action="store_true", help="include legacy")
+    parser.add_argument("--sizes", default="1,2,4,8,16", help="content sizes in MB")
+    opts = parser.parse_args()
+
+    impls = [("read_until_prompt", BasicSSHConnector.read_until_prompt)]
+    if opts.legacy:
+        impls.append(("legacy", legacy_read_until_prompt))
+
+    print(f"{'impl':<20}{'size(MB)':>10}{'time(s)':>12}{'ms/MB':>10}")
+    for name, read_fn in impls:
+        for size_mb in map(int, opts.sizes.split(",")):
+            duration = run_one(read_fn, make_content(size_mb))
+            print(
+                f"{name:<20}{size_mb:>10}{duration:>12.4f}"
+                f"{duration * 1000 / size_mb:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
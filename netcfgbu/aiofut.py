@@ -1,88 +1,202 @@
-from typing import AsyncIterable, Iterable, Coroutine, Optional
+from typing import (
+    AsyncIterable,
+    Iterable,
+    Coroutine,
+    Optional,
+    Tuple,
+    Any,
+    Union,
+)
+from collections import deque
 import asyncio
 from asyncio import Task
 
-__all__ = ["as_completed"]
+__all__ = ["as_completed", "iter_completed"]
 
 
-async def as_completed(
-    aws: Iterable[Coroutine], timeout: Optional[int] = None
-) -> AsyncIterable[Task]:
+async def iter_completed(
+    work: Union[Iterable[Tuple[Any, Coroutine]], AsyncIterable[Tuple[Any, Coroutine]]],
+    timeout: Optional[float] = None,
+    max_inflight: Optional[int] = None,
+) -> AsyncIterable[Tuple[Any, Task]]:
     """
-    This async generator is used to "mimic" the behavior of the
-    concurrent.futures.as_completed functionality. Usage of this as_completed
-    generator is slightly different from the builtin asyncio version; see
-    example below.
+    This async generator runs each coroutine as a task and yields the tuple
+    (key, task) as each task completes; where the key is the value given with
+    the coroutine, for example the inventory record.
 
-    The builtin asyncio.as_completed yields futures such that the originating
-    coroutine can not be retrieved.  In order to obtain the originating
-    coroutine these must be wrapped in futures as explained in this Stack
-    Overflow: https://bit.ly/2AsPtJE
+    Each task has a done-callback that appends the (key, task) to the ready
+    queue and wakes the generator, so there is no per-task wrapper future and
+    no need to map the task back to the key.
 
     Parameters
     ----------
-    aws:
-        An interable of coroutines that will be wrapped into futures and
-        executed through the asyncio on_completed builtin.
+    work:
+        An iterable, or async iterable, of (key, coroutine) pairs.  When an
+        async iterable is given, the tasks are started as the work is
+        produced, so that the completed tasks are yielded before all of the
+        work exists.
 
-    timeout: int
-        (same as asyncio.as_completed):
-        If provided an asyncio.TimeoutError will be raised if all of the
-        coroutines have not completed within the timeout value.
+    timeout:
+        If provided, the deadline in seconds for all of the tasks to complete.
+        When the deadline expires the pending tasks are cancelled and an
+        asyncio.TimeoutError is raised.
+
+    max_inflight:
+        If provided, the maximum number of tasks running at the same time;
+        the next work item is taken from the work only as a task completes.
 
     Yields
     ------
-    asyncio.Task
-
-    Examples:
-    ---------
+    Tuple[key, asyncio.Task]
 
-        # create a dictionary of key=coroutine, value=dict, where the value will
-        # be used later when the coroutine completes
+    Examples
+    --------
 
-        tasks = {
-            probe(rec.get('ipaddr') or rec.get('host')): rec
+        work = (
+            (rec, probe(rec.get('ipaddr') or rec.get('host')))
             for rec in inventory
-        }
+        )
 
-        async for probe_task in as_completed(tasks):
+        async for rec, probe_task in iter_completed(work):
             try:
-                # obtain the originating coroutine so we can use it as an index
-                # into the tasks dictionary and obtain the associated inventory
-                # record
-
-                task_coro = probe_task.get_coro()
-                rec = tasks[task_coro]
-
-                # now obtain the coroutine return value using the `result`
-                # method.
-
                 probe_ok = 'OK' if probe_task.result() else 'FAIL'
-                report[probe_ok].append(rec)
-
             except OSError as exc:
                 probe_ok = 'ERROR'
-                report['ERROR'].append((rec, exc))
 
             print(f"{rec['host']}: {probe_ok}")
+
+    Notes
+    -----
+    If the Caller stops iterating, for example breaks out of the loop or is
+    cancelled, or the work raises an exception, the pending tasks are
+    cancelled.
     """
     loop = asyncio.get_running_loop()
 
-    # The main gist is to "wrap" the coroutine into
-    # "[futureW[futureO[coroutine]]]" where the outer futureW is what is handed
-    # into the builtin asyncio.as_completed.  The inner futureO that wraps the
-    # originating coroutine will call the futureW.set_result() when the
-    # original futureO[coroutine] completes.  The call to set_result triggers
-    # the event causing the futureW to be done, which is what results in the
-    # builtin on_completed to yield the results.
-
-    def wrap_coro(coro):
-        fut = asyncio.ensure_future(coro)
-        wrapper = loop.create_future()
-        fut.add_done_callback(wrapper.set_result)
-        return wrapper
-
-    for next_completed in asyncio.as_completed(
-        [wrap_coro(coro) for coro in aws], timeout=timeout
-    ):
-        yield await next_completed
+    ready = deque()
+    pending = set()
+    waiter: Optional[asyncio.Future] = None
+    feeding = True
+    feed_exc: Optional[BaseException] = None
+    expired = False
+    slot_free = asyncio.Event()
+
+    def wakeup():
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def is_full():
+        return max_inflight and len(pending) >= max_inflight
+
+    def start(key, coro):
+        task = loop.create_task(coro)
+        pending.add(task)
+
+        def on_done(_task):
+            pending.discard(_task)
+            ready.append((key, _task))
+            slot_free.set()
+            wakeup()
+
+        task.add_done_callback(on_done)
+
+    async def feed():
+        nonlocal feeding, feed_exc
+        try:
+            async for key, coro in work:
+                start(key, coro)
+                while is_full():
+                    slot_free.clear()
+                    await slot_free.wait()
+        except Exception as exc:
+            feed_exc = exc
+        finally:
+            feeding = False
+            wakeup()
+
+    def fill():
+        nonlocal feeding
+        while feeding and not is_full():
+            if (item := next(iter_work, None)) is None:
+                feeding = False
+            else:
+                start(*item)
+
+    def on_deadline():
+        nonlocal expired
+        expired = True
+        wakeup()
+
+    feeder = None
+    deadline = None
+    iter_work = None
+
+    if timeout is not None:
+        deadline = loop.call_later(timeout, on_deadline)
+
+    # the tasks of an iterable are started by the generator, within the try,
+    # so that the tasks are cancelled if the iterable raises an exception.
+
+    try:
+        if hasattr(work, "__aiter__"):
+            feeder = loop.create_task(feed())
+        else:
+            iter_work = iter(work)
+
+        while True:
+            if iter_work is not None and not expired:
+                fill()
+
+            while ready:
+                yield ready.popleft()
+
+            if feed_exc is not None:
+                raise feed_exc
+
+            if not (feeding or pending):
+                return
+
+            if expired:
+                raise asyncio.TimeoutError()
+
+            waiter = loop.create_future()
+            await waiter
+            waiter = None
+
+    finally:
+        if deadline:
+            deadline.cancel()
+
+        if feeder and not feeder.done():
+            feeder.cancel()
+
+        for task in pending:
+            task.cancel()
+
+
+async def as_completed(
+    aws: Iterable[Coroutine], timeout: Optional[int] = None
+) -> AsyncIterable[Task]:
+    """
+    This async generator is used to "mimic" the behavior of the
+    concurrent.futures.as_completed functionality, yielding each task as it
+    completes.  The originating coroutine can be obtained using the task
+    `get_coro()` method.  New code should use `iter_completed`, which yields
+    the key given with each coroutine along with the task.
+
+    Parameters
+    ----------
+    aws:
+        An interable of coroutines that will be executed as tasks.
+
+    timeout: int
+        (same as asyncio.as_completed):
+        If provided an asyncio.TimeoutError will be raised if all of the
+        coroutines have not completed within the timeout value.
+
+    Yields
+    ------
+    asyncio.Task
+    """
+    async for _, task in iter_completed(((None, coro) for coro in aws), timeout):
+        yield task
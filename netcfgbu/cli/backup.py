@@ -1,76 +1,903 @@
+from collections import Counter
+from collections.abc import Sized
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from itertools import chain
 import asyncio
+import math
+import multiprocessing
+import os
+import queue
+import socket
+import time
+import zlib
 
 import click
 
-from netcfgbu.os_specs import make_host_connector
-from netcfgbu.logger import get_logger, stop_aiologging
-from netcfgbu.aiofut import as_completed
+from netcfgbu.os_specs import make_host_connector, get_ssh_port
+from netcfgbu.probe import probe
+from netcfgbu.connectors import set_concurrency
+from netcfgbu.logger import setup_logging, get_logger, stop_aiologging
+from netcfgbu.scheduler import Scheduler, make_group_limits
 from netcfgbu import jumphosts
+from netcfgbu import credhints
+from netcfgbu import savefile
+from netcfgbu import reachability
+from netcfgbu import resolver
+from netcfgbu.runstate import RunStateStore
+from netcfgbu.retry import make_retry_fn
+from netcfgbu.workqueue import get_workqueue
+from netcfgbu.timing import TimingStats, PhaseTimer
+from netcfgbu.metrics import (
+    BackupMetrics,
+    RelayMetrics,
+    WorkerMetrics,
+    MetricsExporter,
+)
+from netcfgbu.vcs import git
 from netcfgbu.plugins import Plugin, load_plugins
 
 from .root import (
     cli,
     WithInventoryCommand,
+    get_spec_nameorfirst,
     opt_config_file,
     opts_inventory,
     opt_batch,
+    opt_sessions,
+    opt_resume,
+    opt_only_failed,
+    opt_workers,
+    opt_deadline,
     opt_debug_ssh,
+    opt_stream,
 )
 
-from .report import Report
+from .report import Report, err_reason
+
+# the stages of the backup of a host, used by the run pipeline command to
+# report the stage at which each host failed.
+
+STAGE_PROBE = "probe"
+STAGE_LOGIN = "login"
+STAGE_GET_CONFIG = "get_config"
+STAGES = (STAGE_PROBE, STAGE_LOGIN, STAGE_GET_CONFIG)
+
+
+def select_inventory(runs, inventory_recs, resume=None, only_failed=False):
+    """
+    Returns the inventory records to backup; when resuming a run, the hosts
+    that succeeded in that run are skipped.  When only the failed hosts are
+    selected, the hosts that failed in the last backup run are used.  The
+    records of a streamed inventory are selected as they are read.
+    """
+    if resume and only_failed:
+        raise ValueError("--resume and --only-failed cannot be used together")
+
+    if resume:
+        if not runs.run_exists(resume, "backup"):
+            raise ValueError(f"No backup run with ID: {resume}")
+
+        done = runs.hosts(resume, ok=True)
+        recs = (rec for rec in inventory_recs if rec["host"] not in done)
+        return list(recs) if isinstance(inventory_recs, Sized) else recs
+
+    if only_failed:
+        if not (last_run_id := runs.last_run_id("backup")):
+            raise ValueError("No previous backup run")
+
+        failed = runs.hosts(last_run_id, ok=False)
+        recs = (rec for rec in inventory_recs if rec["host"] in failed)
+        return list(recs) if isinstance(inventory_recs, Sized) else recs
+
+    return inventory_recs
+
+
+async def iter_backup(
+    app_cfg,
+    inventory_recs,
+    connect_jumphosts=True,
+    deadline=None,
+    timing=None,
+    metrics=None,
+    probe_timeout=None,
+    stages=None,
+):
+    """
+    Backup the inventory records, yielding the tuple (rec, res, raised,
+    attempts, save_status) as each record completes; where `res` is True if
+    the backup succeeded, or the exception, and `raised` is True if the
+    exception was raised rather than returned by the connector.  The inventory
+    records can be any iterable, for example a generator of the records
+    claimed from a work queue.
+
+    When the `deadline` time expires, the records in progress fail with the
+    DeadlineExpired exception and the records not yet started are skipped.
+    The phase durations of each host are added to the `timing` stats, and the
+    progress of each host to the `metrics`, if given.
+
+    When the `probe_timeout` is given, the SSH port of each host is probed
+    before the login, so that an unreachable host fails without waiting for
+    the login timeout.  The last stage reached by each host, one of STAGES, is
+    set in the `stages` dictionary, if given.  The hosts that fail to connect,
+    and the hosts that connect, are recorded in the reachability cache.
+
+    The host names of the inventory records are resolved before the records
+    are dispatched, when the records are a list; otherwise as each record is
+    started.
+    """
+    log = get_logger()
+
+    # the host connector is created only when a worker is ready to process
+    # the inventory record, and is released once the backup completes.
+
+    attempts = Counter()
+    save_status = dict()
+
+    async def backup_host(rec):
+        host = rec["host"]
+        attempts[host] += 1
+        await resolver.resolve_host(rec)
+
+        if probe_timeout:
+            if stages is not None:
+                stages[host] = STAGE_PROBE
+
+            try:
+                await probe(
+                    resolver.get_address(rec),
+                    timeout=probe_timeout,
+                    port=get_ssh_port(rec, app_cfg),
+                    raise_exc=True,
+                )
+            except (asyncio.TimeoutError, OSError) as exc:
+                reachability.record_unreachable(rec, err_reason(exc))
+                raise
+
+        conn = make_host_connector(rec, app_cfg)
+        if metrics:
+            metrics.host_started()
+
+        # the connector SSH connection exists once the login succeeded; the
+        # host is only unreachable if the login failed before the TCP
+        # connection was made.
+
+        try:
+            return await conn.backup_config()
+
+        except Exception as exc:
+            if not getattr(conn, "tcp_connected", False) and (
+                reachability.is_unreachable_error(exc)
+            ):
+                reachability.record_unreachable(rec, err_reason(exc))
+            raise
+
+        finally:
+            save_status[host] = conn.save_status
+            connected = bool(getattr(conn, "conn", None))
+
+            if connected:
+                reachability.record_reachable(rec)
+
+            if stages is not None:
+                stages[host] = STAGE_GET_CONFIG if connected else STAGE_LOGIN
+            timer = getattr(conn, "timer", None)
+            if timing is not None:
+                timing.add_host(rec, timer)
+            if metrics:
+                metrics.host_stopped(rec, timer)
+
+    scheduler = Scheduler(
+        work_fn=backup_host,
+        max_workers=app_cfg.concurrency.max_sessions,
+        groups=make_group_limits(app_cfg.concurrency),
+        retry_fn=make_retry_fn(app_cfg),
+        deadline=deadline,
+    )
+
+    if app_cfg.jumphost and connect_jumphosts:
+        await jumphosts.connect_jumphosts()
+
+    if isinstance(inventory_recs, Sized):
+        await resolver.resolve_inventory(inventory_recs)
+
+    total = len(inventory_recs) if isinstance(inventory_recs, Sized) else "?"
+    done = 0
+
+    async for rec, task in scheduler.run(inventory_recs):
+        done += 1
+        host = rec["host"]
+        msg = f"DONE ({done}/{total}): {host} "
+
+        if (n_attempts := attempts.pop(host, 1)) > 1:
+            msg += f"(attempts={n_attempts}) "
+
+        try:
+            res, raised = task.result(), False
+
+        except (asyncio.TimeoutError, OSError) as exc:
+            res, raised = exc, True
+
+        except Exception as exc:
+            res, raised = exc, True
+            log.error(msg + f"FAILURE: {str(exc)}")
+
+        log.info(msg + ("PASS" if res is True else "FALSE"))
+        yield rec, res, raised, n_attempts, save_status.pop(host, None)
+
+    if scheduler.expired:
+        log.warning(f"DEADLINE expired after {done}/{total} hosts")
+
+
+def exec_backup(
+    app_cfg,
+    inventory_recs,
+    resume=None,
+    only_failed=False,
+    workers=None,
+    coordinator=False,
+    vcs_spec=None,
+    deadline=None,
+    timing_json=None,
+    probe_timeout=None,
+):
+    # the run deadline, in seconds, is converted to the time the run expires
+    # so that it applies to the worker processes as well.
+
+    deadline_at = time.time() + deadline if deadline else None
+
+    # the outcome of each host is recorded in the run-state store so that an
+    # interrupted run can be resumed, and the failures retried.
+
+    runs = RunStateStore(app_cfg.defaults.state_dir)
+    metrics = None
+    try:
+        inventory_recs = select_inventory(runs, inventory_recs, resume, only_failed)
+
+        credhints.load_hints(app_cfg.defaults.state_dir)
+        savefile.load_digests(app_cfg.defaults.state_dir)
+        reachability.load_reachability(app_cfg.defaults.state_dir)
+        resolver.load_dns_cache(app_cfg.defaults.state_dir, app_cfg.dns)
+
+        # the hosts that were unreachable within the cache TTL are either
+        # backed up after all of the other hosts, or skipped, so that the
+        # workers are not first spent on the login timeout of each of those
+        # hosts.
+
+        probe_spec = app_cfg.probe
+        defer = probe_spec.unreachable == reachability.UNREACHABLE_DEFER
+
+        if isinstance(inventory_recs, Sized):
+            backup_recs, unreachable = reachability.partition_unreachable(
+                inventory_recs, probe_spec.cache_ttl
+            )
+            if defer:
+                backup_recs.extend(rec for rec, _ in unreachable)
+
+        else:
+            # the records of a streamed inventory are partitioned as they are
+            # read, and the deferred records are backed up once the stream
+            # ends.
+
+            unreachable = list()
+            backup_recs = reachability.iter_reachable(
+                inventory_recs, probe_spec.cache_ttl, unreachable
+            )
+            if defer:
+                backup_recs = chain(backup_recs, (rec for rec, _ in unreachable))
+
+        report = Report()
+        report.timing = timing = TimingStats()
+        save_counts = Counter()
+
+        metrics = BackupMetrics()
+        if not (exporter := MetricsExporter(app_cfg.metrics, metrics)).enabled:
+            metrics = None
+
+        if make_retry_fn(app_cfg):
+            report.attempts = dict()
+
+        # when the hosts are probed before the login, the stage at which each
+        # host failed is reported.
+
+        stages = dict() if probe_timeout else None
+        if stages is not None:
+            report.stages = stages
+
+        def record_result(rec, res, raised, n_attempts, save_status):
+            ok = res is True
+            reason = None if ok else err_reason(res)
+            report.task_results[ok].append((rec, res))
+            runs.record(rec, ok, reason)
+
+            if metrics:
+                metrics.host_result(ok, reason)
+
+            if n_attempts > 1:
+                report.attempts[rec["host"]] = n_attempts
+
+            if save_status:
+                save_counts[save_status] += 1
+
+            if raised:
+                Plugin.run_backup_failed(rec, res)
+            else:
+                Plugin.run_backup_success(rec, res)
+
+        async def process_batch():
+            async for result in iter_backup(
+                app_cfg,
+                backup_recs,
+                deadline=deadline_at,
+                timing=timing,
+                metrics=metrics,
+                probe_timeout=probe_timeout,
+                stages=stages,
+            ):
+                record_result(*result)
+
+        run_id = runs.start_run("backup", run_id=resume)
+        report.summary["RUN-ID"] = run_id
+        report.start_timing()
+        if metrics:
+            exporter.start()
+
+        if coordinator:
+            max_startups = exec_backup_coordinator(
+                app_cfg,
+                backup_recs,
+                run_id,
+                on_result=record_result,
+                deadline=deadline_at,
+                metrics=metrics,
+            )
+        elif workers and workers > 1:
+            max_startups = exec_backup_shards(
+                app_cfg,
+                backup_recs,
+                workers,
+                on_result=record_result,
+                deadline=deadline_at,
+                timing=timing,
+                metrics=metrics,
+            )
+        else:
+            limiter = set_concurrency(app_cfg.concurrency)
+            loop = asyncio.get_event_loop()
+            loop.run_until_complete(process_batch())
+            max_startups = limiter.limit if limiter else None
+
+        # the skipped hosts are recorded once the backup is done, since the
+        # records of a streamed inventory are partitioned as they are read.
+
+        if unreachable and not defer:
+            report.summary["UNREACHABLE-SKIPPED"] = len(unreachable)
+            for rec, entry in unreachable:
+                age = int(time.time() - entry["ts"])
+                reason = f"UNREACHABLE {age}s ago: {entry['reason']}"
+                record_result(rec, reason, True, 1, None)
+
+        elif unreachable:
+            report.summary["UNREACHABLE-DEFERRED"] = len(unreachable)
+
+    finally:
+        if runs.run_id:
+            runs.stop_run()
+        runs.close()
+        if metrics:
+            exporter.stop()
+
+    report.stop_timing()
+    credhints.save_hints()
+    savefile.save_digests()
+    reachability.save_reachability()
+    resolver.save_dns_cache()
+
+    for status in (savefile.SAVE_NEW, savefile.SAVE_CHANGED, savefile.SAVE_UNCHANGED):
+        report.summary[status.upper()] = save_counts[status]
+
+    if max_startups:
+        report.summary["MAX-STARTUPS"] = max_startups
+
+    if deadline and isinstance(inventory_recs, Sized):
+        done_n = sum(len(results) for results in report.task_results.values())
+        report.summary["SKIPPED"] = len(inventory_recs) - done_n
+
+    if stages is not None:
+        failed_stages = Counter(
+            stages.get(rec["host"]) for rec, _ in report.task_results[False]
+        )
+        for stage in STAGES:
+            report.summary[f"{stage.upper()}-FAIL"] = failed_stages[stage]
+
+    if timing_json:
+        timing.save_json(timing_json)
+
+    if vcs_spec:
+        git.vcs_save(vcs_spec, repo_dir=app_cfg.defaults.configs_dir)
+
+    stop_aiologging()
+    report.print_report()
+    Plugin.run_report(report)
+
+
+# -----------------------------------------------------------------------------
+#
+#                           Multi-Process Backup
+#
+# -----------------------------------------------------------------------------
+
+
+def shard_inventory(app_cfg, inventory_recs, workers):
+    """
+    Returns the list of inventory records for each worker process.  When group
+    limits are configured the records are sharded by the first group value, so
+    that each group is processed by one worker and the group limit holds;
+    otherwise the records are distributed round-robin.
+    """
+    if not (groups := make_group_limits(app_cfg.concurrency)):
+        return [inventory_recs[i::workers] for i in range(workers)]
+
+    shards = [list() for _ in range(workers)]
+    group = groups[0]
+    for index, rec in enumerate(inventory_recs):
+        key = group.key(rec)
+        shard = zlib.crc32(key[1].encode()) if key else index
+        shards[shard % workers].append(rec)
+
+    return shards
+
+
+def shard_app_config(app_cfg, workers):
+    """
+    Returns the configuration used by each worker process; the global
+    concurrency limits are divided between the worker processes.  The records
+    of each value of the first group column are processed by one worker, see
+    shard_inventory(), and so only the limits of the other groups are divided.
+    """
+    shard_cfg = app_cfg.copy(deep=True)
+    concurrency = shard_cfg.concurrency
+    concurrency.max_startups = math.ceil(concurrency.max_startups / workers)
+    concurrency.max_sessions = math.ceil(concurrency.max_sessions / workers)
+    concurrency.min_startups = min(concurrency.min_startups, concurrency.max_startups)
+
+    for group_spec in (concurrency.groups or [])[1:]:
+        limits = [group_spec.limit, *(group_spec.limits or {}).values()]
+        if min(limits) < workers:
+            get_logger().warning(
+                f"WORKERS: a {group_spec.column} group limit is less than the "
+                f"{workers} workers; each worker allows at least one device"
+            )
+
+        group_spec.limit = math.ceil(group_spec.limit / workers)
+        if group_spec.limits:
+            group_spec.limits = {
+                value: math.ceil(limit / workers)
+                for value, limit in group_spec.limits.items()
+            }
+
+    return shard_cfg
+
+
+def backup_shard(
+    app_cfg, inventory_recs, result_que, shard_id, deadline=None, with_metrics=False
+):
+    """
+    The worker process entry point.  The backup of the shard inventory records
+    runs in this process event loop; each result is sent to the parent process
+    with the exception as the reason string; and when `with_metrics` is True,
+    the progress of each host is sent for the metrics.  When the shard
+    completes, the credential hints, configuration digests, reachability and
+    DNS caches are sent to the parent process to be saved, and the phase
+    durations to be reported.
+    """
+    setup_logging(dict(logging=deepcopy(app_cfg.logging)))
+
+    limiter = set_concurrency(app_cfg.concurrency)
+    credhints.load_hints(app_cfg.defaults.state_dir)
+    savefile.load_digests(app_cfg.defaults.state_dir)
+    reachability.load_reachability(app_cfg.defaults.state_dir)
+    resolver.load_dns_cache(app_cfg.defaults.state_dir, app_cfg.dns)
+    timing = TimingStats()
+
+    metrics = None
+    if with_metrics:
+        metrics = RelayMetrics(
+            lambda name, *args: result_que.put(("metrics", shard_id, name, *args))
+        )
+
+    if app_cfg.jumphost:
+        jumphosts.init_jumphosts(
+            jumphost_specs=app_cfg.jumphost, inventory=inventory_recs
+        )
+
+    async def process_shard():
+        async for rec, res, *result in iter_backup(
+            app_cfg, inventory_recs, deadline=deadline, timing=timing, metrics=metrics
+        ):
+            if res is not True:
+                res = err_reason(res)
+            result_que.put(("result", shard_id, rec, res, *result))
 
+    try:
+        asyncio.get_event_loop().run_until_complete(process_shard())
+    finally:
+        result_que.put(
+            (
+                "done",
+                shard_id,
+                credhints.get_hints(),
+                savefile.get_digests(),
+                reachability.get_reachability(),
+                resolver.get_dns_cache(),
+                limiter.limit if limiter else None,
+                timing,
+            )
+        )
+        stop_aiologging()
 
-def exec_backup(app_cfg, inventory_recs):
-    backup_tasks = dict()
 
+def exec_backup_shards(
+    app_cfg,
+    inventory_recs,
+    workers,
+    on_result,
+    deadline=None,
+    timing=None,
+    metrics=None,
+):
+    """
+    Backup the inventory records using `workers` processes, each with its own
+    event loop.  The results are passed to the `on_result` function as they
+    arrive from the worker processes.  The run `deadline` time applies to each
+    of the worker processes.  The phase durations of the worker processes are
+    merged into the `timing` stats, if given; and the progress of each host is
+    recorded in the `metrics`, if given.
+
+    Returns
+    -------
+    The total of the worker adaptive max-startups limits, or None.
+    """
     log = get_logger()
+    mp_ctx = multiprocessing.get_context("spawn")
+    result_que = mp_ctx.Queue()
 
-    backup_tasks = {
-        make_host_connector(rec, app_cfg).backup_config(): rec for rec in inventory_recs
+    shards = shard_inventory(app_cfg, inventory_recs, workers)
+    shard_cfg = shard_app_config(app_cfg, workers)
+
+    procs = {
+        shard_id: mp_ctx.Process(
+            target=backup_shard,
+            args=(
+                shard_cfg,
+                shard_recs,
+                result_que,
+                shard_id,
+                deadline,
+                metrics is not None,
+            ),
+            daemon=True,
+        )
+        for shard_id, shard_recs in enumerate(shards)
+        if shard_recs
     }
 
-    total = len(backup_tasks)
-    report = Report()
+    for proc in procs.values():
+        proc.start()
+
+    pending = {
+        shard_id: {rec["host"] for rec in shards[shard_id]} for shard_id in procs
+    }
+    max_startups = list()
+
+    # the hosts in progress in each worker process, removed from the metrics
+    # if the worker process exits without stopping them.
+
+    in_flight = Counter()
+
+    def stop_shard(shard_id):
+        if metrics:
+            metrics.in_flight -= in_flight.pop(shard_id, 0)
+
+    def fail_pending(shard_id, reason):
+        log.error(f"WORKER: {reason}")
+        for rec in shards[shard_id]:
+            if rec["host"] in pending[shard_id]:
+                on_result(rec, reason, True, 1, None)
+
+    def handle_message(kind, shard_id, *msg):
+        if kind == "result":
+            pending[shard_id].discard(msg[0]["host"])
+            on_result(*msg)
+            return
+
+        if kind == "metrics":
+            name, *args = msg
+            in_flight[shard_id] += 1 if name == "host_started" else -1
+            getattr(metrics, name)(*args)
+            return
+
+        hints, digests, reachable, dns_cache, limit, shard_timing = msg
+        credhints.merge_hints(hints)
+        savefile.merge_digests(digests)
+        reachability.merge_reachability(reachable)
+        resolver.merge_dns_cache(dns_cache)
+        if timing is not None:
+            timing.merge(shard_timing)
+        if limit:
+            max_startups.append(limit)
+
+        procs.pop(shard_id).join()
+        stop_shard(shard_id)
+        if pending[shard_id]:
+            fail_pending(shard_id, f"worker {shard_id} did not complete")
+
+    while procs:
+        try:
+            handle_message(*result_que.get(timeout=1))
+            continue
+        except queue.Empty:
+            pass
+
+        # a worker process that exits without completing its shard, for
+        # example killed, fails the records it did not complete.  The
+        # messages sent by the worker before it exited are handled first.
+
+        for shard_id, proc in list(procs.items()):
+            if proc.is_alive():
+                continue
+
+            while shard_id in procs:
+                try:
+                    handle_message(*result_que.get_nowait())
+                except queue.Empty:
+                    del procs[shard_id]
+                    stop_shard(shard_id)
+                    fail_pending(
+                        shard_id,
+                        f"worker {shard_id} exited with code {proc.exitcode}",
+                    )
+
+    return sum(max_startups) or None
+
+
+# -----------------------------------------------------------------------------
+#
+#                           Distributed Backup
+#
+# -----------------------------------------------------------------------------
+
+
+def exec_backup_coordinator(
+    app_cfg, inventory_recs, run_id, on_result, deadline=None, metrics=None
+):
+    """
+    Publish the inventory records to the work queue, and pass the results
+    reported by the worker processes to the `on_result` function as they
+    arrive.  The coordinator does not perform any backups.  When the
+    `deadline` time expires the run is closed, so that the workers stop
+    claiming records, and the results that have not arrived are skipped.  The
+    phase durations reported with the results, and the records claimed by the
+    workers as in progress, are recorded in the `metrics`, if given.
+    """
+    log = get_logger()
+    poll_interval = app_cfg.workqueue.poll_interval
+
+    work_que = get_workqueue(app_cfg)
+    work_que.publish(run_id, inventory_recs)
+
+    total = len(inventory_recs)
+    log.info(f"COORDINATOR: published {total} records for run {run_id}")
+
+    last_seq = 0
     done = 0
 
-    async def process_batch():
-        nonlocal done
+    try:
+        while True:
+            # check if the run is done before fetching the results, so that
+            # the final results are not missed.
+
+            finished = work_que.is_done(run_id)
+
+            if metrics and (in_progress := work_que.in_progress(run_id)) is not None:
+                metrics.in_flight = in_progress
+
+            for result in work_que.results(run_id, after_seq=last_seq):
+                last_seq = result.seq
+                if metrics and result.timing:
+                    metrics.add_timing(result.rec, PhaseTimer.from_dict(result.timing))
+
+                done += 1
+                log.info(
+                    f"DONE ({done}/{total}): {result.rec['host']} "
+                    f"by {result.worker_id} " + ("PASS" if result.ok else "FALSE")
+                )
+                on_result(
+                    result.rec,
+                    True if result.ok else result.reason,
+                    result.raised,
+                    result.attempts,
+                    result.save_status,
+                )
+
+            if finished:
+                break
+
+            if deadline and time.time() >= deadline:
+                log.warning(f"DEADLINE expired after {done}/{total} hosts")
+                break
+
+            time.sleep(poll_interval)
+
+    finally:
+        work_que.close_run(run_id)
+        work_que.close()
+
+    return None
+
+
+def exec_backup_worker(app_cfg, deadline=None, timing_json=None):
+    """
+    Claim the records of the open run from the work queue, backup each record,
+    and complete the record with its result.  The worker waits for a run to be
+    published, and exits once all of the run records are completed, the run is
+    closed, or the `deadline` duration in seconds expires.
+    """
+    log = get_logger()
+    spec = app_cfg.workqueue
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    # the work queue calls block, waiting on the work queue lock and the
+    # commit; so they are made by a single thread, which also owns the work
+    # queue connection, rather than stalling the SSH sessions in progress.
+
+    queue_executor = ThreadPoolExecutor(max_workers=1)
+    work_que = queue_executor.submit(get_workqueue, app_cfg).result()
+
+    limiter = set_concurrency(app_cfg.concurrency)
+    credhints.load_hints(app_cfg.defaults.state_dir)
+    savefile.load_digests(app_cfg.defaults.state_dir)
+    reachability.load_reachability(app_cfg.defaults.state_dir)
+    resolver.load_dns_cache(app_cfg.defaults.state_dir, app_cfg.dns)
+
+    report = Report()
+    report.timing = timing = TimingStats()
+    deadline_at = time.time() + deadline if deadline else None
+
+    def call_queue(method, *args):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(queue_executor, method, *args)
+
+    async def process_run():
+        while not (run_id := await call_queue(work_que.open_run_id)):
+            await asyncio.sleep(spec.poll_interval)
+
+        log.info(f"WORKER {worker_id}: processing run {run_id}")
+        report.summary["RUN-ID"] = run_id
 
         if app_cfg.jumphost:
             await jumphosts.connect_jumphosts()
 
-        async for task in as_completed(backup_tasks):
-            done += 1
-            coro = task.get_coro()
-            rec = backup_tasks[coro]
-            msg = f"DONE ({done}/{total}): {rec['host']} "
+        # the records are claimed in batches as the scheduler is ready for
+        # them; the item ID of each record is needed to complete the record.
 
-            try:
-                res = task.result()
-                ok = res is True
-                report.task_results[ok].append((rec, res))
-                Plugin.run_backup_success(rec, res)
+        claimed = dict()
 
-            except (asyncio.TimeoutError, OSError) as exc:
-                ok = False
-                report.task_results[False].append((rec, exc))
-                Plugin.run_backup_failed(rec, exc)
+        # the results are completed in batches, when `claim_batch` results
+        # are pending and before each claim, so that the work queue lock is
+        # taken once for each batch.
+
+        completed = list()
+
+        async def complete_records():
+            if completed:
+                results = completed.copy()
+                completed.clear()
+                await call_queue(work_que.complete_batch, run_id, worker_id, results)
+
+        # records are not claimed once the run is closed, for example the
+        # coordinator deadline expired.
+
+        async def claim_records():
+            while True:
+                await complete_records()
+                if await call_queue(work_que.is_done, run_id):
+                    return
+
+                items = await call_queue(
+                    work_que.claim, run_id, worker_id, spec.claim_batch
+                )
+                if not items:
+                    return
 
-            except Exception as exc:
-                ok = False
-                log.error(msg + f"FAILURE: {str(exc)}")
-                report.task_results[False].append((rec, exc))
-                Plugin.run_backup_failed(rec, exc)
+                for item_id, rec in items:
+                    claimed[id(rec)] = item_id
+                    yield rec
 
-            log.info(msg + ("PASS" if ok else "FALSE"))
+        async def renew_leases():
+            while True:
+                await asyncio.sleep(spec.lease_timeout / 3)
+                await complete_records()
+                await call_queue(work_que.renew, run_id, worker_id)
+
+        renew_task = asyncio.ensure_future(renew_leases())
+
+        try:
+            while True:
+                async for rec, res, raised, *result in iter_backup(
+                    app_cfg,
+                    claim_records(),
+                    connect_jumphosts=False,
+                    deadline=deadline_at,
+                    timing=timing,
+                    metrics=metrics,
+                ):
+                    ok = res is True
+                    reason = None if ok else err_reason(res)
+                    report.task_results[ok].append((rec, res))
+                    metrics.host_result(ok, reason)
+
+                    attempts, save_status = result
+                    completed.append(
+                        dict(
+                            item_id=claimed.pop(id(rec)),
+                            ok=ok,
+                            reason=reason,
+                            raised=raised,
+                            attempts=attempts,
+                            save_status=save_status,
+                            timing=metrics.pop_timing(rec),
+                        )
+                    )
+                    if len(completed) >= spec.claim_batch:
+                        await complete_records()
+
+                await complete_records()
+
+                # the records claimed by another worker may yet be released
+                # if that worker dies; wait for the run to be done.
+
+                if await call_queue(work_que.is_done, run_id):
+                    break
+
+                if deadline_at and time.time() >= deadline_at:
+                    break
+
+                await asyncio.sleep(spec.poll_interval)
+
+        finally:
+            renew_task.cancel()
+
+    # the metrics are always kept, since the phase durations of each host are
+    # reported with its result for the metrics of the coordinator.
+
+    metrics = WorkerMetrics()
+    if exported := (exporter := MetricsExporter(app_cfg.metrics, metrics)).enabled:
+        exporter.start()
 
-    loop = asyncio.get_event_loop()
     report.start_timing()
-    loop.run_until_complete(process_batch())
+    try:
+        asyncio.get_event_loop().run_until_complete(process_run())
+    finally:
+        queue_executor.submit(work_que.close).result()
+        queue_executor.shutdown()
+        if exported:
+            exporter.stop()
+
     report.stop_timing()
+    credhints.save_hints()
+    savefile.save_digests()
+    reachability.save_reachability()
+    resolver.save_dns_cache()
+
+    if limiter:
+        report.summary["MAX-STARTUPS"] = limiter.limit
+
+    if timing_json:
+        timing.save_json(timing_json)
+
     stop_aiologging()
     report.print_report()
-    Plugin.run_report(report)
 
 
 @cli.command(name="backup", cls=WithInventoryCommand)
@@ -78,10 +905,57 @@ def exec_backup(app_cfg, inventory_recs):
 @opts_inventory
 @opt_debug_ssh
 @opt_batch
+@opt_sessions
+@opt_resume
+@opt_only_failed
+@opt_workers
+@opt_deadline
+@opt_stream
+@click.option(
+    "--coordinator", is_flag=True, help="publish the backup run to the work queue"
+)
+@click.option("--worker", is_flag=True, help="backup the work queue records")
+@click.option("--vcs-save", is_flag=True, help="save changes into the VCS repository")
+@click.option(
+    "--timing-json",
+    type=click.Path(dir_okay=False, writable=True),
+    help="save the phase timing percentiles to the JSON file",
+)
 @click.pass_context
-def cli_backup(ctx, **_cli_opts):
+def cli_backup(ctx, **cli_opts):
     """
     Backup network configurations.
     """
-    load_plugins(ctx.obj["app_cfg"].defaults.plugins_dir)
-    exec_backup(app_cfg=ctx.obj["app_cfg"], inventory_recs=ctx.obj["inventory_recs"])
+    app_cfg = ctx.obj["app_cfg"]
+
+    if cli_opts["coordinator"] and cli_opts["worker"]:
+        raise RuntimeError("--coordinator and --worker cannot be used together")
+
+    if (cli_opts["coordinator"] or cli_opts["worker"]) and cli_opts["workers"]:
+        raise RuntimeError("--workers cannot be used with --coordinator or --worker")
+
+    if cli_opts["stream"] and (cli_opts["workers"] or cli_opts["coordinator"]):
+        raise RuntimeError("--stream cannot be used with --workers or --coordinator")
+
+    if cli_opts["worker"]:
+        exec_backup_worker(
+            app_cfg, deadline=cli_opts["deadline"], timing_json=cli_opts["timing_json"]
+        )
+        return
+
+    vcs_spec = None
+    if cli_opts["vcs_save"] and not (vcs_spec := get_spec_nameorfirst(app_cfg.git)):
+        raise RuntimeError("No vcs config section found in configuration file")
+
+    load_plugins(app_cfg.defaults.plugins_dir)
+    exec_backup(
+        app_cfg=app_cfg,
+        inventory_recs=ctx.obj["inventory_recs"],
+        resume=cli_opts["resume"],
+        only_failed=cli_opts["only_failed"],
+        workers=cli_opts["workers"],
+        coordinator=cli_opts["coordinator"],
+        vcs_spec=vcs_spec,
+        deadline=cli_opts["deadline"],
+        timing_json=cli_opts["timing_json"],
+    )
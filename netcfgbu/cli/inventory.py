@@ -40,7 +40,7 @@ def cli_inventory():
 @click.pass_context
 def cli_inventory_list(ctx, **cli_opts):
     inventory_recs = ctx.obj["inventory_recs"]
-    os_names = Counter(rec["os_name"] for rec in inventory_recs)
+    os_names = Counter(inventory_recs.column("os_name"))
 
     os_name_table = indent(
         tabulate(
@@ -62,7 +62,7 @@ SUMMARY: TOTAL={len(inventory_recs)}
     if cli_opts["brief"] is True:
         return  # pragma: no cover
 
-    field_names = inventory_recs[0].keys()
+    field_names = inventory_recs.field_names
 
     print(
         tabulate(
@@ -3,9 +3,9 @@ import asyncio
 import click
 
 from netcfgbu.logger import get_logger, stop_aiologging
-from netcfgbu.aiofut import as_completed
+from netcfgbu.scheduler import Scheduler, make_group_limits
 from netcfgbu.os_specs import make_host_connector
-from netcfgbu.connectors import set_max_startups
+from netcfgbu.connectors import set_concurrency
 
 
 from .root import (
@@ -14,12 +14,15 @@ from .root import (
     opt_config_file,
     opts_inventory,
     opt_batch,
+    opt_sessions,
     opt_debug_ssh,
     opt_timeout,
 )
 
 from .report import Report, err_reason
 from netcfgbu import jumphosts
+from netcfgbu import credhints
+from netcfgbu import resolver
 from netcfgbu.config_model import AppConfig
 from netcfgbu.consts import DEFAULT_LOGIN_TIMEOUT
 
@@ -28,15 +31,19 @@ def exec_test_login(app_cfg: AppConfig, inventory_recs, cli_opts):
 
     timeout = cli_opts["timeout"] or DEFAULT_LOGIN_TIMEOUT
 
-    login_tasks = {
-        make_host_connector(rec, app_cfg).test_login(timeout=timeout): rec
-        for rec in inventory_recs
-    }
+    limiter = set_concurrency(app_cfg.concurrency)
+    credhints.load_hints(app_cfg.defaults.state_dir)
+    resolver.load_dns_cache(app_cfg.defaults.state_dir, app_cfg.dns)
 
-    if (batch_n := cli_opts["batch"]) is not None:
-        set_max_startups(batch_n)
+    scheduler = Scheduler(
+        work_fn=lambda rec: make_host_connector(rec, app_cfg).test_login(
+            timeout=timeout
+        ),
+        max_workers=app_cfg.concurrency.max_sessions,
+        groups=make_group_limits(app_cfg.concurrency),
+    )
 
-    total = len(login_tasks)
+    total = len(inventory_recs)
 
     report = Report()
     done = 0
@@ -48,10 +55,9 @@ def exec_test_login(app_cfg: AppConfig, inventory_recs, cli_opts):
         if app_cfg.jumphost:
             await jumphosts.connect_jumphosts()
 
-        async for task in as_completed(login_tasks):
+        await resolver.resolve_inventory(inventory_recs)
+        async for rec, task in scheduler.run(inventory_recs):
             done += 1
-            coro = task.get_coro()
-            rec = login_tasks[coro]
             msg = f"DONE ({done}/{total}): {rec['host']} "
 
             try:
@@ -75,6 +81,12 @@ def exec_test_login(app_cfg: AppConfig, inventory_recs, cli_opts):
     report.start_timing()
     loop.run_until_complete(process_batch())
     report.stop_timing()
+    credhints.save_hints()
+    resolver.save_dns_cache()
+
+    if limiter:
+        report.summary["MAX-STARTUPS"] = limiter.limit
+
     stop_aiologging()
     report.print_report()
 
@@ -84,6 +96,7 @@ def exec_test_login(app_cfg: AppConfig, inventory_recs, cli_opts):
 @opts_inventory
 @opt_timeout
 @opt_batch
+@opt_sessions
 @opt_debug_ssh
 @click.pass_context
 def cli_login(ctx, **cli_opts):
@@ -4,6 +4,7 @@ from .inventory import cli_inventory  # noqa
 from .probe import cli_check  # noqa
 from .login import cli_login  # noqa
 from .backup import cli_backup  # noqa
+from .pipeline import cli_run  # noqa
 from .vcs import cli_vcs  # noqa
 
 
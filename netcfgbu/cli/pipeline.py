@@ -0,0 +1,60 @@
+import click
+
+from netcfgbu.plugins import load_plugins
+
+from .root import (
+    cli,
+    WithInventoryCommand,
+    get_spec_nameorfirst,
+    opt_config_file,
+    opts_inventory,
+    opt_batch,
+    opt_sessions,
+    opt_deadline,
+    opt_debug_ssh,
+    opt_timeout,
+)
+
+from .backup import exec_backup
+
+
+@cli.command(name="run", cls=WithInventoryCommand)
+@opt_config_file
+@opts_inventory
+@opt_timeout
+@opt_debug_ssh
+@opt_batch
+@opt_sessions
+@opt_deadline
+@click.option("--vcs-save", is_flag=True, help="save changes into the VCS repository")
+@click.option(
+    "--timing-json",
+    type=click.Path(dir_okay=False, writable=True),
+    help="save the phase timing percentiles to the JSON file",
+)
+@click.pass_context
+def cli_run(ctx, **cli_opts):
+    """
+    Probe, login, and backup devices in a single pass.
+
+    Each device is probed for SSH reachability, and the unreachable devices
+    fail without a login attempt.  The login and the backup of the
+    configuration use the same SSH connection, so that each device has one
+    SSH handshake and one authentication per run.  The report includes the
+    stage at which each device failed: probe, login, or get_config.
+    """
+    app_cfg = ctx.obj["app_cfg"]
+
+    vcs_spec = None
+    if cli_opts["vcs_save"] and not (vcs_spec := get_spec_nameorfirst(app_cfg.git)):
+        raise RuntimeError("No vcs config section found in configuration file")
+
+    load_plugins(app_cfg.defaults.plugins_dir)
+    exec_backup(
+        app_cfg=app_cfg,
+        inventory_recs=ctx.obj["inventory_recs"],
+        vcs_spec=vcs_spec,
+        deadline=cli_opts["deadline"],
+        timing_json=cli_opts["timing_json"],
+        probe_timeout=cli_opts["timeout"] or app_cfg.probe.timeout,
+    )
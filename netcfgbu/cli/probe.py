@@ -3,8 +3,11 @@ import asyncio
 import click
 
 from netcfgbu.logger import get_logger, stop_aiologging
-from netcfgbu.aiofut import as_completed
-from netcfgbu.probe import probe
+from netcfgbu import reachability
+from netcfgbu import resolver
+from netcfgbu.probe import BulkProbe
+from netcfgbu.os_specs import get_ssh_port
+from netcfgbu.config_model import AppConfig
 
 from .root import (
     cli,
@@ -14,55 +17,62 @@ from .root import (
     opt_timeout,
 )
 
-from .report import Report
-from netcfgbu.consts import DEFAULT_PROBE_TIMEOUT
+from .report import Report, err_reason
 
 
-def exec_probe(inventory, timeout=None):
+def exec_probe(inventory, app_cfg: AppConfig, timeout=None, rate=None):
     inv_n = len(inventory)
     log = get_logger()
     log.info(f"Checking SSH reachability on {inv_n} devices ...")
-    timeout = timeout or DEFAULT_PROBE_TIMEOUT
+
+    spec = app_cfg.probe
+    reachability.load_reachability(app_cfg.defaults.state_dir)
+    resolver.load_dns_cache(app_cfg.defaults.state_dir, app_cfg.dns)
+    prober = BulkProbe(
+        timeout=timeout or spec.timeout,
+        rate=rate or spec.rate,
+        max_inflight=spec.max_inflight,
+    )
 
     loop = asyncio.get_event_loop()
 
-    tasks = {
-        probe(
-            rec.get("ipaddr") or rec.get("host"), timeout=timeout, raise_exc=True
-        ): rec
+    # the probe targets are created as the probe engine is ready to start
+    # them, and each completed probe is yielded with its inventory record.
+    # The host names are resolved before the probes are started.
+
+    targets = (
+        (rec, resolver.get_address(rec), get_ssh_port(rec, app_cfg))
         for rec in inventory
-    }
+    )
 
-    total = len(tasks)
+    total = inv_n
     done = 0
     report = Report()
 
     async def proces_check():
         nonlocal done
 
-        async for probe_task in as_completed(tasks):
+        await resolver.resolve_inventory(inventory)
+        async for rec, result in prober.run(targets):
             done += 1
-            task_coro = probe_task.get_coro()
-            rec = tasks[task_coro]
             msg = f"DONE ({done}/{total}): {rec['host']} "
 
-            try:
-                probe_ok = probe_task.result()
-                report.task_results[probe_ok].append((rec, probe_ok))
+            probe_ok = result is True
+            report.task_results[probe_ok].append((rec, result))
 
-            except (asyncio.TimeoutError, OSError) as exc:
-                probe_ok = False
-                report.task_results[False].append((rec, exc))
-
-            except Exception as exc:
-                probe_ok = False
-                log.error(msg + f"FAILURE: {str(exc)}")
+            if probe_ok:
+                reachability.record_reachable(rec)
+            else:
+                reachability.record_unreachable(rec, err_reason(result))
 
             log.info(msg + ("PASS" if probe_ok else "FAIL"))
 
     report.start_timing()
     loop.run_until_complete(proces_check())
     report.stop_timing()
+    reachability.save_reachability()
+    resolver.save_dns_cache()
+    report.summary["MAX-INFLIGHT"] = prober.peak_inflight
     stop_aiologging()
     report.print_report()
 
@@ -71,6 +81,11 @@ def exec_probe(inventory, timeout=None):
 @opt_config_file
 @opts_inventory
 @opt_timeout
+@click.option(
+    "--rate",
+    type=click.IntRange(1),
+    help="limit the probes started per second",
+)
 @click.pass_context
 def cli_check(ctx, **cli_opts):
     """
@@ -79,4 +94,9 @@ def cli_check(ctx, **cli_opts):
     The probe check determines if the device is reachable and the SSH port
     is available to receive connections.
     """
-    exec_probe(ctx.obj["inventory_recs"], timeout=cli_opts["timeout"])
+    exec_probe(
+        ctx.obj["inventory_recs"],
+        ctx.obj["app_cfg"],
+        timeout=cli_opts["timeout"],
+        rate=cli_opts["rate"],
+    )
@@ -31,6 +31,21 @@ class Report(object):
         self.stop_tm = 0
 
         self.task_results = defaultdict(list)
+        self.summary = dict()
+
+        # when the command retries failed hosts, the number of attempts for
+        # each host that was retried.
+
+        self.attempts = None
+
+        # when the command records the phase durations, the TimingStats.
+
+        self.timing = None
+
+        # when the command runs the probe, login, and backup pipeline, the last
+        # stage reached by each host.
+
+        self.stages = None
 
     def start_timing(self):
         self.start_ts = datetime.now()
@@ -69,6 +84,18 @@ class Report(object):
             f"         DURATION={self.duration:.3f}s"
         )
 
+        if self.summary:
+            print(
+                "         "
+                + ", ".join(f"{name}={value}" for name, value in self.summary.items())
+            )
+
+        if self.attempts:
+            self.print_retried()
+
+        if self.timing and self.timing.durations:
+            self.print_timing()
+
         headers = ["host", "os_name", "reason"]
 
         failure_tabular_data = [
@@ -76,6 +103,16 @@ class Report(object):
             for rec, exc in self.task_results[False]
         ]
 
+        if self.attempts is not None:
+            headers.append("attempts")
+            for row in failure_tabular_data:
+                row.append(self.attempts.get(row[0], 1))
+
+        if self.stages is not None:
+            headers.append("stage")
+            for row in failure_tabular_data:
+                row.append(self.stages.get(row[0], ""))
+
         if not fail_n:
             print(LN_SEP)
             return
@@ -88,3 +125,20 @@ class Report(object):
         print(f"\n\nFAILURES: {fail_n}")
         print(tabulate(headers=headers, tabular_data=failure_tabular_data))
         print(LN_SEP)
+
+    def print_timing(self):
+        headers = ["group", "phase", "count", "p50", "p95", "p99", "max"]
+        print("\n\nPHASE TIMING (seconds)")
+        print(tabulate(headers=headers, tabular_data=self.timing.tabular_data()))
+
+    def print_retried(self):
+        headers = ["host", "os_name", "attempts", "result"]
+        tabular_data = [
+            [rec["host"], rec["os_name"], attempts, "OK" if ok else err_reason(res)]
+            for ok in (True, False)
+            for rec, res in self.task_results[ok]
+            if (attempts := self.attempts.get(rec["host"]))
+        ]
+
+        print(f"\n\nRETRIED: {len(tabular_data)}")
+        print(tabulate(headers=headers, tabular_data=tabular_data))
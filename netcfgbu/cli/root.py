@@ -1,5 +1,6 @@
 from importlib import metadata
 from pathlib import Path
+import re
 
 import click
 from functools import reduce
@@ -47,17 +48,34 @@ class WithInventoryCommand(click.Command):
             if ctx.params["inventory"]:
                 ctx.obj["app_cfg"].defaults.inventory = ctx.params["inventory"]
 
-            inv = ctx.obj["inventory_recs"] = _inventory.load(
-                app_cfg=app_cfg,
-                limits=ctx.params["limit"],
-                excludes=ctx.params["exclude"],
-            )
+            if max_startups := ctx.params.get("batch"):
+                app_cfg.concurrency.max_startups = max_startups
 
-            if not inv:
-                raise RuntimeError(
-                    f"No inventory matching limits in: {app_cfg.defaults.inventory}"
+            if max_sessions := ctx.params.get("sessions"):
+                app_cfg.concurrency.max_sessions = max_sessions
+
+            # a work queue worker backs up the records claimed from the work
+            # queue, and so does not use the inventory file.
+
+            if ctx.params.get("worker"):
+                inv = ctx.obj["inventory_recs"] = None
+
+            else:
+                inv = ctx.obj["inventory_recs"] = _inventory.load(
+                    app_cfg=app_cfg,
+                    limits=ctx.params["limit"],
+                    excludes=ctx.params["exclude"],
+                    stream=ctx.params.get("stream", False),
                 )
 
+                # the records of a streamed inventory are not known until the
+                # command reads them.
+
+                if not isinstance(inv, _inventory.InventoryStream) and not inv:
+                    raise RuntimeError(
+                        f"No inventory matching limits in: {app_cfg.defaults.inventory}"
+                    )
+
             # if there is jump host configuraiton then prepare for later use.
             if app_cfg.jumphost:
                 jumphosts.init_jumphosts(jumphost_specs=app_cfg.jumphost, inventory=inv)
@@ -136,7 +154,73 @@ opt_batch = click.option(
     "--batch",
     "-b",
     type=click.IntRange(1, 500),
-    help="inevntory record processing batch size",
+    help="maximum number of SSH logins in progress",
+)
+
+opt_sessions = click.option(
+    "--sessions",
+    "-s",
+    type=click.IntRange(1, 10000),
+    help="maximum number of SSH sessions in progress",
+)
+
+opt_resume = click.option(
+    "--resume",
+    metavar="RUN_ID",
+    help="resume the run, skipping the hosts that succeeded",
+)
+
+opt_only_failed = click.option(
+    "--only-failed",
+    is_flag=True,
+    help="only the hosts that failed in the last run",
+)
+
+opt_workers = click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(1, 1024),
+    help="number of worker processes",
+)
+
+opt_stream = click.option(
+    "--stream",
+    is_flag=True,
+    help="read the inventory records as they are used, rather than loading them",
+)
+
+
+class DurationParamType(click.ParamType):
+    """
+    A time duration, for example "45m", "1h30m", or "90s", converted to the
+    number of seconds.  A number without a unit is the number of seconds.
+    """
+
+    name = "duration"
+    UNITS = {"h": 3600, "m": 60, "s": 1}
+    DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)([hms])")
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, (int, float)):
+            return float(value)
+
+        value = value.strip().lower()
+        try:
+            return float(value)
+        except ValueError:
+            pass
+
+        parts = self.DURATION_RE.findall(value)
+        if not parts or "".join(num + unit for num, unit in parts) != value:
+            self.fail(f"{value} is not a valid duration, for example 45m", param, ctx)
+
+        return sum(float(num) * self.UNITS[unit] for num, unit in parts)
+
+
+opt_deadline = click.option(
+    "--deadline",
+    type=DurationParamType(),
+    help="stop the run after the duration, for example 45m",
 )
 
 opt_timeout = click.option(
@@ -7,9 +7,12 @@ from pathlib import Path
 
 from pydantic import (
     BaseModel,
+    confloat,
+    conint,
     SecretStr,
     BaseSettings,
     PositiveInt,
+    PositiveFloat,
     FilePath,
     Field,
     validator,
@@ -27,6 +30,12 @@ __all__ = [
     "LinterSpec",
     "GitSpec",
     "JumphostSpec",
+    "ConcurrencySpec",
+    "GroupLimitSpec",
+    "RetrySpec",
+    "TimeoutsSpec",
+    "WorkQueueSpec",
+    "MetricsSpec",
 ]
 
 _var_re = re.compile(
@@ -91,6 +100,7 @@ class DefaultCredential(Credential, BaseSettings):
 class Defaults(NoExtraBaseModel, BaseSettings):
     configs_dir: Optional[EnvExpand] = Field(..., env=("NETCFGBU_CONFIGSDIR", "PWD"))
     plugins_dir: Optional[EnvExpand] = Field(..., env=("NETCFGBU_PLUGINSDIR", "PWD"))
+    state_dir: Optional[EnvExpand] = Field(..., env=("NETCFGBU_STATEDIR", "PWD"))
     inventory: EnvExpand = Field(..., env="NETCFGBU_INVENTORY")
     credentials: DefaultCredential
 
@@ -110,6 +120,12 @@ class Defaults(NoExtraBaseModel, BaseSettings):
             value = value + "/plugins"
         return Path(value).absolute()
 
+    @validator("state_dir")
+    def _state_dir(cls, value):  # noqa
+        if value == os.getenv("PWD") and "/.netcfgbu" not in value:
+            value = value + "/.netcfgbu"
+        return Path(value).absolute()
+
 
 class FilePathEnvExpand(FilePath):
     """ A FilePath field whose value can interpolated from env vars """
@@ -158,6 +174,23 @@ class GitSpec(NoExtraBaseModel):
         return values
 
 
+class RetrySpec(NoExtraBaseModel):
+    max_attempts: PositiveInt = Field(consts.DEFAULT_RETRY_MAX_ATTEMPTS)
+    backoff_base: PositiveFloat = Field(consts.DEFAULT_RETRY_BACKOFF_BASE)
+    backoff_max: PositiveFloat = Field(consts.DEFAULT_RETRY_BACKOFF_MAX)
+    jitter: confloat(ge=0, le=1) = Field(consts.DEFAULT_RETRY_JITTER)
+    retry_on: List[str] = Field(consts.DEFAULT_RETRY_ON)
+
+
+class TimeoutsSpec(NoExtraBaseModel):
+    connect: Optional[PositiveFloat]
+    auth: Optional[PositiveFloat]
+    prompt: PositiveFloat = Field(consts.DEFAULT_PROMPT_TIMEOUT)
+    pre_get_config: PositiveFloat = Field(consts.DEFAULT_PRE_GET_CONFIG_TIMEOUT)
+    get_config: Optional[PositiveFloat]
+    save: Optional[PositiveFloat]
+
+
 class OSNameSpec(NoExtraBaseModel):
     credentials: Optional[List[Credential]]
     pre_get_config: Optional[Union[str, List[str]]]
@@ -167,6 +200,8 @@ class OSNameSpec(NoExtraBaseModel):
     timeout: PositiveInt = Field(consts.DEFAULT_GETCONFIG_TIMEOUT)
     ssh_configs: Optional[Dict]
     prompt_pattern: Optional[str]
+    retry: Optional[RetrySpec]
+    timeouts: TimeoutsSpec = TimeoutsSpec()
 
 
 class LinterSpec(NoExtraBaseModel):
@@ -202,6 +237,59 @@ class JumphostSpec(NoExtraBaseModel):
         return values["proxy"] if not value else value
 
 
+class GroupLimitSpec(NoExtraBaseModel):
+    column: str
+    limit: PositiveInt
+    limits: Optional[Dict[str, PositiveInt]]
+
+
+class ConcurrencySpec(NoExtraBaseModel):
+    max_startups: PositiveInt = Field(consts.DEFAULT_MAX_STARTUPS)
+    max_sessions: PositiveInt = Field(consts.DEFAULT_MAX_SESSIONS)
+    adaptive: bool = False
+    min_startups: PositiveInt = Field(consts.DEFAULT_MIN_STARTUPS)
+    startup_latency: PositiveFloat = Field(consts.DEFAULT_STARTUP_LATENCY)
+    groups: Optional[List[GroupLimitSpec]]
+
+
+class WorkQueueSpec(NoExtraBaseModel):
+    backend: Optional[str]
+    path: Optional[EnvExpand]
+    lease_timeout: PositiveInt = Field(consts.DEFAULT_WORKQUEUE_LEASE_TIMEOUT)
+    claim_batch: PositiveInt = Field(consts.DEFAULT_WORKQUEUE_CLAIM_BATCH)
+    poll_interval: PositiveFloat = Field(consts.DEFAULT_WORKQUEUE_POLL_INTERVAL)
+
+
+class ProbeSpec(NoExtraBaseModel):
+    timeout: PositiveFloat = Field(consts.DEFAULT_PROBE_TIMEOUT)
+    rate: Optional[PositiveFloat]
+    max_inflight: PositiveInt = Field(consts.DEFAULT_PROBE_MAX_INFLIGHT)
+    cache_ttl: conint(ge=0) = Field(consts.DEFAULT_PROBE_CACHE_TTL)
+    unreachable: str = Field(consts.DEFAULT_PROBE_UNREACHABLE)
+
+    @validator("unreachable")
+    def _unreachable(cls, value):  # noqa
+        if value not in ("defer", "skip"):
+            raise ValueError(
+                f"Invalid unreachable policy: {value}, expected defer|skip"
+            )
+        return value
+
+
+class DNSSpec(NoExtraBaseModel):
+    ttl: conint(ge=0) = Field(consts.DEFAULT_DNS_TTL)
+    timeout: PositiveFloat = Field(consts.DEFAULT_DNS_TIMEOUT)
+    max_inflight: PositiveInt = Field(consts.DEFAULT_DNS_MAX_INFLIGHT)
+    persist: bool = False
+
+
+class MetricsSpec(NoExtraBaseModel):
+    textfile: Optional[EnvExpand]
+    port: Optional[conint(ge=0, le=65535)]
+    host: str = Field(consts.DEFAULT_METRICS_HOST)
+    interval: PositiveFloat = Field(consts.DEFAULT_METRICS_INTERVAL)
+
+
 class AppConfig(NoExtraBaseModel):
     defaults: Defaults
     credentials: Optional[List[Credential]]
@@ -212,6 +300,12 @@ class AppConfig(NoExtraBaseModel):
     ssh_configs: Optional[Dict]
     git: Optional[List[GitSpec]]
     jumphost: Optional[List[JumphostSpec]]
+    concurrency: ConcurrencySpec = ConcurrencySpec()
+    retry: RetrySpec = RetrySpec()
+    workqueue: WorkQueueSpec = WorkQueueSpec()
+    metrics: MetricsSpec = MetricsSpec()
+    probe: ProbeSpec = ProbeSpec()
+    dns: DNSSpec = DNSSpec()
 
     @validator("os_name")
     def _linters(cls, v, values):  # noqa
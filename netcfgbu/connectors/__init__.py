@@ -3,6 +3,8 @@ from importlib import import_module
 
 from .basic import BasicSSHConnector
 from .basic import set_max_startups  # noqa
+from .basic import set_max_sessions  # noqa
+from .basic import set_concurrency  # noqa
 
 
 @lru_cache()
@@ -1,22 +1,31 @@
-from typing import Optional
+from typing import Optional, Tuple
+from time import monotonic
 import asyncio
 import io
 from pathlib import Path
 import re
 from copy import copy
 
-import aiofiles
 import asyncssh
 
 
-from netcfgbu.config_model import AppConfig, OSNameSpec, Credential
+from netcfgbu.config_model import AppConfig, OSNameSpec, Credential, ConcurrencySpec
 from netcfgbu.logger import get_logger
 from netcfgbu import consts
-from netcfgbu import linter
 from netcfgbu import jumphosts
+from netcfgbu import credhints
+from netcfgbu import resolver
+from netcfgbu.limiter import AdaptiveLimiter
+from netcfgbu.savefile import ConfigFileWriter, SAVE_UNCHANGED
+from netcfgbu.timing import PhaseTimer, TimingSSHClient
 
 
-__all__ = ["BasicSSHConnector", "set_max_startups"]
+__all__ = [
+    "BasicSSHConnector",
+    "set_max_startups",
+    "set_max_sessions",
+    "set_concurrency",
+]
 
 
 class BasicSSHConnector(object):
@@ -47,6 +56,10 @@ class BasicSSHConnector(object):
         The device CLI command(s) that when execute will disable paging so that
         when the show-running command is executed the output will not be
         blocked with a "--More--" user prompt.
+
+    Each phase of the backup process has a time budget, defined by the
+    os_spec `timeouts`; see `phase_timeout()`.  The duration of each phase is
+    recorded by the `timer` attribute.
     """
 
     PROMPT_PATTERN = re.compile(
@@ -62,7 +75,12 @@ class BasicSSHConnector(object):
     get_config = "show running-config"
     pre_get_config = None
 
+    # True when the device login is completed in-band, after the SSH
+    # connection, rather than by the SSH authentication.
+    IN_BAND_LOGIN = False
+
     _max_startups_sem4 = asyncio.Semaphore(consts.DEFAULT_MAX_STARTUPS)
+    _max_sessions_sem4 = asyncio.Semaphore(consts.DEFAULT_MAX_SESSIONS)
 
     def __init__(self, host_cfg: dict, os_spec: OSNameSpec, app_cfg: AppConfig):
         """
@@ -90,7 +108,7 @@ class BasicSSHConnector(object):
         self.os_name = host_cfg["os_name"]
 
         self.conn_args = {
-            "host": self.host_cfg.get("ipaddr") or self.host_cfg.get("host"),
+            "host": resolver.get_address(host_cfg),
             "known_hosts": None,
         }
 
@@ -108,10 +126,15 @@ class BasicSSHConnector(object):
 
         self._cur_prompt: Optional[str] = None
         self.config = None
+        self.config_writer: Optional[ConfigFileWriter] = None
         self.save_file = None
+        self.save_status: Optional[str] = None
         self.failed = None
+        self.login_cred: Optional[Tuple[int, str]] = None
+        self.timer = PhaseTimer()
 
         self.conn = None
+        self.client: Optional[TimingSSHClient] = None
         self.process: Optional[asyncssh.SSHClientProcess] = None
         self.creds = self._setup_creds()
 
@@ -122,6 +145,42 @@ class BasicSSHConnector(object):
     def set_max_startups(cls, max_startups):
         cls._max_startups_sem4 = asyncio.Semaphore(value=max_startups)
 
+    @classmethod
+    def set_max_sessions(cls, max_sessions):
+        cls._max_sessions_sem4 = asyncio.Semaphore(value=max_sessions)
+
+    @classmethod
+    def set_adaptive_startups(
+        cls, min_startups, max_startups, startup_latency
+    ) -> AdaptiveLimiter:
+        cls._max_startups_sem4 = AdaptiveLimiter(
+            min_limit=min_startups,
+            max_limit=max_startups,
+            target_latency=startup_latency,
+        )
+        return cls._max_startups_sem4
+
+    @property
+    def tcp_connected(self) -> bool:
+        """ True if the TCP connection of the last login attempt was made """
+        return bool(self.client and self.client.connected)
+
+    def phase_timeout(self, phase: str) -> Optional[float]:
+        """
+        Returns the timeout, in seconds, for the phase of the backup process;
+        one of "connect", "auth", "prompt", "pre_get_config", "get_config", or
+        "save".  The connect and get-config phases default to the os_spec
+        `timeout` value.  None indicates the phase is not limited, other than
+        by the phase that contains it.
+        """
+        if (timeout := getattr(self.os_spec.timeouts, phase)) is not None:
+            return timeout
+
+        if phase in ("connect", "get_config"):
+            return self.os_spec.timeout
+
+        return None
+
     # -------------------------------------------------------------------------
     #
     #                       Backup Config Coroutine Task
@@ -141,21 +200,39 @@ class BasicSSHConnector(object):
             examined once the backup process completes, or fails.
         """
 
-        async with await self.login():
-            try:
-                await self.get_running_config()
-                retval = True
-            except Exception as exc:
-                retval = exc
+        # the number of sessions in flight, from login through saving the
+        # configuration file, is controlled by a semaphore instance so that
+        # the server running this code does not run out of resources.
 
-            finally:
-                await self.close()
-
-        if self.config:
-            await self.save_config()
+        wait_start = monotonic()
+        async with self.__class__._max_sessions_sem4:
+            self.timer.add("session_wait", monotonic() - wait_start)
+            async with await self.login():
+                try:
+                    await self.get_running_config()
+                    retval = True
+                except Exception as exc:
+                    retval = exc
+
+                finally:
+                    await self.close()
+
+            if self.config or self.config_writer:
+                try:
+                    with self.timer.phase("save"):
+                        await asyncio.wait_for(
+                            self.save_config(), timeout=self.phase_timeout("save")
+                        )
+                except asyncio.TimeoutError:
+                    raise asyncio.TimeoutError("Timeout saving configuration")
 
         return retval
 
+    def login_succeeded(self):
+        """ Record the credential used to login as the hint for the host """
+        if self.login_cred:
+            credhints.set_hint(self.host_cfg, *self.login_cred)
+
     # -------------------------------------------------------------------------
     #
     #                       Test Login Coroutine Task
@@ -165,10 +242,20 @@ class BasicSSHConnector(object):
     async def test_login(self, timeout: int) -> Optional[str]:
         login_as = None
         self.os_spec.timeout = timeout
+        self.os_spec.timeouts = self.os_spec.timeouts.copy(update=dict(connect=None))
 
         try:
-            async with await self.login():
-                login_as = self.conn_args["username"]
+            async with self.__class__._max_sessions_sem4:
+                async with await self.login():
+                    # the in-band login succeeded once the prompt is read.
+                    if self.IN_BAND_LOGIN:
+                        await asyncio.wait_for(
+                            self.read_until_prompt(),
+                            timeout=self.phase_timeout("prompt"),
+                        )
+                        self.login_succeeded()
+
+                    login_as = self.conn_args["username"]
 
         except asyncssh.PermissionDenied:
             pass
@@ -183,12 +270,14 @@ class BasicSSHConnector(object):
 
     async def get_running_config(self):
         command = self.os_spec.get_config
-        timeout = self.os_spec.timeout
+        timeout = self.phase_timeout("get_config")
         log_msg = f"GET-CONFIG: {self.name} timeout={timeout}"
 
         if not self.process:
             self.log.info(log_msg)
-            res = await self.conn.run(command)
+            with self.timer.phase("get_config"):
+                res = await self.conn.run(command)
+            self.timer.config_bytes = len(res.stdout)
             self.conn.close()
             ln_at = res.stdout.find(command) + len(command) + 1
             self.config = res.stdout[ln_at:]
@@ -198,18 +287,41 @@ class BasicSSHConnector(object):
         paging_disabled = False
 
         try:
-            res = await asyncio.wait_for(self.read_until_prompt(), timeout=10)
+            with self.timer.phase("prompt"):
+                res = await asyncio.wait_for(
+                    self.read_until_prompt(), timeout=self.phase_timeout("prompt")
+                )
             at_prompt = True
+            self.login_succeeded()
             self.log.debug(f"AT-PROMPT: {res}")
 
-            res = await asyncio.wait_for(self.run_disable_paging(), timeout=10)
+            with self.timer.phase("pre_get_config"):
+                res = await asyncio.wait_for(
+                    self.run_disable_paging(),
+                    timeout=self.phase_timeout("pre_get_config"),
+                )
             paging_disabled = True
             self.log.debug(f"AFTER-PRE-GET-RUNNING: {res}")
 
+            # the configuration content is written to the file as it is read
+            # from the device, rather than stored in memory.
+
             self.log.info(log_msg)
-            self.config = await asyncio.wait_for(
-                self.run_command(command), timeout=timeout
-            )
+            writer = self.make_config_writer()
+            await writer.open()
+
+            try:
+                with self.timer.phase("get_config"):
+                    await asyncio.wait_for(
+                        self.run_command(command, writer=writer), timeout=timeout
+                    )
+            except BaseException:
+                await writer.abort()
+                raise
+            finally:
+                self.timer.config_bytes = writer.received
+
+            self.config_writer = writer
 
         except asyncio.TimeoutError:
             if not at_prompt:
@@ -258,7 +370,8 @@ class BasicSSHConnector(object):
         This coroutine is used to execute the SSH login process to the target device.
         Each of the `credentials` provided in the app-configure are tried in the order
         they were provided in the configuration file.  If the host configuraiton included
-        credentials, these will be used first.
+        credentials, these will be used first.  If a credential was used to login to
+        this host on a prior run, that credential is tried before all others.
 
         When this coroutine completes successfully the `conn` attribute is
         initialized to the SSHClientConnection.  If this SSHSpec requires the
@@ -281,7 +394,14 @@ class BasicSSHConnector(object):
             When attempting to connect to a device exceeds the timeout value.
         """
 
-        timeout: int = self.os_spec.timeout
+        # the auth timeout, when defined, limits the SSH key exchange and
+        # authentication once the TCP connection is made; and so the time to
+        # login is limited by the connect and auth timeouts combined.
+
+        timeout = self.phase_timeout("connect")
+        if auth_timeout := self.phase_timeout("auth"):
+            self.conn_args["login_timeout"] = auth_timeout
+            timeout += auth_timeout
 
         # if this host requires the use of a JumpHost, then configure the
         # connection args to include the supporting jumphost tunnel connection.
@@ -293,7 +413,10 @@ class BasicSSHConnector(object):
         # the number of max setup connections is controlled by a semaphore
         # instance so that the server running this code is not overwhelmed.
 
-        for try_cred in self.creds:
+        for cred_index, try_cred in credhints.order_credentials(
+            self.host_cfg, self.creds
+        ):
+            client = None
             try:
                 self.failed = None
                 self.conn_args.update(
@@ -302,7 +425,9 @@ class BasicSSHConnector(object):
                         "password": try_cred.password.get_secret_value(),
                     }
                 )
+                wait_start = monotonic()
                 async with self.__class__._max_startups_sem4:
+                    self.timer.add("startup_wait", monotonic() - wait_start)
 
                     login_msg = (
                         f"LOGIN: {self.name} ({self.os_name}) timeout={timeout}s "
@@ -310,11 +435,27 @@ class BasicSSHConnector(object):
                     )
 
                     self.log.info(login_msg)
+
+                    # the client records the connect, handshake, and auth
+                    # phases of each credential attempt.
+
+                    client = self.client = TimingSSHClient(self.timer)
                     self.conn = await asyncio.wait_for(
-                        asyncssh.connect(**self.conn_args), timeout
+                        asyncssh.connect(
+                            client_factory=lambda: client, **self.conn_args
+                        ),
+                        timeout,
                     )
                     self.log.info(f"CONNECTED: {self.name}")
 
+                    # the credential hint is recorded once the login has
+                    # completed, which for an in-band login is when the
+                    # device prompt is read.
+
+                    self.login_cred = (cred_index, try_cred.username)
+                    if not self.IN_BAND_LOGIN:
+                        self.login_succeeded()
+
                     if self.os_spec.pre_get_config:
                         self.process = await self.conn.create_process(
                             term_type="vt100", encoding=None
@@ -323,6 +464,7 @@ class BasicSSHConnector(object):
                     return self.conn
 
             except asyncssh.PermissionDenied as exc:
+                client.auth_failed()
                 self.failed = exc
                 continue
 
@@ -344,18 +486,56 @@ class BasicSSHConnector(object):
     #
     # -------------------------------------------------------------------------
 
-    async def read_until_prompt(self):
-        output = b""
+    async def read_until_prompt(self, writer: Optional[ConfigFileWriter] = None):
+        """
+        Read the process output until the CLI prompt is found, returning the
+        output before the prompt line.  The prompt is only checked against
+        the last (partial) line of the output, and only the newly read bytes
+        are scanned to find the start of that line, so that the cost of
+        reading a large output is linear in its size.
+
+        When the `writer` is provided, the complete lines are written as they
+        are read, and only the last partial line is held in memory.  In this
+        case the return value is empty.
+        """
+        output = bytearray()
+        nl_at = -1
+
         while True:
-            output += await self.process.stdout.read(io.DEFAULT_BUFFER_SIZE)
-            nl_at = output.rfind(b"\n")
-            if mobj := self.PROMPT_PATTERN.match(output[nl_at + 1 :]):
+            chunk = await self.process.stdout.read(io.DEFAULT_BUFFER_SIZE)
+            if not chunk:
+                raise asyncio.IncompleteReadError(partial=bytes(output), expected=None)
+
+            scan_at = len(output)
+            output += chunk
+
+            if (found := output.rfind(b"\n", scan_at)) >= 0:
+                nl_at = found
+
+            if mobj := self.PROMPT_PATTERN.match(output, nl_at + 1):
                 self._cur_prompt = mobj.group(1)
-                return output[0:nl_at]
+                if writer:
+                    if nl_at >= 0:
+                        await writer.write(bytes(output[0 : nl_at + 1]))
+                    return b""
+
+                del output[nl_at:]
+                return bytes(output)
+
+            if writer and nl_at >= 0:
+                await writer.write(bytes(output[0 : nl_at + 1]))
+                del output[0 : nl_at + 1]
+                nl_at = -1
 
-    async def run_command(self, command):
+    async def run_command(self, command, writer: Optional[ConfigFileWriter] = None):
         wr_cmd = command + "\n"
         self.process.stdin.write(wr_cmd.encode("utf-8"))
+
+        if writer:
+            # the writer skips the command echo in the output.
+            writer.skip = len(wr_cmd) + 1
+            return await self.read_until_prompt(writer=writer)
+
         output = await self.read_until_prompt()
         return output[len(wr_cmd) + 1 :]
 
@@ -379,25 +559,77 @@ class BasicSSHConnector(object):
     #
     # -------------------------------------------------------------------------
 
-    async def save_config(self):
-        if isinstance(self.config, bytes):
-            self.config = self.config.decode("utf-8", "ignore")
-
-        config_content = self.config.replace("\r", "")
+    def make_config_writer(self) -> ConfigFileWriter:
+        """
+        Returns the writer used to store the configuration content to the
+        file in the configs directory; applying the linter if one is defined
+        for the os_name.
+        """
+        self.save_file = Path(self.app_cfg.defaults.configs_dir) / f"{self.name}.cfg"
 
+        lint_spec = None
         if linter_name := self.os_spec.linter:
             lint_spec = self.app_cfg.linters[linter_name]
-            orig = config_content
-            config_content = linter.lint_content(config_content, lint_spec)
-            if orig == config_content:
-                self.log.debug(f"LINT no change on {self.name}")
 
-        self.save_file = Path(self.app_cfg.defaults.configs_dir) / f"{self.name}.cfg"
+        return ConfigFileWriter(self.save_file, lint_spec=lint_spec)
 
-        async with aiofiles.open(self.save_file, mode="w+") as ofile:
-            await ofile.write(config_content)
-            await ofile.write("\n")
+    async def save_config(self):
+        # if the configuration content was not written as it was read from the
+        # device, then write the content now.
+
+        if not self.config_writer:
+            writer = self.make_config_writer()
+            await writer.open()
+            try:
+                if isinstance(self.config, str):
+                    self.config = self.config.encode("utf-8")
+                await writer.write(self.config)
+            except BaseException:
+                await writer.abort()
+                raise
+
+            self.config_writer = writer
+
+        try:
+            self.save_status = await self.config_writer.close()
+        except BaseException:
+            await self.config_writer.abort()
+            raise
+
+        if self.os_spec.linter:
+            self.timer.add("lint", self.config_writer.lint_time)
+
+        if self.save_status == SAVE_UNCHANGED:
+            self.log.debug(f"SAVE no change on {self.name}")
+
+        if self.os_spec.linter and not self.config_writer.linted:
+            self.log.debug(f"LINT no change on {self.name}")
 
 
 def set_max_startups(count, cls=BasicSSHConnector):
     cls.set_max_startups(count)
+
+
+def set_max_sessions(count, cls=BasicSSHConnector):
+    cls.set_max_sessions(count)
+
+
+def set_concurrency(
+    spec: ConcurrencySpec, cls=BasicSSHConnector
+) -> Optional[AdaptiveLimiter]:
+    """
+    Setup the SSH startups and sessions limits from the concurrency spec.  When
+    the adaptive option is enabled, the startups limit is controlled by an
+    AdaptiveLimiter and that instance is returned; otherwise None is returned.
+    """
+    cls.set_max_sessions(spec.max_sessions)
+
+    if not spec.adaptive:
+        cls.set_max_startups(spec.max_startups)
+        return None
+
+    return cls.set_adaptive_startups(
+        min_startups=spec.min_startups,
+        max_startups=spec.max_startups,
+        startup_latency=spec.startup_latency,
+    )
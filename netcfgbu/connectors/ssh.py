@@ -3,15 +3,22 @@ from netcfgbu.connectors.basic import BasicSSHConnector
 
 
 class LoginPromptUserPass(BasicSSHConnector):
+    IN_BAND_LOGIN = True
+
     async def login(self):
         await super(LoginPromptUserPass, self).login()
 
-        await asyncio.wait_for(self.process.stdout.readuntil(b"User:"), timeout=10)
+        # the in-band login prompts are part of the auth phase.
+        timeout = self.phase_timeout("auth") or self.phase_timeout("prompt")
+
+        await asyncio.wait_for(self.process.stdout.readuntil(b"User:"), timeout=timeout)
 
         username = (self.conn_args["username"] + "\n").encode("utf-8")
         self.process.stdin.write(username)
 
-        await asyncio.wait_for(self.process.stdout.readuntil(b"Password:"), timeout=10)
+        await asyncio.wait_for(
+            self.process.stdout.readuntil(b"Password:"), timeout=timeout
+        )
 
         password = (self.conn_args["password"] + "\n").encode("utf-8")
         self.process.stdin.write(password)
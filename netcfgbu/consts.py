@@ -1,7 +1,30 @@
 DEFAULT_MAX_STARTUPS = 100
+DEFAULT_MAX_SESSIONS = 500
+DEFAULT_MIN_STARTUPS = 10
+DEFAULT_STARTUP_LATENCY = 5.0
 DEFAULT_LOGIN_TIMEOUT = 30
 DEFAULT_GETCONFIG_TIMEOUT = 60
 DEFAULT_PROBE_TIMEOUT = 10
+DEFAULT_PROBE_MAX_INFLIGHT = 1000
+DEFAULT_PROBE_CACHE_TTL = 900
+DEFAULT_PROBE_UNREACHABLE = "defer"
+DEFAULT_SSH_PORT = 22
+JUMPHOST_MAX_CONNECTS = 10
+DEFAULT_DNS_TTL = 300
+DEFAULT_DNS_TIMEOUT = 5.0
+DEFAULT_DNS_MAX_INFLIGHT = 32
+DEFAULT_PROMPT_TIMEOUT = 10
+DEFAULT_PRE_GET_CONFIG_TIMEOUT = 10
+DEFAULT_RETRY_MAX_ATTEMPTS = 1
+DEFAULT_RETRY_BACKOFF_BASE = 2.0
+DEFAULT_RETRY_BACKOFF_MAX = 60.0
+DEFAULT_RETRY_JITTER = 0.5
+DEFAULT_WORKQUEUE_LEASE_TIMEOUT = 300
+DEFAULT_WORKQUEUE_CLAIM_BATCH = 20
+DEFAULT_WORKQUEUE_POLL_INTERVAL = 2.0
+DEFAULT_METRICS_HOST = "127.0.0.1"
+DEFAULT_METRICS_INTERVAL = 15.0
+DEFAULT_RETRY_ON = ["TimeoutError", "ConnectionRefusedError", "ConnectionResetError"]
 
 # DEFAULT_CONFIG_STARTS_AFTER = "Current configuration"
 # DEFAULT_CONFIG_ENDS_WITH = "end"
@@ -0,0 +1,127 @@
+"""
+This module contains the credential hints store.  When a login succeeds the
+credential that was used is recorded for the host, so that on later runs the
+login process tries that credential first.  The store records only the
+credential username and its position in the configured credentials list;
+the password is never stored.
+
+The hints are stored as a JSON file in the application state directory.
+"""
+
+# -----------------------------------------------------------------------------
+# System Imports
+# -----------------------------------------------------------------------------
+
+from typing import Optional, List, Dict, Tuple
+from pathlib import Path
+
+# -----------------------------------------------------------------------------
+# Private Imports
+# -----------------------------------------------------------------------------
+
+from .config_model import Credential
+from .statefile import JsonStateFile
+
+__all__ = [
+    "load_hints",
+    "save_hints",
+    "get_hints",
+    "merge_hints",
+    "get_hint",
+    "set_hint",
+    "order_credentials",
+]
+
+HINTS_FILENAME = "credential-hints.json"
+
+_hints_file = JsonStateFile(HINTS_FILENAME)
+
+
+# -----------------------------------------------------------------------------
+#
+#                               CODE BEGINS
+#
+# -----------------------------------------------------------------------------
+
+
+def load_hints(state_dir: Path):
+    """
+    Load the credential hints from the state directory.  If the hints file
+    does not exist, or cannot be read, then the store starts empty.
+    """
+    _hints_file.load(state_dir)
+
+
+def save_hints():
+    """
+    Save the credential hints to the state directory, if any hints were
+    changed since they were loaded.
+    """
+    _hints_file.save()
+
+
+def get_hints() -> Dict:
+    """ Return all of the credential hints, keyed by host """
+    return _hints_file.data
+
+
+def merge_hints(hints: Dict):
+    """ Merge the credential hints recorded by another process """
+    _hints_file.merge(hints)
+
+
+def get_hint(host_cfg: dict) -> Optional[Dict]:
+    """
+    Return the credential hint for the inventory record, or None if there is
+    no hint.  A hint is ignored if the inventory record os_name has changed
+    since the hint was recorded.
+    """
+    hint = _hints_file.data.get(host_cfg.get("host"))
+    if not hint or hint.get("os_name") != host_cfg.get("os_name"):
+        return None
+
+    return hint
+
+
+def set_hint(host_cfg: dict, index: int, username: str):
+    """
+    Record that the credential at `index`, with `username`, was used to login
+    to the host.
+    """
+    hint = dict(os_name=host_cfg.get("os_name"), index=index, username=username)
+    host = host_cfg.get("host")
+
+    if _hints_file.data.get(host) != hint:
+        _hints_file.data[host] = hint
+        _hints_file.changed = True
+
+
+def order_credentials(
+    host_cfg: dict, creds: List[Credential]
+) -> List[Tuple[int, Credential]]:
+    """
+    Return the list of (index, credential) in the order they should be tried
+    to login to the host.  The credential from the hint is first, if any,
+    followed by the remaining credentials in the configured order.
+    """
+    ordered = list(enumerate(creds))
+
+    if not (hint := get_hint(host_cfg)):
+        return ordered
+
+    index, username = hint.get("index"), hint.get("username")
+
+    # use the credential position if the username still matches, otherwise
+    # the first credential with that username.
+
+    if not (
+        isinstance(index, int)
+        and 0 <= index < len(creds)
+        and creds[index].username == username
+    ):
+        index = next((i for i, cred in ordered if cred.username == username), None)
+
+    if index is None:
+        return ordered
+
+    return [ordered[index]] + ordered[:index] + ordered[index + 1 :]
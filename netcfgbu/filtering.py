@@ -42,6 +42,7 @@ class RegexFilter(Filter):
 
     def __init__(self, fieldname: str, expr: str) -> None:
         self.fieldname = fieldname
+        self.expr = expr
         try:
             self.re = re.compile(f"^{expr}$", re.IGNORECASE)
         except re.error as exc:
@@ -106,6 +107,7 @@ def mk_file_filter(filepath, key):
         return rec[key] in filter_hostnames
 
     op_filter.hostnames = filter_hostnames
+    op_filter.key = key
     op_filter.__doc__ = f"file: {filepath})"
     op_filter.__name__ = op_filter.__doc__
     op_filter.__qualname__ = op_filter.__doc__
@@ -185,5 +187,6 @@ def create_filter(
     filter_fn = create_filter_function(op_filters, optest_fn)
     filter_fn.op_filters = op_filters
     filter_fn.constraints = constraints
+    filter_fn.include = include
 
     return filter_fn
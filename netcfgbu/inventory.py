@@ -1,35 +1,537 @@
+from typing import Optional, List, Dict, Iterable, Iterator, Set, Sequence, Union
+from collections import Counter
+from collections.abc import Iterable as IterableABC, Sequence as SequenceABC
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, chain, islice, repeat
 from pathlib import Path
+import csv
+import hashlib
+import io
 import os
+import pickle
+import re
+import socket
+import sys
 
 
 from .logger import get_logger
-from .filtering import create_filter
-from .filetypes import CommentedCsvReader
+from .filtering import create_filter, Filter, RegexFilter, IPFilter
 from .config_model import AppConfig, InventorySpec
 
+# a filter expression without any of these characters matches only the value
+# itself, and so is looked up in the column index.
+regex_special_re = re.compile(r"[.^$*+?{}\[\]\\|()]")
 
-def load(app_cfg: AppConfig, limits=None, excludes=None):
+# the records are created in chunks when iterating the inventory.
+RECORDS_CHUNK_SIZE = 1024
 
+
+class InventoryColumn(object):
+    """
+    The values of one inventory field.  Each distinct value is stored once, as
+    an interned string, and each row holds the code of its value; so that a
+    filter on the field is evaluated once for each distinct value rather than
+    for each row.  The mapping of each value to its code is kept only when
+    `lookup` is True, for the exact lookup of a value.
+    """
+
+    __slots__ = ("values", "codes", "value_codes", "_index", "_lower_codes")
+
+    def __init__(self, value_codes: Dict[str, int], codes: array, lookup: bool = False):
+        """
+        Create the column of the code of each row, and of the mapping of each
+        distinct value to its code, in code order.
+        """
+        self.codes = codes
+        self.values: List[str] = list(map(sys.intern, value_codes))
+        self.value_codes: Optional[Dict[str, int]] = value_codes if lookup else None
+        self._index = None
+        self._lower_codes = None
+
+    def build_index(self):
+        """
+        Build the index of the rows of each value; the rows are ordered by
+        value code, and `starts[code]` is the position of the first row of the
+        code, so that the index is two arrays rather than a list per value.
+        """
+        if self._index:
+            return
+
+        # the sort is stable, and so the rows of each value are in order.
+
+        counts = Counter(self.codes)
+        counts = [0] + [counts[code] for code in range(len(self.values))]
+        starts = array("I", accumulate(counts))
+        order = array("I", sorted(range(len(self.codes)), key=self.codes.__getitem__))
+        self._index = (starts, order)
+
+    def rows(self, codes: Iterable[int]) -> Set[int]:
+        """ Returns the rows that have any of the value codes """
+        self.build_index()
+        starts, order = self._index
+        rows = set()
+        for code in codes:
+            rows.update(order[starts[code] : starts[code + 1]])
+        return rows
+
+    def lower_codes(self, value: str) -> List[int]:
+        """ Returns the codes of the values equal to `value`, ignoring case """
+        if self._lower_codes is None:
+            self._lower_codes = dict()
+            for code, col_value in enumerate(self.values):
+                self._lower_codes.setdefault(col_value.lower(), []).append(code)
+
+        return self._lower_codes.get(value.lower(), [])
+
+
+def ip_to_int(value: str) -> Optional[tuple]:
+    """ Returns the tuple (IP version, address as int), or None if not an IP """
+    for version, family in ((4, socket.AF_INET), (6, socket.AF_INET6)):
+        try:
+            return version, int.from_bytes(socket.inet_pton(family, value), "big")
+        except OSError:
+            continue
+
+    return None
+
+
+class Inventory(SequenceABC):
+    """
+    The Inventory is the sequence of inventory records, stored by column
+    rather than as a dictionary for each record; each record is created as a
+    dictionary when it is accessed.  The `host` and `os_name` fields, and the
+    `index_fields`, are indexed when the inventory is created; any other
+    field is indexed when it is first filtered.  The `ipaddr` field has an
+    index of the addresses in numeric order, so that a prefix filter is a
+    range lookup.
+
+    The `select` method returns the Inventory of the records that match the
+    filter expressions, sharing the columns and indexes of this inventory.
+    """
+
+    INDEX_FIELDS = ("host", "os_name")
+
+    def __init__(
+        self,
+        field_names: Sequence[str],
+        rows: Iterable[Sequence[str]] = (),
+        index_fields: Iterable[str] = (),
+    ):
+        """
+        Create the inventory of the rows, each a sequence of the field values
+        in the order of the `field_names`; a missing value is an empty string.
+        """
+        self.field_names = list(field_names)
+        field_count = len(self.field_names)
+
+        # the value of each row is coded as the row is read, so that only the
+        # codes, and the distinct values, of each column are held.
+
+        col_codes = [array("I") for _ in self.field_names]
+        col_value_codes = [dict() for _ in self.field_names]
+        columns = list(zip(col_value_codes, col_codes))
+        count = 0
+
+        for row in rows:
+            count += 1
+            if len(row) != field_count:
+                row = list(islice(chain(row, repeat("")), field_count))
+
+            for (value_codes, codes), value in zip(columns, row):
+                codes.append(value_codes.setdefault(value, len(value_codes)))
+
+        self._columns = {
+            fieldn: InventoryColumn(value_codes, codes, lookup=(fieldn == "host"))
+            for fieldn, (value_codes, codes) in zip(self.field_names, columns)
+        }
+        self._count = count
+        self._ip_index: Dict[str, Dict] = dict()
+        self._rows: Optional[array] = None
+        self.build_indexes(index_fields)
+
+    @classmethod
+    def from_csv(cls, fileio, index_fields: Iterable[str] = ()) -> "Inventory":
+        """
+        Returns the Inventory of the CSV file; the first row is the field
+        names, and the rows that start with "#" are comments.
+        """
+        iter_rows = csv.reader(fileio)
+        field_names = next(iter_rows, [])
+        rows = (row for row in iter_rows if row and not row[0].startswith("#"))
+        return cls(field_names, rows, index_fields=index_fields)
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> "Inventory":
+        """ Returns the Inventory of the records, using the first record fields """
+        field_names = list(records[0]) if records else []
+        rows = ([rec.get(fieldn) or "" for fieldn in field_names] for rec in records)
+        return cls(field_names, rows)
+
+    # -------------------------------------------------------------------------
+    #                             Sequence API
+    # -------------------------------------------------------------------------
+
+    def __len__(self):
+        return self._count if self._rows is None else len(self._rows)
+
+    def __getitem__(self, item):
+        rows = self._view_rows
+
+        if isinstance(item, slice):
+            return list(self._records(rows[item]))
+
+        return next(self._records([rows[item]]))
+
+    def __iter__(self) -> Iterator[Dict]:
+        rows = self._view_rows
+        for start in range(0, len(rows), RECORDS_CHUNK_SIZE):
+            yield from self._records(rows[start : start + RECORDS_CHUNK_SIZE])
+
+    def __repr__(self):
+        return f"Inventory(records={len(self)}, field_names={self.field_names})"
+
+    # -------------------------------------------------------------------------
+    #                             Inventory API
+    # -------------------------------------------------------------------------
+
+    def build_indexes(self, index_fields: Iterable[str] = ()):
+        """ Build the indexes of the `host`, `os_name`, and `index_fields` """
+        for fieldn in (*self.INDEX_FIELDS, *index_fields):
+            if fieldn in self._columns:
+                self._columns[fieldn].build_index()
+
+    def column(self, fieldn: str) -> Iterator[str]:
+        """ Returns the values of the field, in record order """
+        column = self._columns[fieldn]
+        values, codes = column.values, column.codes
+        rows = self._view_rows
+        return (values[codes[row]] for row in rows)
+
+    def get(self, host: str) -> Optional[Dict]:
+        """ Returns the record of the host, or None """
+        column = self._columns["host"]
+        if (code := column.value_codes.get(host)) is None:
+            return None
+
+        rows = self._in_view(column.rows([code]))
+        return next(self._records([min(rows)])) if rows else None
+
+    def select(self, constraints: List[str], include: bool = True) -> "Inventory":
+        """
+        Returns the Inventory of the records that match the filter constraints,
+        as documented by `create_filter`; each constraint is evaluated as an
+        index lookup.  When `include` is False the records that match any of
+        the constraints are excluded.
+        """
+        filter_fn = create_filter(
+            constraints=constraints, field_names=self.field_names, include=include
+        )
+        return self._view(self.match_rows(filter_fn.op_filters, include))
+
+    def match_rows(self, op_filters: List[Filter], include: bool = True) -> Set[int]:
+        """
+        Returns the rows of this inventory that match all of the filters, when
+        `include` is True; or that match none of the filters, when False.
+        """
+        view_rows = self._view_rows
+
+        if not include:
+            excluded = set().union(*map(self._filter_rows, op_filters))
+            return {row for row in view_rows if row not in excluded}
+
+        if not op_filters:
+            return set(view_rows)
+
+        matched = self._filter_rows(op_filters[0])
+        for op_filter in op_filters[1:]:
+            matched &= self._filter_rows(op_filter)
+
+        return self._in_view(matched)
+
+    # -------------------------------------------------------------------------
+    #                                Helpers
+    # -------------------------------------------------------------------------
+
+    @property
+    def _view_rows(self) -> Sequence[int]:
+        return range(self._count) if self._rows is None else self._rows
+
+    def _records(self, rows: Sequence[int]) -> Iterator[Dict]:
+        """ Returns the records of the rows, creating the values by column """
+        col_values = [
+            list(map(column.values.__getitem__, map(column.codes.__getitem__, rows)))
+            for column in self._columns.values()
+        ]
+        return map(dict, map(zip, repeat(self.field_names), zip(*col_values)))
+
+    def _view(self, rows: Set[int]) -> "Inventory":
+        view = object.__new__(Inventory)
+        view.__dict__.update(self.__dict__)
+        view._rows = array("I", sorted(rows))
+        return view
+
+    def _in_view(self, rows: Set[int]) -> Set[int]:
+        return rows if self._rows is None else rows.intersection(self._rows)
+
+    def _filter_rows(self, op_filter: Filter) -> Set[int]:
+        """ Returns all of the rows that match the filter, using the indexes """
+
+        if isinstance(op_filter, IPFilter):
+            return self._ip_rows(op_filter.fieldname, op_filter.ip)
+
+        if isinstance(op_filter, RegexFilter):
+            column = self._columns[op_filter.fieldname]
+            if not regex_special_re.search(op_filter.expr):
+                return column.rows(column.lower_codes(op_filter.expr))
+
+            match = op_filter.re.match
+            return column.rows(
+                code for code, value in enumerate(column.values) if match(value)
+            )
+
+        if hostnames := getattr(op_filter, "hostnames", None):
+            column = self._columns["host"]
+            codes = column.value_codes
+            return column.rows(codes[host] for host in set(hostnames) if host in codes)
+
+        # a filter of one field, for example a file filter, is evaluated once
+        # for each distinct value of the field.
+
+        fieldn = getattr(op_filter, "fieldname", getattr(op_filter, "key", None))
+        if column := self._columns.get(fieldn):
+            return column.rows(
+                code
+                for code, value in enumerate(column.values)
+                if op_filter({fieldn: value})
+            )
+
+        # any other filter is evaluated for each record, created in chunks.
+
+        rows = set()
+        for start in range(0, self._count, RECORDS_CHUNK_SIZE):
+            chunk = range(start, min(start + RECORDS_CHUNK_SIZE, self._count))
+            rows.update(
+                row for row, rec in zip(chunk, self._records(chunk)) if op_filter(rec)
+            )
+
+        return rows
+
+    def _ip_rows(self, fieldn: str, network) -> Set[int]:
+        """
+        Returns the rows with an address in the network.  The index holds the
+        addresses of each IP version in numeric order, with the row of each,
+        so that the network is a range of the index.
+        """
+        if (ip_index := self._ip_index.get(fieldn)) is None:
+            column = self._columns[fieldn]
+            by_version = {4: list(), 6: list()}
+            for code, value in enumerate(column.values):
+                if ip_int := ip_to_int(value):
+                    by_version[ip_int[0]].append((ip_int[1], code))
+
+            ip_index = self._ip_index[fieldn] = dict()
+            for version, addrs in by_version.items():
+                addrs.sort()
+                ip_index[version] = (
+                    [addr for addr, _ in addrs],
+                    [code for _, code in addrs],
+                )
+
+        addrs, codes = ip_index[network.version]
+        first = bisect_left(addrs, int(network.network_address))
+        last = bisect_right(addrs, int(network.broadcast_address))
+        return self._columns[fieldn].rows(codes[first:last])
+
+
+class InventoryStream(IterableABC):
+    """
+    The inventory records of the CSV file, read as they are iterated rather
+    than loaded; the filters are applied to each record as it is read, so
+    that only the records in progress are in memory.  The filter expressions
+    are checked when the stream is created, using the field names in the
+    first row of the file.  The `count` is the number of records yielded.
+    """
+
+    def __init__(self, inventory_file: Path, limits=None, excludes=None):
+        self.inventory_file = Path(inventory_file)
+        with self.inventory_file.open() as ifile:
+            self.field_names = next(csv.reader(ifile), [])
+
+        self.filters = list()
+        if limits:
+            self.filters.append(
+                create_filter(constraints=limits, field_names=self.field_names)
+            )
+        if excludes:
+            self.filters.append(
+                create_filter(
+                    constraints=excludes, field_names=self.field_names, include=False
+                )
+            )
+
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Dict]:
+        field_names = self.field_names
+
+        with self.inventory_file.open() as ifile:
+            iter_rows = csv.reader(ifile)
+            next(iter_rows, None)
+
+            iter_recs = (
+                dict(zip(field_names, chain(row, repeat(""))))
+                for row in iter_rows
+                if row and not row[0].startswith("#")
+            )
+            for filter_fn in self.filters:
+                iter_recs = filter(filter_fn, iter_recs)
+
+            for rec in iter_recs:
+                self.count += 1
+                yield rec
+
+
+# -----------------------------------------------------------------------------
+#
+#                              Inventory Cache
+#
+# -----------------------------------------------------------------------------
+
+# the cache format version, changed when the Inventory attributes change; a
+# cache of another version is rebuilt.
+INVENTORY_CACHE_VERSION = 1
+
+
+def cache_filepath(inventory_file: Path, state_dir: Path) -> Path:
+    """ Returns the cache file path of the inventory file, in the state directory """
+    inventory_file = inventory_file.absolute()
+    key = hashlib.sha256(str(inventory_file).encode()).hexdigest()[:16]
+    return Path(state_dir) / f"inventory-{inventory_file.stem}-{key}.cache"
+
+
+def read_cache(cache_file: Path, source_only=False):
+    """
+    Returns the source information of the cache file, or the cached Inventory
+    if not `source_only`; or None if the cache file is missing or cannot be
+    read.  The cache file holds the pickled source information, followed by
+    the pickled Inventory; so that a stale cache is found without loading it.
+    """
+    try:
+        with cache_file.open("rb") as ifile:
+            source = pickle.load(ifile)
+            return source if source_only else pickle.load(ifile)
+
+    except FileNotFoundError:
+        return None
+
+    except Exception as exc:
+        get_logger().warning(f"INVENTORY: unable to load cache {cache_file}: {exc}")
+        return None
+
+
+def save_cache(cache_file: Path, source: Dict, inventory: Inventory):
+    """
+    Save the Inventory to the cache file, with the source information.  The
+    file is replaced atomically so that a concurrent run does not read a
+    partial file.
+    """
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_file.open("wb") as ofile:
+            pickle.dump(source, ofile, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(inventory, ofile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+
+    except OSError as exc:
+        get_logger().warning(f"INVENTORY: unable to save cache {cache_file}: {exc}")
+
+
+def load_inventory_file(
+    inventory_file: Path, state_dir: Path, index_fields: Iterable[str] = ()
+) -> Inventory:
+    """
+    Returns the Inventory of the CSV file, using the cache in the state
+    directory when the file has not changed since the cache was saved, so that
+    the file is not parsed.  The file is unchanged if its size and modification
+    time are the same; otherwise if the digest of its content is the same.
+    When the file has changed it is parsed, and the cache is saved.
+    """
+    cache_file = cache_filepath(inventory_file, state_dir)
+    f_stat = inventory_file.stat()
+    source = dict(
+        version=INVENTORY_CACHE_VERSION,
+        path=str(inventory_file.absolute()),
+        size=f_stat.st_size,
+        mtime_ns=f_stat.st_mtime_ns,
+    )
+
+    content = None
+    cached = read_cache(cache_file, source_only=True) or dict()
+    unchanged = all(cached.get(key) == value for key, value in source.items())
+
+    # the file was touched, or copied, but the content may not have changed;
+    # if so the cache is saved again with the new size and modification time.
+
+    if cached and not unchanged:
+        content = inventory_file.read_bytes()
+        source["sha256"] = hashlib.sha256(content).hexdigest()
+        unchanged = all(
+            cached.get(key) == source[key] for key in ("version", "path", "sha256")
+        )
+    else:
+        source["sha256"] = cached.get("sha256")
+
+    inventory = read_cache(cache_file) if unchanged else None
+
+    if inventory is None:
+        if content is None:
+            content = inventory_file.read_bytes()
+            source["sha256"] = hashlib.sha256(content).hexdigest()
+        inventory = Inventory.from_csv(io.TextIOWrapper(io.BytesIO(content)))
+
+    if cached != source:
+        save_cache(cache_file, source, inventory)
+
+    inventory.build_indexes(index_fields)
+    return inventory
+
+
+def load(
+    app_cfg: AppConfig, limits=None, excludes=None, stream=False
+) -> Union[Inventory, InventoryStream]:
+    """
+    Returns the Inventory of the inventory file records that match the limits
+    and do not match the excludes.  When `stream` is True, returns the
+    InventoryStream of those records instead, so that the records are read as
+    they are used.
+    """
     inventory_file = Path(app_cfg.defaults.inventory)
     if not inventory_file.exists():
         raise FileNotFoundError(
             f"Inventory file does not exist: {inventory_file.absolute()}"
         )
 
-    iter_recs = CommentedCsvReader(inventory_file.open())
-    field_names = iter_recs.fieldnames
+    if stream:
+        return InventoryStream(inventory_file, limits=limits, excludes=excludes)
+
+    # the concurrency group columns are indexed, since the records are
+    # grouped by these fields.
+
+    index_fields = [group.column for group in app_cfg.concurrency.groups or []]
+
+    inventory = load_inventory_file(
+        inventory_file, app_cfg.defaults.state_dir, index_fields=index_fields
+    )
 
     if limits:
-        filter_fn = create_filter(constraints=limits, field_names=field_names)
-        iter_recs = filter(filter_fn, iter_recs)
+        inventory = inventory.select(limits)
 
     if excludes:
-        filter_fn = create_filter(
-            constraints=excludes, field_names=field_names, include=False
-        )
-        iter_recs = filter(filter_fn, iter_recs)
+        inventory = inventory.select(excludes, include=False)
 
-    return list(iter_recs)
+    return inventory
 
 
 def build(inv_def: InventorySpec) -> int:
@@ -8,7 +8,7 @@ the netcfgbu tool.
 # System Imports
 # -----------------------------------------------------------------------------
 
-from typing import Optional, List, Dict, AnyStr
+from typing import Optional, List, Dict, AnyStr, Union
 import asyncio
 from urllib.parse import urlparse
 
@@ -24,7 +24,10 @@ from first import first
 # -----------------------------------------------------------------------------
 
 from .config_model import JumphostSpec
+from .aiofut import iter_completed
+from .consts import JUMPHOST_MAX_CONNECTS
 from .filtering import create_filter
+from .inventory import Inventory, InventoryStream
 from .logger import get_logger
 
 
@@ -129,7 +132,22 @@ class JumpHost(object):
 # -----------------------------------------------------------------------------
 
 
-def init_jumphosts(jumphost_specs: List[JumphostSpec], inventory: List[Dict]):
+def _spec_field_names(jumphost_specs: List[JumphostSpec]) -> List[str]:
+    """ Returns the inventory field names used by the jump host filters """
+    return sorted(
+        {
+            expr.partition("=")[0]
+            for spec in jumphost_specs
+            for expr in (*(spec.include or ()), *(spec.exclude or ()))
+            if not expr.startswith("@")
+        }
+    )
+
+
+def init_jumphosts(
+    jumphost_specs: List[JumphostSpec],
+    inventory: Union[Inventory, InventoryStream, List[Dict], None],
+):
     """
     Initialize the required set of Jump Host instances so that they can be used
     when netcfgbu attempts to access devices that require the use of jump
@@ -141,24 +159,53 @@ def init_jumphosts(jumphost_specs: List[JumphostSpec], inventory: List[Dict]):
         List of jump host specs from the app config instance
 
     inventory:
-        List of inventory records; these are used to determine which, if any,
-        of the configured jump hosts are actually required for use given any
-        provided inventory filtering.
+        The Inventory, or list of inventory records; these are used to
+        determine which, if any, of the configured jump hosts are actually
+        required for use given any provided inventory filtering.  The records
+        of an InventoryStream are not known until they are read, nor are the
+        records of a work queue worker, given as None; and so all of the jump
+        hosts are used.
     """
-    field_names = inventory[0].keys()
+    if inventory is None or isinstance(inventory, InventoryStream):
+        if inventory is None:
+            field_names = _spec_field_names(jumphost_specs)
+        else:
+            field_names = inventory.field_names
+
+        JumpHost.available = [
+            JumpHost(spec, field_names=field_names) for spec in jumphost_specs
+        ]
+        return
+
+    if not isinstance(inventory, Inventory):
+        inventory = Inventory.from_records(inventory)
 
     # create a list of jump host instances so that we can determine which, if
     # any, will be used during the execution of the command.
 
-    jh_list = [JumpHost(spec, field_names=field_names) for spec in jumphost_specs]
+    jh_list = [
+        JumpHost(spec, field_names=inventory.field_names) for spec in jumphost_specs
+    ]
 
-    req_jh = {
-        use_jh
-        for rec in inventory
-        if (use_jh := first(jh for jh in jh_list if jh.filter(rec)))
-    }
+    # each record uses the first jump host that matches it, and so a jump host
+    # is required if it matches any of the records not matched by the jump
+    # hosts before it.  The filters are evaluated using the inventory indexes.
 
-    JumpHost.available = list(req_jh)
+    remaining = inventory.match_rows([])
+    req_jh = list()
+
+    for jh in jh_list:
+        if not remaining:
+            break
+
+        jh_rows = set().union(
+            *(inventory.match_rows(_f.op_filters, _f.include) for _f in jh.filters)
+        )
+        if jh_rows := jh_rows & remaining:
+            req_jh.append(jh)
+            remaining -= jh_rows
+
+    JumpHost.available = req_jh
 
 
 async def connect_jumphosts():
@@ -175,9 +222,13 @@ async def connect_jumphosts():
     log = get_logger()
     ok = True
 
-    for jh in JumpHost.available:
+    # the jump hosts are connected at the same time, rather than each in
+    # turn, so that the backup is not delayed by the timeout of each one.
+
+    work = ((jh, jh.connect()) for jh in JumpHost.available)
+    async for jh, task in iter_completed(work, max_inflight=JUMPHOST_MAX_CONNECTS):
         try:
-            await jh.connect()
+            task.result()
             log.info(f"JUMPHOST: connected to {jh.name}")
 
         except (asyncio.TimeoutError, asyncssh.Error) as exc:
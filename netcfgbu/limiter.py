@@ -0,0 +1,229 @@
+"""
+This module contains the adaptive concurrency limiter that can be used in
+place of the fixed SSH startups semaphore.  The limiter uses an
+additive-increase / multiplicative-decrease (AIMD) algorithm: the limit is
+raised slowly while the SSH handshakes complete within the target latency,
+and cut quickly when handshakes fail with a timeout or connection reset.
+Until the first cut, the limit is in a slow-start phase, as in TCP, where
+the limit is raised for each handshake within the target latency; so that the
+limit doubles for each limit-worth of handshakes, rather than growing by one.
+"""
+
+# -----------------------------------------------------------------------------
+# System Imports
+# -----------------------------------------------------------------------------
+
+from typing import Optional
+from collections import deque
+from contextvars import ContextVar
+from time import monotonic
+import asyncio
+
+# -----------------------------------------------------------------------------
+# Private Imports
+# -----------------------------------------------------------------------------
+
+from .logger import get_logger
+
+__all__ = ["AdaptiveLimiter"]
+
+
+# -----------------------------------------------------------------------------
+#
+#                              CODE BEGINS
+#
+# -----------------------------------------------------------------------------
+
+
+class AdaptiveLimiter(object):
+    """
+    An AdaptiveLimiter instance is used as an async context manager, in the
+    same manner as an asyncio.Semaphore.  The time spent within the context
+    is the latency sample; an exception raised within the context is the
+    error sample.
+
+    Examples
+    --------
+
+        limiter = AdaptiveLimiter(min_limit=10, max_limit=100, target_latency=5)
+
+        async with limiter:
+            conn = await asyncssh.connect(...)
+    """
+
+    # the exceptions that indicate the system is overloaded; the limit is cut
+    # when any of these are raised from within the context.
+
+    OVERLOAD_ERRORS = (asyncio.TimeoutError, ConnectionResetError)
+
+    def __init__(
+        self,
+        min_limit: int,
+        max_limit: int,
+        target_latency: float,
+        decrease_factor: float = 0.5,
+        name: Optional[str] = "max-startups",
+    ):
+        """
+        Parameters
+        ----------
+        min_limit:
+            The limit never goes below this value; this is also the initial
+            limit value.  A value above the `max_limit` is lowered to it.
+
+        max_limit:
+            The limit never goes above this value.
+
+        target_latency:
+            The time, in seconds, a healthy context completes within.  The
+            limit is only increased by samples within this latency.
+
+        decrease_factor:
+            The limit is multiplied by this value on an overload error.
+
+        name:
+            Used to identify the limiter in the log messages.
+        """
+        self.min_limit = min(min_limit, max_limit)
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.name = name
+        self.log = get_logger()
+
+        self._limit = self.min_limit
+        self._in_use = 0
+        self._credit = 0.0
+        self._slow_start = True
+        self._waiters = deque()
+
+        # the epoch is incremented on each decrease so that the errors from
+        # contexts that started before the decrease are not counted again.
+
+        self._epoch = 0
+
+        # the context start time and epoch are stored per asyncio task since
+        # the limiter instance is shared by all of the tasks.
+
+        self._started = ContextVar(f"{name}-started")
+
+    @property
+    def limit(self) -> int:
+        """Returns the current concurrency limit"""
+        return self._limit
+
+    @property
+    def in_use(self) -> int:
+        """Returns the number of contexts currently in progress"""
+        return self._in_use
+
+    # -------------------------------------------------------------------------
+    #
+    #                           Acquire / Release
+    #
+    # -------------------------------------------------------------------------
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+
+        while self._in_use >= self._limit:
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_waiters()
+                raise
+
+        self._in_use += 1
+
+    def release(self):
+        self._in_use -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        available = self._limit - self._in_use
+        while available > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                available -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        self._started.set((monotonic(), self._epoch))
+
+    async def __aexit__(self, exc_type, exc, tb):
+        start_tm, epoch = self._started.get()
+        self.release()
+        self.record(
+            latency=monotonic() - start_tm,
+            overloaded=isinstance(exc, self.OVERLOAD_ERRORS),
+            epoch=epoch,
+        )
+
+    # -------------------------------------------------------------------------
+    #
+    #                          Adjust Limit (AIMD)
+    #
+    # -------------------------------------------------------------------------
+
+    def record(self, latency: float, overloaded: bool, epoch: Optional[int] = None):
+        """
+        Adjust the limit given a context sample.
+
+        Parameters
+        ----------
+        latency:
+            The time, in seconds, the context was in progress.
+
+        overloaded:
+            True when the context ended with one of the OVERLOAD_ERRORS.
+
+        epoch:
+            The limiter epoch when the context started; when not provided the
+            current epoch is used.
+        """
+        if epoch is None:
+            epoch = self._epoch
+
+        if overloaded:
+            if epoch == self._epoch:
+                self._decrease()
+            return
+
+        if latency > self.target_latency:
+            return
+
+        if self._slow_start:
+            self._increase()
+            return
+
+        # additive increase: a full limit-worth of healthy samples is needed
+        # to increase the limit by one.
+
+        self._credit += 1 / self._limit
+        if self._credit >= 1:
+            self._credit = 0.0
+            self._increase()
+
+    def _increase(self):
+        if self._limit >= self.max_limit:
+            return
+
+        self._limit += 1
+        self.log.info(f"ADAPTIVE: {self.name} increased to {self._limit}")
+        self._wake_waiters()
+
+    def _decrease(self):
+        self._epoch += 1
+        self._credit = 0.0
+        self._slow_start = False
+
+        new_limit = max(self.min_limit, int(self._limit * self.decrease_factor))
+        if new_limit == self._limit:
+            return
+
+        self._limit = new_limit
+        self.log.info(f"ADAPTIVE: {self.name} decreased to {self._limit}")
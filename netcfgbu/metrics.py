@@ -0,0 +1,349 @@
+"""
+This module contains the metrics of a backup run, in the Prometheus text
+exposition format, so that a long-running backup can be monitored while it
+is in progress.  The metrics are exported to a file for the node-exporter
+textfile collector, and/or served over HTTP on a local port, as defined in the
+[metrics] configuration section.
+
+The metrics are kept as plain counters that are updated as each host starts
+and completes; the exposition text is only rendered when the file is written
+or the endpoint is scraped, by a background thread, so that the metrics can
+remain enabled for large inventories.
+"""
+
+# -----------------------------------------------------------------------------
+# System Imports
+# -----------------------------------------------------------------------------
+
+from typing import Optional, Dict, List, Tuple, Callable
+from collections import Counter
+from bisect import bisect_left
+from errno import errorcode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import os
+import re
+import threading
+
+# -----------------------------------------------------------------------------
+# Private Imports
+# -----------------------------------------------------------------------------
+
+from .config_model import MetricsSpec
+from .timing import PhaseTimer
+
+__all__ = ["BackupMetrics", "RelayMetrics", "WorkerMetrics", "MetricsExporter"]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# the phases that are waits on the concurrency semaphores, and the name of the
+# semaphore in the metrics.
+
+WAIT_PHASES = {"session_wait": "sessions", "startup_wait": "startups"}
+
+# the failure reason categories that are not the error class name.
+
+REASON_CATEGORIES = {
+    "TIMEOUT": "TIMEOUT",
+    "TimeoutError": "TIMEOUT",
+    "DeadlineExpired": "DEADLINE",
+    "UNREACHABLE": "UNREACHABLE",
+}
+
+errno_re = re.compile(r"\[Errno (\d+)\]")
+
+
+# -----------------------------------------------------------------------------
+#
+#                              CODE BEGINS
+#
+# -----------------------------------------------------------------------------
+
+
+def _label_value(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_label_value(value)}"' for name, value in labels.items())
+
+
+def reason_category(reason: Optional[str]) -> str:
+    """
+    Returns the category of the failure reason, as reported by err_reason(),
+    used as the metrics label: the errno name, the error class name, TIMEOUT,
+    DEADLINE, or UNREACHABLE; or OTHER.  The reason text often includes the
+    host name or address, and so is not used as the label.
+    """
+    if not reason:
+        return "OTHER"
+
+    name, _, text = reason.partition(":")
+    if category := REASON_CATEGORIES.get(re.split(r"[\s(]", name, maxsplit=1)[0]):
+        return category
+
+    if (found := errno_re.search(text)) and (
+        errno_name := errorcode.get(int(found.group(1)))
+    ):
+        return errno_name
+
+    return name if name.isidentifier() else "OTHER"
+
+
+class BackupMetrics(object):
+    """
+    The BackupMetrics records the progress of a backup run: the hosts in
+    progress, the hosts completed and failed by reason, the configuration bytes
+    transferred, the time waiting on the concurrency semaphores, and a
+    histogram of the duration of each phase by os_name.
+    """
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+    def __init__(self):
+        self.in_flight = 0
+        self.completed = 0
+        self.failed: Counter = Counter()
+        self.config_bytes = 0
+        self.semaphore_wait: Counter = Counter()
+
+        # (phase, os_name) -> [count per bucket ..., count of +Inf, sum]
+        self.histograms: Dict[Tuple[str, str], List[float]] = dict()
+
+    def host_started(self):
+        self.in_flight += 1
+
+    def host_stopped(self, rec: Dict, timer: Optional[PhaseTimer]):
+        """ Record the phase durations of the host once its backup has stopped """
+        self.in_flight -= 1
+        self.add_timing(rec, timer)
+
+    def add_timing(self, rec: Dict, timer: Optional[PhaseTimer]):
+        """ Record the phase durations, and configuration bytes, of the host """
+        if not timer:
+            return
+
+        os_name = rec.get("os_name") or ""
+        n_buckets = len(self.BUCKETS)
+
+        for phase, seconds in timer.samples:
+            if (hist := self.histograms.get((phase, os_name))) is None:
+                hist = self.histograms[(phase, os_name)] = [0] * (n_buckets + 1) + [0.0]
+
+            hist[bisect_left(self.BUCKETS, seconds)] += 1
+            hist[-1] += seconds
+
+            if semaphore := WAIT_PHASES.get(phase):
+                self.semaphore_wait[semaphore] += seconds
+
+        self.config_bytes += timer.config_bytes
+
+    def host_result(self, ok: bool, reason: Optional[str] = None):
+        """ Record the result of the host, with the err_reason of a failure """
+        if ok:
+            self.completed += 1
+        else:
+            self.failed[reason_category(reason)] += 1
+
+    # -------------------------------------------------------------------------
+    #                             Exposition
+    # -------------------------------------------------------------------------
+
+    def render(self) -> str:
+        """ Returns the metrics in the Prometheus text exposition format """
+        lines = [
+            "# HELP netcfgbu_sessions_in_flight Hosts with a backup in progress",
+            "# TYPE netcfgbu_sessions_in_flight gauge",
+            f"netcfgbu_sessions_in_flight {self.in_flight}",
+            "# HELP netcfgbu_hosts_completed_total Hosts backed up",
+            "# TYPE netcfgbu_hosts_completed_total counter",
+            f"netcfgbu_hosts_completed_total {self.completed}",
+            "# HELP netcfgbu_hosts_failed_total Hosts that failed, by reason category",
+            "# TYPE netcfgbu_hosts_failed_total counter",
+        ]
+
+        # the dictionaries are copied, as a whole, since they are updated by
+        # the event loop thread while rendered by the exporter thread.
+
+        lines.extend(
+            f"netcfgbu_hosts_failed_total{{{_labels(reason=reason)}}} {count}"
+            for reason, count in sorted(list(self.failed.items()))
+        )
+
+        lines.extend(
+            [
+                "# HELP netcfgbu_config_bytes_total Configuration bytes transferred",
+                "# TYPE netcfgbu_config_bytes_total counter",
+                f"netcfgbu_config_bytes_total {self.config_bytes}",
+                "# HELP netcfgbu_semaphore_wait_seconds_total Time waiting on the "
+                "concurrency limits",
+                "# TYPE netcfgbu_semaphore_wait_seconds_total counter",
+            ]
+        )
+
+        lines.extend(
+            f"netcfgbu_semaphore_wait_seconds_total{{{_labels(semaphore=name)}}} "
+            f"{self.semaphore_wait[name]:.6f}"
+            for name in WAIT_PHASES.values()
+        )
+
+        lines.extend(
+            [
+                "# HELP netcfgbu_phase_duration_seconds Duration of each backup phase",
+                "# TYPE netcfgbu_phase_duration_seconds histogram",
+            ]
+        )
+
+        for (phase, os_name), hist in sorted(list(self.histograms.items())):
+            labels = _labels(phase=phase, os_name=os_name)
+            hist = list(hist)
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS, hist):
+                cumulative += count
+                lines.append(
+                    f'netcfgbu_phase_duration_seconds_bucket{{{labels},le="{bound}"}} '
+                    f"{cumulative}"
+                )
+
+            cumulative += hist[-2]
+            lines.extend(
+                [
+                    f'netcfgbu_phase_duration_seconds_bucket{{{labels},le="+Inf"}} '
+                    f"{cumulative}",
+                    f"netcfgbu_phase_duration_seconds_sum{{{labels}}} {hist[-1]:.6f}",
+                    f"netcfgbu_phase_duration_seconds_count{{{labels}}} {cumulative}",
+                ]
+            )
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, filepath: Path):
+        """
+        Write the metrics to the file for the textfile collector; the file is
+        written to a temporary file and renamed so that the collector does not
+        read a partial file.
+        """
+        filepath = Path(filepath)
+        tmp_filepath = filepath.with_name(f".{filepath.name}.tmp")
+        tmp_filepath.write_text(self.render())
+        os.replace(tmp_filepath, filepath)
+
+
+class RelayMetrics(object):
+    """
+    The RelayMetrics passes the host progress of a `--workers` process to the
+    `send` function, as the name of the BackupMetrics method and its
+    arguments, so that it is recorded by the metrics of the parent process.
+    """
+
+    def __init__(self, send: Callable):
+        self.send = send
+
+    def host_started(self):
+        self.send("host_started")
+
+    def host_stopped(self, rec: Dict, timer: Optional[PhaseTimer]):
+        # only the os_name of the record is used by the metrics.
+        self.send("host_stopped", dict(os_name=rec.get("os_name")), timer)
+
+
+class WorkerMetrics(BackupMetrics):
+    """
+    The WorkerMetrics of a `--worker` process also keep the phase durations of
+    each host, including all of its attempts, until the result of the host is
+    completed in the work queue; so that the coordinator can record them.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.timers: Dict[int, PhaseTimer] = dict()
+
+    def host_stopped(self, rec: Dict, timer: Optional[PhaseTimer]):
+        super().host_stopped(rec, timer)
+        if timer:
+            self.timers.setdefault(id(rec), PhaseTimer()).merge(timer)
+
+    def pop_timing(self, rec: Dict) -> Optional[Dict]:
+        """ Returns the phase durations of the host, as PhaseTimer.to_dict() """
+        timer = self.timers.pop(id(rec), None)
+        return timer.to_dict() if timer else None
+
+
+class MetricsExporter(object):
+    """
+    The MetricsExporter exports the metrics while the backup is in progress,
+    using background threads: the textfile is written every `interval`
+    seconds, and when stopped; and the HTTP endpoint serves the metrics at any
+    path.
+
+    Examples
+    --------
+
+        exporter = MetricsExporter(app_cfg.metrics, metrics)
+        exporter.start()
+        try:
+            ...
+        finally:
+            exporter.stop()
+    """
+
+    def __init__(self, spec: MetricsSpec, metrics: BackupMetrics):
+        self.spec = spec
+        self.metrics = metrics
+        self.server: Optional[ThreadingHTTPServer] = None
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = list()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.spec.textfile or self.spec.port is not None)
+
+    def start(self):
+        if self.spec.port is not None:
+            self.server = ThreadingHTTPServer(
+                (self.spec.host, self.spec.port), self._make_handler()
+            )
+            self.server.daemon_threads = True
+            self._start_thread(self.server.serve_forever)
+
+        if self.spec.textfile:
+            self._start_thread(self._write_textfile)
+
+    def stop(self):
+        self._stopped.set()
+
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+        for thread in self._threads:
+            thread.join()
+
+        if self.spec.textfile:
+            self.metrics.write_textfile(self.spec.textfile)
+
+    def _start_thread(self, target):
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _write_textfile(self):
+        while not self._stopped.wait(self.spec.interval):
+            self.metrics.write_textfile(self.spec.textfile)
+
+    def _make_handler(self):
+        metrics = self.metrics
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):  # noqa
+                content = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        return MetricsHandler
@@ -1,5 +1,6 @@
 from netcfgbu.connectors import get_connector_class
 from netcfgbu.config_model import AppConfig, OSNameSpec
+from netcfgbu.consts import DEFAULT_SSH_PORT
 
 
 def get_os_spec(rec, app_cfg: AppConfig):
@@ -8,6 +9,20 @@ def get_os_spec(rec, app_cfg: AppConfig):
     return os_specs.get(os_name) or OSNameSpec()
 
 
+def get_ssh_port(rec, app_cfg: AppConfig) -> int:
+    """
+    Returns the SSH port used to connect to the host; the port in the os_name
+    ssh_configs takes precedence over the port in the global ssh_configs, as
+    it does for the connector.
+    """
+    os_spec_def = get_os_spec(rec, app_cfg)
+    for ssh_configs in (os_spec_def.ssh_configs, app_cfg.ssh_configs):
+        if ssh_configs and "port" in ssh_configs:
+            return int(ssh_configs["port"])
+
+    return DEFAULT_SSH_PORT
+
+
 def make_host_connector(rec, app_cfg: AppConfig):
     os_spec_def = get_os_spec(rec, app_cfg)
     os_spec_cls = get_connector_class(os_spec_def.connection)
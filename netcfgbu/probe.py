@@ -1,15 +1,38 @@
 """
 This module contains the probe coroutine used to validate that a target device
-has a given port open.
+has a given port open, and the bulk probe engine used to check the
+reachability of an entire inventory.
 """
 
 # -----------------------------------------------------------------------------
 # System Imports
 # -----------------------------------------------------------------------------
 
+from typing import Optional, Iterable, AsyncIterable, Tuple, Dict, Any, Union
+from collections import deque
+from ipaddress import ip_address
+from functools import partial
 import asyncio
+import errno
+import os
+import socket
+import struct
 
-__all__ = ["probe"]
+# -----------------------------------------------------------------------------
+# Private Imports
+# -----------------------------------------------------------------------------
+
+from . import consts
+
+__all__ = ["probe", "BulkProbe"]
+
+# the connect_ex results of a connect that is in progress.
+CONNECT_IN_PROGRESS = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN)
+
+# the probe sockets are closed with a reset, rather than a FIN, so that the
+# probe of a large inventory does not leave a socket in TIME_WAIT for each
+# host, and the device does not wait for the SSH client banner.
+LINGER_RESET = struct.pack("ii", 1, 0)
 
 
 # -----------------------------------------------------------------------------
@@ -42,10 +65,14 @@ async def probe(host, timeout: int, port=22, raise_exc=False) -> bool:
     """
 
     loop = asyncio.get_running_loop()
-    coro = loop.create_connection(asyncio.BaseProtocol, host=host, port=port)
+    coro = loop.create_connection(asyncio.Protocol, host=host, port=port)
 
     try:
-        await asyncio.wait_for(coro, timeout=timeout)
+        # the connection is only used to check the port, and so the transport
+        # is closed rather than left for the garbage collector.
+
+        transport_protocol = await asyncio.wait_for(coro, timeout=timeout)
+        transport_protocol[0].close()
         return True
 
     except asyncio.TimeoutError:
@@ -53,3 +80,214 @@ async def probe(host, timeout: int, port=22, raise_exc=False) -> bool:
             raise
 
     return False
+
+
+class BulkProbe(object):
+    """
+    The BulkProbe checks the TCP port of a large number of hosts, using a
+    non-blocking socket for each connect and the event loop selector to wait
+    for the connects to complete; there is no task or transport for each
+    host.  The number of connects in progress, and so the number of open
+    sockets, is limited to `max_inflight`; and the rate at which connects are
+    started to `rate` connects per second, if given.
+
+    Each target is a tuple (key, host, port); the host is an IP address or a
+    host name, which is resolved before the connect.  The result of each
+    target is True if the port accepted the connection, or the exception:
+    asyncio.TimeoutError if the connect did not complete within `timeout`
+    seconds, or the OSError of the failed connect.
+
+    Examples
+    --------
+
+        prober = BulkProbe(timeout=5, rate=5000)
+        targets = ((rec, rec["ipaddr"], 22) for rec in inventory)
+
+        async for rec, result in prober.run(targets):
+            ok = result is True
+    """
+
+    def __init__(
+        self,
+        timeout: float,
+        rate: Optional[float] = None,
+        max_inflight: int = consts.DEFAULT_PROBE_MAX_INFLIGHT,
+    ):
+        self.timeout = timeout
+        self.rate = rate
+        self.max_inflight = max_inflight
+        self.peak_inflight = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiter: Optional[asyncio.Future] = None
+
+        # token -> [key, socket, resolver task]
+        self._inflight: Dict[int, list] = dict()
+
+        # (deadline, token) in the order the probes started; since the
+        # timeout is the same for every probe, the deadlines are in order.
+        self._expiry = deque()
+
+        # (key, result) of the completed probes not yet yielded.
+        self._done = deque()
+        self._token = 0
+
+    async def run(
+        self, targets: Iterable[Tuple[Any, str, int]]
+    ) -> AsyncIterable[Tuple[Any, Union[bool, Exception]]]:
+        """ Probe the targets, yielding the tuple (key, result) as each completes """
+        loop = self._loop = asyncio.get_running_loop()
+        targets = iter(targets)
+        exhausted = False
+
+        # the rate limit is a token bucket that allows a burst of 50ms of
+        # connects, so that the connects are started in batches.
+
+        burst = max(1.0, self.rate / 20) if self.rate else None
+        tokens = burst
+        last_refill = loop.time()
+
+        try:
+            while True:
+                now = loop.time()
+                if self.rate:
+                    tokens = min(burst, tokens + (now - last_refill) * self.rate)
+                    last_refill = now
+
+                while not exhausted and len(self._inflight) < self.max_inflight:
+                    if self.rate and tokens < 1:
+                        break
+
+                    if (target := next(targets, None)) is None:
+                        exhausted = True
+                        break
+
+                    if self.rate:
+                        tokens -= 1
+
+                    self._start(*target, deadline=now + self.timeout)
+
+                self.peak_inflight = max(self.peak_inflight, len(self._inflight))
+                self._expire(now)
+
+                while self._done:
+                    yield self._done.popleft()
+
+                if exhausted and not self._inflight:
+                    return
+
+                # wait for a connect to complete, the next connect to expire,
+                # or the rate limit to allow the next connect.
+
+                wake_at = self._expiry[0][0] if self._expiry else None
+                if (
+                    self.rate
+                    and not exhausted
+                    and len(self._inflight) < self.max_inflight
+                ):
+                    rate_at = now + (1 - tokens) / self.rate
+                    wake_at = min(wake_at, rate_at) if wake_at else rate_at
+
+                await self._wait(wake_at)
+
+        finally:
+            for token in list(self._inflight):
+                self._finish(token, None)
+            self._done.clear()
+
+    # -------------------------------------------------------------------------
+    #                                Helpers
+    # -------------------------------------------------------------------------
+
+    def _start(self, key, host: str, port: int, deadline: float):
+        token = self._token = self._token + 1
+        self._inflight[token] = [key, None, None]
+        self._expiry.append((deadline, token))
+
+        try:
+            addr = ip_address(host)
+        except ValueError:
+            task = asyncio.ensure_future(
+                self._loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            )
+            self._inflight[token][2] = task
+            task.add_done_callback(partial(self._resolved, token, port))
+            return
+
+        family = socket.AF_INET6 if addr.version == 6 else socket.AF_INET
+        self._connect(token, family, (str(addr), port))
+
+    def _resolved(self, token: int, port: int, task: asyncio.Task):
+        if task.cancelled() or token not in self._inflight:
+            return
+
+        self._inflight[token][2] = None
+        if exc := task.exception():
+            self._finish(token, exc)
+            return
+
+        family, _, _, _, sockaddr = task.result()[0]
+        self._connect(token, family, sockaddr)
+
+    def _connect(self, token: int, family: int, sockaddr: Tuple):
+        try:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+        except OSError as exc:
+            self._finish(token, exc)
+            return
+
+        self._inflight[token][1] = sock
+        sock.setblocking(False)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, LINGER_RESET)
+
+        if (err := sock.connect_ex(sockaddr)) in CONNECT_IN_PROGRESS:
+            self._loop.add_writer(sock.fileno(), self._connected, token)
+        else:
+            self._finish(token, self._result(err))
+
+    def _connected(self, token: int):
+        if (entry := self._inflight.get(token)) is None:
+            return
+
+        err = entry[1].getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        self._finish(token, self._result(err))
+
+    @staticmethod
+    def _result(err: int) -> Union[bool, OSError]:
+        return True if not err else OSError(err, os.strerror(err))
+
+    def _finish(self, token: int, result):
+        key, sock, task = self._inflight.pop(token)
+
+        if sock:
+            self._loop.remove_writer(sock.fileno())
+            sock.close()
+
+        if task:
+            task.cancel()
+
+        self._done.append((key, result))
+        self._wake()
+
+    def _wake(self):
+        if self._waiter and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def _expire(self, now: float):
+        while self._expiry and self._expiry[0][0] <= now:
+            _, token = self._expiry.popleft()
+            if token in self._inflight:
+                self._finish(token, asyncio.TimeoutError())
+
+    async def _wait(self, wake_at: Optional[float]):
+        if self._done:
+            return
+
+        waiter = self._waiter = self._loop.create_future()
+        handle = self._loop.call_at(wake_at, self._wake) if wake_at else None
+        try:
+            await waiter
+        finally:
+            if handle:
+                handle.cancel()
+            self._waiter = None
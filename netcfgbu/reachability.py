@@ -0,0 +1,160 @@
+"""
+This module contains the reachability cache.  The result of each probe, and
+each backup that failed to connect, is recorded for the host, so that a later
+backup run knows which hosts were recently unreachable.  The backup either
+defers those hosts to the end of the run, or skips them, until the cache TTL
+expires; so that the backup does not spend a worker, and the login timeout,
+on each host that is known to be down.
+
+The cache is stored as a JSON file in the application state directory.
+"""
+
+# -----------------------------------------------------------------------------
+# System Imports
+# -----------------------------------------------------------------------------
+
+from typing import Optional, List, Dict, Tuple, Iterable, Iterator
+from pathlib import Path
+import asyncio
+import time
+
+# -----------------------------------------------------------------------------
+# Private Imports
+# -----------------------------------------------------------------------------
+
+from .statefile import JsonStateFile
+from .scheduler import DeadlineExpired
+
+__all__ = [
+    "load_reachability",
+    "save_reachability",
+    "get_reachability",
+    "merge_reachability",
+    "record_reachable",
+    "record_unreachable",
+    "is_unreachable_error",
+    "get_unreachable",
+    "partition_unreachable",
+    "iter_reachable",
+    "UNREACHABLE_DEFER",
+    "UNREACHABLE_SKIP",
+]
+
+REACHABILITY_FILENAME = "reachability.json"
+
+# the backup policy for the hosts that were recently unreachable.
+UNREACHABLE_DEFER = "defer"
+UNREACHABLE_SKIP = "skip"
+
+_reach_file = JsonStateFile(REACHABILITY_FILENAME)
+
+
+# -----------------------------------------------------------------------------
+#
+#                               CODE BEGINS
+#
+# -----------------------------------------------------------------------------
+
+
+def load_reachability(state_dir: Path):
+    """ Load the reachability cache from the state directory """
+    _reach_file.load(state_dir)
+
+
+def save_reachability():
+    """ Save the reachability cache to the state directory, if changed """
+    _reach_file.save()
+
+
+def get_reachability() -> Dict:
+    """ Return all of the reachability entries, keyed by host """
+    return _reach_file.data
+
+
+def merge_reachability(data: Dict):
+    """ Merge the reachability entries recorded by another process """
+    _reach_file.merge(data)
+
+
+def record_reachable(host_cfg: dict):
+    """ Record that the host accepted a connection """
+    host = host_cfg.get("host")
+    if (entry := _reach_file.data.get(host)) is None or not entry.get("ok"):
+        _reach_file.data[host] = dict(ok=True)
+        _reach_file.changed = True
+
+
+def record_unreachable(host_cfg: dict, reason: str):
+    """
+    Record that the host did not accept a connection, with the reason; the
+    count is the number of consecutive failures.
+    """
+    host = host_cfg.get("host")
+    entry = _reach_file.data.get(host) or dict(ok=True)
+    count = 1 if entry.get("ok") else entry.get("count", 0) + 1
+
+    _reach_file.data[host] = dict(ok=False, reason=reason, ts=time.time(), count=count)
+    _reach_file.changed = True
+
+
+def is_unreachable_error(exc) -> bool:
+    """
+    Returns True if the backup exception, raised before the TCP connection was
+    made, means the host is unreachable; the run deadline is not.  A failure
+    once the TCP connection is made, for example an SSH handshake or
+    authentication timeout, does not mean the host is unreachable.
+    """
+    return isinstance(exc, (OSError, asyncio.TimeoutError)) and not isinstance(
+        exc, DeadlineExpired
+    )
+
+
+def get_unreachable(host_cfg: dict, ttl: float) -> Optional[Dict]:
+    """
+    Return the reachability entry of the host if it was unreachable within
+    the last `ttl` seconds, or None.
+    """
+    entry = _reach_file.data.get(host_cfg.get("host"))
+    if not entry or entry.get("ok") or time.time() - entry.get("ts", 0) >= ttl:
+        return None
+
+    return entry
+
+
+def partition_unreachable(
+    inventory_recs: List[Dict], ttl: float
+) -> Tuple[List[Dict], List[Tuple[Dict, Dict]]]:
+    """
+    Returns the list of inventory records that were not recently unreachable,
+    in the given order; and the list of (rec, entry) of the records that were.
+    """
+    if not ttl:
+        return list(inventory_recs), []
+
+    reachable, unreachable = list(), list()
+    for rec in inventory_recs:
+        if entry := get_unreachable(rec, ttl):
+            unreachable.append((rec, entry))
+        else:
+            reachable.append(rec)
+
+    return reachable, unreachable
+
+
+def iter_reachable(
+    inventory_recs: Iterable[Dict], ttl: float, unreachable: List[Tuple[Dict, Dict]]
+) -> Iterator[Dict]:
+    """
+    Yields the inventory records that were not recently unreachable, as the
+    records are read; the (rec, entry) of the records that were are appended
+    to the `unreachable` list.
+    """
+    if not ttl:
+        yield from inventory_recs
+        return
+
+    for rec in inventory_recs:
+        if entry := get_unreachable(rec, ttl):
+            unreachable.append((rec, entry))
+        else:
+            yield rec
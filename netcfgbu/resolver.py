@@ -0,0 +1,217 @@
+"""
+This module contains the DNS resolution cache.  The inventory records that
+have no `ipaddr` value are connected using the `host` name; rather than each
+connection resolving the name again, the names are resolved once, before the
+backup is dispatched, or as each record is read when the inventory is
+streamed; the number of lookups in progress is bounded in both cases.  The
+connectors, and the probes, then connect to the cached address.
+
+Each address is cached for the configured TTL; the cache is kept in memory,
+and optionally stored as a JSON file in the application state directory so
+that it is used by later runs.  A name that cannot be resolved is cached as
+well, so that it is not resolved again for each record; the host name is
+then used to connect.  A lookup that times out is not cached, since the DNS
+servers may only be slow.
+
+A name that resolves to more than one address is cached without an address,
+so that the connection resolves the name and can try each of its addresses.
+The names of the hosts reached through a jump host are not resolved, since
+they are resolved by the jump host.
+"""
+
+# -----------------------------------------------------------------------------
+# System Imports
+# -----------------------------------------------------------------------------
+
+from typing import Optional, Iterable, Dict
+from ipaddress import ip_address
+from pathlib import Path
+import asyncio
+import socket
+import time
+
+# -----------------------------------------------------------------------------
+# Private Imports
+# -----------------------------------------------------------------------------
+
+from .config_model import DNSSpec
+from . import jumphosts
+from .statefile import JsonStateFile
+from .logger import get_logger
+
+__all__ = [
+    "load_dns_cache",
+    "save_dns_cache",
+    "get_dns_cache",
+    "merge_dns_cache",
+    "get_address",
+    "resolve_host",
+    "resolve_inventory",
+]
+
+DNS_CACHE_FILENAME = "dns-cache.json"
+
+_dns_file = JsonStateFile(DNS_CACHE_FILENAME)
+_dns_spec = DNSSpec()
+
+# host name -> the lookup in progress, so that the records with the same host
+# name share one lookup.
+_lookups: Dict[str, asyncio.Future] = dict()
+
+# the semaphore that bounds the lookups in progress to the `max_inflight`
+# value; created in the event loop of the first lookup.
+_lookup_sem: Optional[asyncio.Semaphore] = None
+
+
+# -----------------------------------------------------------------------------
+#
+#                               CODE BEGINS
+#
+# -----------------------------------------------------------------------------
+
+
+def load_dns_cache(state_dir: Path, dns_spec: DNSSpec):
+    """
+    Configure the DNS cache; the cache is loaded from the state directory when
+    the `persist` option is enabled, otherwise the cache starts empty.
+    """
+    global _dns_spec, _lookup_sem
+
+    _dns_spec = dns_spec
+    _lookup_sem = None
+    if dns_spec.persist:
+        _dns_file.load(state_dir)
+    else:
+        _dns_file.data = dict()
+        _dns_file.filepath = None
+
+
+def save_dns_cache():
+    """ Save the DNS cache to the state directory, if persisted and changed """
+    _dns_file.save()
+
+
+def get_dns_cache() -> Dict:
+    """ Return all of the DNS cache entries, keyed by host name """
+    return _dns_file.data
+
+
+def merge_dns_cache(data: Dict):
+    """ Merge the DNS cache entries resolved by another process """
+    _dns_file.merge(data)
+
+
+def _host_name(host_cfg: dict) -> Optional[str]:
+    """
+    Returns the host name of the inventory record that needs to be resolved,
+    or None if the record has an `ipaddr` value, the host is an address, or
+    the host is reached through a jump host.
+    """
+    if host_cfg.get("ipaddr") or not (host := host_cfg.get("host")):
+        return None
+
+    if jumphosts.get_jumphost(host_cfg):
+        return None
+
+    try:
+        ip_address(host)
+        return None
+    except ValueError:
+        return host
+
+
+def _cached_entry(host: str) -> Optional[Dict]:
+    entry = _dns_file.data.get(host)
+    if not entry or time.time() - entry["ts"] >= _dns_spec.ttl:
+        return None
+
+    return entry
+
+
+def get_address(host_cfg: dict) -> str:
+    """
+    Returns the address used to connect to the inventory record host: the
+    `ipaddr` value, the cached address of the host name, or the host name.
+    """
+    if not (host := _host_name(host_cfg)):
+        return host_cfg.get("ipaddr") or host_cfg.get("host")
+
+    entry = _cached_entry(host)
+    return (entry and entry["addr"]) or host
+
+
+async def _lookup(host: str):
+    """
+    Resolve the host name and cache the address; the lookup waits for one of
+    the `max_inflight` slots, and the timeout starts once it has a slot so
+    that the time waiting is not counted.
+    """
+    global _lookup_sem
+
+    if _lookup_sem is None:
+        _lookup_sem = asyncio.Semaphore(_dns_spec.max_inflight)
+
+    loop = asyncio.get_running_loop()
+    async with _lookup_sem:
+        try:
+            addrinfo = await asyncio.wait_for(
+                loop.getaddrinfo(host, None, type=socket.SOCK_STREAM),
+                timeout=_dns_spec.timeout,
+            )
+        except asyncio.TimeoutError:
+            get_logger().warning(f"DNS: timeout resolving {host}")
+            return
+        except OSError as exc:
+            get_logger().warning(f"DNS: unable to resolve {host}: {exc}")
+            addr = None
+        else:
+            # the connection is only pinned to the address of a name that has
+            # one address.
+
+            addrs = {info[4][0] for info in addrinfo}
+            addr = addrs.pop() if len(addrs) == 1 else None
+
+    _dns_file.data[host] = dict(addr=addr, ts=time.time())
+    _dns_file.changed = True
+
+
+async def resolve_host(host_cfg: dict):
+    """
+    Resolve the host name of the inventory record, if it is not cached; a
+    lookup of the same name already in progress is shared.  The lookups in
+    progress are bounded by the `max_inflight` value.
+    """
+    if not (host := _host_name(host_cfg)) or _cached_entry(host):
+        return
+
+    if not (lookup := _lookups.get(host)):
+        lookup = _lookups[host] = asyncio.ensure_future(_lookup(host))
+        lookup.add_done_callback(lambda _: _lookups.pop(host, None))
+
+    await asyncio.shield(lookup)
+
+
+async def resolve_inventory(inventory_recs: Iterable[Dict]):
+    """
+    Resolve the host names of the inventory records that are not cached,
+    before the records are dispatched; at most `max_inflight` lookups are in
+    progress, so that the resolver executor and the DNS servers are not
+    flooded by a large inventory.
+    """
+    names = {
+        name
+        for rec in inventory_recs
+        if (name := _host_name(rec)) and not _cached_entry(name)
+    }
+    if not names:
+        return
+
+    get_logger().info(f"DNS: resolving {len(names)} host names ...")
+    pending = iter(names)
+
+    async def resolver():
+        for name in pending:
+            await _lookup(name)
+
+    n_resolvers = min(len(names), _dns_spec.max_inflight)
+    await asyncio.gather(*(resolver() for _ in range(n_resolvers)))
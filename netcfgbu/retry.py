@@ -0,0 +1,110 @@
+"""
+This module contains the retry policy used to retry the hosts that fail with
+a transient error, for example a timeout or a refused connection.  The retry
+policy is defined globally, in the [retry] section of the configuration file,
+and can be defined for an os_name, in the [os_name.<name>.retry] section.
+
+The delay before each retry is an exponential backoff, capped at a maximum,
+with random jitter so that the retries of hosts that failed at the same time
+are spread out.
+"""
+
+# -----------------------------------------------------------------------------
+# System Imports
+# -----------------------------------------------------------------------------
+
+from typing import Optional, Dict, Callable
+import asyncio
+import random
+
+# -----------------------------------------------------------------------------
+# Private Imports
+# -----------------------------------------------------------------------------
+
+from .config_model import AppConfig, RetrySpec
+
+__all__ = ["RetryPolicy", "make_retry_fn"]
+
+
+# -----------------------------------------------------------------------------
+#
+#                              CODE BEGINS
+#
+# -----------------------------------------------------------------------------
+
+
+class RetryPolicy(object):
+    """
+    The RetryPolicy determines if a failed attempt should be retried, and the
+    delay before the retry.
+    """
+
+    def __init__(self, spec: RetrySpec):
+        self.spec = spec
+        self.retry_on = frozenset(spec.retry_on)
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        """
+        Returns True if the exception is one of the retryable exception
+        classes, by class name, including the base classes of the exception.
+        """
+        return any(cls.__name__ in self.retry_on for cls in type(exc).__mro__)
+
+    def delay(self, attempt: int) -> float:
+        """
+        Returns the delay, in seconds, before the retry that follows the given
+        attempt number; where the first attempt is 1.
+        """
+        spec = self.spec
+        delay = min(spec.backoff_max, spec.backoff_base * (2 ** (attempt - 1)))
+        return delay * (1 - spec.jitter * random.random())
+
+    def retry_delay(
+        self, exc: Optional[BaseException], attempt: int
+    ) -> Optional[float]:
+        """
+        Returns the delay before retrying the failed attempt, or None if the
+        attempt should not be retried.
+        """
+        if exc is None or attempt >= self.spec.max_attempts:
+            return None
+
+        if not self.is_retryable(exc):
+            return None
+
+        return self.delay(attempt)
+
+
+def make_retry_fn(
+    app_cfg: AppConfig,
+) -> Optional[Callable[[Dict, asyncio.Future, int], Optional[float]]]:
+    """
+    Returns the function used by the Scheduler to determine if a completed
+    attempt should be retried, or None if retries are not configured.  The
+    attempt failed if the future has an exception, or if the result is an
+    exception; for example the backup_config coroutine returns the exception
+    when the configuration could not be retrieved.
+    """
+    global_policy = RetryPolicy(app_cfg.retry)
+    os_policies = {
+        os_name: RetryPolicy(os_spec.retry)
+        for os_name, os_spec in (app_cfg.os_name or {}).items()
+        if os_spec.retry
+    }
+
+    max_attempts = max(
+        policy.spec.max_attempts for policy in (global_policy, *os_policies.values())
+    )
+    if max_attempts == 1:
+        return None
+
+    def retry_fn(rec: Dict, done: asyncio.Future, attempt: int) -> Optional[float]:
+        if (exc := done.exception()) is None and isinstance(
+            res := done.result(), BaseException
+        ):
+            exc = res
+
+        policy = os_policies.get(rec.get("os_name"), global_policy)
+        return policy.retry_delay(exc, attempt)
+
+    return retry_fn
@@ -0,0 +1,180 @@
+"""
+This module contains the run-state store.  The outcome of each host, as the
+results of a command arrive, is recorded in an SQLite database in the
+application state directory.  The store is used to resume an interrupted run,
+skipping the hosts that already succeeded, and to retry the failures of the
+last run.
+"""
+
+# -----------------------------------------------------------------------------
+# System Imports
+# -----------------------------------------------------------------------------
+
+from typing import Optional, Set
+from pathlib import Path
+from datetime import datetime
+import sqlite3
+import time
+
+__all__ = ["RunStateStore"]
+
+RUNSTATE_FILENAME = "runstate.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    command TEXT NOT NULL,
+    started REAL NOT NULL,
+    stopped REAL
+);
+
+CREATE TABLE IF NOT EXISTS results (
+    run_id TEXT NOT NULL,
+    host TEXT NOT NULL,
+    os_name TEXT,
+    ok INTEGER NOT NULL,
+    reason TEXT,
+    finished REAL NOT NULL,
+    PRIMARY KEY (run_id, host)
+);
+"""
+
+
+# -----------------------------------------------------------------------------
+#
+#                              CODE BEGINS
+#
+# -----------------------------------------------------------------------------
+
+
+class RunStateStore(object):
+    """
+    The RunStateStore records the outcome of each host for a run of a
+    command.  The results are committed in batches, rather than for each
+    result, so that recording the results of a large inventory does not slow
+    the run; any results not yet committed are committed when the run is
+    stopped.
+
+    Examples
+    --------
+
+        store = RunStateStore(state_dir)
+        run_id = store.start_run("backup")
+        store.record(rec, ok=True)
+        ...
+        store.stop_run()
+    """
+
+    COMMIT_INTERVAL = 100
+
+    def __init__(self, state_dir: Path):
+        state_dir = Path(state_dir)
+        state_dir.mkdir(parents=True, exist_ok=True)
+
+        self.filepath = state_dir / RUNSTATE_FILENAME
+        self.run_id: Optional[str] = None
+        self._pending = 0
+
+        self._db = sqlite3.connect(str(self.filepath))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+    # -------------------------------------------------------------------------
+    #                                Runs
+    # -------------------------------------------------------------------------
+
+    def start_run(self, command: str, run_id: Optional[str] = None) -> str:
+        """
+        Start recording the results of a run.  If `run_id` is given then the
+        existing run is resumed; otherwise a new run is created.
+
+        Returns
+        -------
+        The run ID.
+
+        Raises
+        ------
+        ValueError
+            If `run_id` is not a run of the command.
+        """
+        if run_id:
+            if not self.run_exists(run_id, command):
+                raise ValueError(f"No {command} run with ID: {run_id}")
+
+            self._db.execute("UPDATE runs SET stopped=NULL WHERE run_id=?", (run_id,))
+
+        else:
+            run_id = self._new_run_id()
+            self._db.execute(
+                "INSERT INTO runs (run_id, command, started) VALUES (?, ?, ?)",
+                (run_id, command, time.time()),
+            )
+
+        self._db.commit()
+        self.run_id = run_id
+        return run_id
+
+    def stop_run(self):
+        """ Commit any pending results and mark the run as stopped """
+        self._db.execute(
+            "UPDATE runs SET stopped=? WHERE run_id=?", (time.time(), self.run_id)
+        )
+        self._db.commit()
+        self._pending = 0
+
+    def run_exists(self, run_id: str, command: Optional[str] = None) -> bool:
+        cur = self._db.execute("SELECT command FROM runs WHERE run_id=?", (run_id,))
+        row = cur.fetchone()
+        return row is not None and command in (None, row[0])
+
+    def last_run_id(self, command: str) -> Optional[str]:
+        """
+        Returns the ID of the most recent run of the command, including a
+        run that was resumed, or None if there is no run.
+        """
+        cur = self._db.execute(
+            "SELECT run_id FROM runs WHERE command=? "
+            "ORDER BY MAX(started, COALESCE(stopped, started)) DESC LIMIT 1",
+            (command,),
+        )
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def _new_run_id(self) -> str:
+        base_id = run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        count = 1
+        while self.run_exists(run_id):
+            count += 1
+            run_id = f"{base_id}-{count}"
+
+        return run_id
+
+    # -------------------------------------------------------------------------
+    #                               Results
+    # -------------------------------------------------------------------------
+
+    def record(self, rec: dict, ok: bool, reason: Optional[str] = None):
+        """ Record the outcome of the inventory record host in the current run """
+        self._db.execute(
+            "INSERT OR REPLACE INTO results "
+            "(run_id, host, os_name, ok, reason, finished) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (self.run_id, rec["host"], rec.get("os_name"), ok, reason, time.time()),
+        )
+
+        self._pending += 1
+        if self._pending >= self.COMMIT_INTERVAL:
+            self._db.commit()
+            self._pending = 0
+
+    def hosts(self, run_id: str, ok: bool) -> Set[str]:
+        """ Returns the set of hosts in the run that succeeded, or failed """
+        cur = self._db.execute(
+            "SELECT host FROM results WHERE run_id=? AND ok=?", (run_id, ok)
+        )
+        return {row[0] for row in cur}
@@ -0,0 +1,375 @@
+"""
+This module contains the writer used to store the device configuration to the
+configs directory.  The configuration output is written to a temporary file
+as it is read from the device, so that the full configuration content is not
+held in memory.  While writing, the carriage-return characters are removed and
+the linter markers are tracked so that the linted content can be produced by
+truncating the file rather than copying the content.
+
+Once the configuration has been completely read, the digest of the content is
+compared to the digest of the existing configuration file.  If the content is
+unchanged the temporary file is removed so that the existing file, and its
+modification time, are not changed.  Otherwise the temporary file is renamed
+into place.  The digests of the configuration files are stored in the state
+directory so that the existing files do not need to be read on each run.
+"""
+
+# -----------------------------------------------------------------------------
+# System Imports
+# -----------------------------------------------------------------------------
+
+from typing import Optional, Dict
+from pathlib import Path
+import codecs
+import hashlib
+import os
+import re
+import secrets
+from time import monotonic
+
+# -----------------------------------------------------------------------------
+# Public Imports
+# -----------------------------------------------------------------------------
+
+import aiofiles
+
+# -----------------------------------------------------------------------------
+# Private Imports
+# -----------------------------------------------------------------------------
+
+from .config_model import LinterSpec
+from .statefile import JsonStateFile
+
+__all__ = [
+    "ConfigFileWriter",
+    "load_digests",
+    "save_digests",
+    "get_digests",
+    "merge_digests",
+    "SAVE_NEW",
+    "SAVE_CHANGED",
+    "SAVE_UNCHANGED",
+]
+
+DIGESTS_FILENAME = "config-digests.json"
+
+SAVE_NEW = "new"
+SAVE_CHANGED = "changed"
+SAVE_UNCHANGED = "unchanged"
+
+_digests_file = JsonStateFile(DIGESTS_FILENAME)
+
+
+# -----------------------------------------------------------------------------
+#
+#                              CODE BEGINS
+#
+# -----------------------------------------------------------------------------
+
+
+class ConfigFileWriter(object):
+    """
+    The ConfigFileWriter is given the raw device output, in chunks of complete
+    lines, and writes the configuration content to the file.  The content is
+    stored with the same rules as the lint_content function:
+
+        * the content starts after the first line matching the linter
+          `config_starts_after` expression, if found.
+
+        * the content ends before the last line starting with the linter
+          `config_ends_at` value, if found.
+
+    Examples
+    --------
+
+        writer = ConfigFileWriter(filepath, lint_spec=lint_spec)
+        await writer.open()
+        try:
+            await writer.write(chunk)
+            ...
+            await writer.close()
+        except Exception:
+            await writer.abort()
+            raise
+    """
+
+    WRITE_BUFFER_SIZE = 64 * 1024
+
+    def __init__(
+        self, filepath: Path, lint_spec: Optional[LinterSpec] = None, skip: int = 0
+    ):
+        """
+        Parameters
+        ----------
+        filepath:
+            The configuration file path.
+
+        lint_spec:
+            The optional linter spec.
+
+        skip:
+            The number of bytes to skip at the start of the device output, for
+            example the echo of the get-config command.
+        """
+        self.filepath = Path(filepath)
+
+        # the temporary file name is unique to the process, and the writer, so
+        # that the backup of the same host by two processes does not collide.
+
+        suffix = f"{os.getpid()}.{secrets.token_hex(4)}"
+        self.tmp_filepath = self.filepath.with_name(
+            f".{self.filepath.name}.{suffix}.tmp"
+        )
+        self.skip = skip
+
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+
+        # the number of bytes of device output, and the time spent finding the
+        # linter markers in the content.
+
+        self.received = 0
+        self.lint_time = 0.0
+        self._ofile = None
+        self._wr_buffer = bytearray()
+
+        # the number of bytes of content, including the buffered content that
+        # has not yet been written to the file.
+
+        self._size = 0
+        self._last_byte = b""
+
+        # the digest of the content excludes a trailing newline until more
+        # content is written, so that the digest can be taken before the
+        # newline at the linter end marker.
+
+        self._hasher = hashlib.sha256()
+        self._hash_newline = False
+        self._end_hasher = None
+
+        self._start_re = None
+        self._started = True
+        self._end_marker = None
+        self._end_offset = None
+
+        if lint_spec:
+            if lint_spec.config_starts_after:
+                self._start_re = re.compile(
+                    f"^{lint_spec.config_starts_after}.*$".encode("utf-8"),
+                    flags=re.MULTILINE,
+                )
+                self._started = False
+
+            if lint_spec.config_ends_at:
+                self._end_marker = lint_spec.config_ends_at.encode("utf-8")
+
+    @property
+    def linted(self) -> bool:
+        """ Returns True if any of the linter markers were found """
+        return bool(self._start_re and self._started) or self._end_offset is not None
+
+    async def open(self):
+        self._ofile = await aiofiles.open(self.tmp_filepath, mode="wb")
+
+    async def write(self, data: bytes):
+        """
+        Write the raw device output.  The data is expected to end on a line
+        boundary, so that the linter markers do not span calls.
+        """
+        self.received += len(data)
+        if self.skip:
+            data, self.skip = data[self.skip :], max(0, self.skip - len(data))
+
+        content = self._decoder.decode(data).replace("\r", "").encode("utf-8")
+        if not content:
+            return
+
+        if not self._started:
+            lint_start = monotonic()
+            start_mo = self._start_re.search(content)
+            self.lint_time += monotonic() - lint_start
+
+            if not start_mo:
+                await self._append(content)
+                return
+
+            # the start marker is found; discard any content stored so far and
+            # keep only the content after the marker line.
+
+            await self._discard()
+            content = content[start_mo.end() + 1 :]
+            self._started = True
+
+        if self._end_marker:
+            lint_start = monotonic()
+            self._find_end_marker(content)
+            self.lint_time += monotonic() - lint_start
+
+        await self._append(content)
+
+    def _find_end_marker(self, content: bytes):
+        # the end marker must be at the start of a line, not the first line;
+        # check the case where the previous content ended the line.
+
+        if (found := content.rfind(b"\n" + self._end_marker)) >= 0:
+            if (offset := self._size + found) > 0:
+                self._end_offset = offset
+                self._end_hasher = self._hasher.copy()
+                if self._hash_newline:
+                    self._end_hasher.update(b"\n")
+                self._end_hasher.update(content[:found])
+
+        elif (
+            self._last_byte == b"\n"
+            and self._size > 1
+            and content.startswith(self._end_marker)
+        ):
+            self._end_offset = self._size - 1
+            self._end_hasher = self._hasher.copy()
+
+    def _hash(self, content: bytes):
+        if self._hash_newline:
+            self._hasher.update(b"\n")
+
+        self._hash_newline = content.endswith(b"\n")
+        if self._hash_newline:
+            content = content[:-1]
+
+        self._hasher.update(content)
+
+    async def _append(self, content: bytes):
+        self._wr_buffer += content
+        self._size += len(content)
+        self._hash(content)
+        self._last_byte = content[-1:] or self._last_byte
+
+        if len(self._wr_buffer) >= self.WRITE_BUFFER_SIZE:
+            await self._flush()
+
+    async def _flush(self):
+        if self._wr_buffer:
+            await self._ofile.write(bytes(self._wr_buffer))
+            self._wr_buffer.clear()
+
+    async def _discard(self):
+        self._wr_buffer.clear()
+        if self._size:
+            await self._ofile.seek(0)
+            await self._ofile.truncate()
+
+        self._size = 0
+        self._last_byte = b""
+        self._end_offset = None
+        self._hasher = hashlib.sha256()
+        self._hash_newline = False
+        self._end_hasher = None
+
+    async def close(self) -> str:
+        """
+        Complete the configuration file content, ending with a newline.  If
+        the content is different from the existing configuration file then
+        rename the temporary file into place.
+
+        Returns
+        -------
+        One of SAVE_NEW, SAVE_CHANGED, or SAVE_UNCHANGED.
+        """
+        await self._flush()
+
+        if self._end_offset is not None:
+            await self._ofile.seek(self._end_offset)
+            await self._ofile.truncate()
+            await self._ofile.write(b"\n")
+            hasher = self._end_hasher
+
+        else:
+            if self._last_byte != b"\n":
+                await self._ofile.write(b"\n")
+            hasher = self._hasher
+
+        hasher.update(b"\n")
+        digest = hasher.hexdigest()
+
+        await self._ofile.close()
+
+        cur_digest = await file_digest(self.filepath)
+        if cur_digest == digest:
+            self.tmp_filepath.unlink()
+            return SAVE_UNCHANGED
+
+        os.replace(self.tmp_filepath, self.filepath)
+        record_digest(self.filepath, digest)
+
+        return SAVE_NEW if cur_digest is None else SAVE_CHANGED
+
+    async def abort(self):
+        """ Remove the temporary file without changing the configuration file """
+        if self._ofile:
+            await self._ofile.close()
+
+        if self.tmp_filepath.exists():
+            self.tmp_filepath.unlink()
+
+
+# -----------------------------------------------------------------------------
+#
+#                           Config File Digests
+#
+# -----------------------------------------------------------------------------
+
+
+def load_digests(state_dir: Path):
+    """ Load the configuration file digests from the state directory """
+    _digests_file.load(state_dir)
+
+
+def save_digests():
+    """ Save the configuration file digests to the state directory """
+    _digests_file.save()
+
+
+def get_digests() -> Dict:
+    """ Return all of the configuration file digests, keyed by file path """
+    return _digests_file.data
+
+
+def merge_digests(digests: Dict):
+    """ Merge the configuration file digests recorded by another process """
+    _digests_file.merge(digests)
+
+
+def record_digest(filepath: Path, digest: str):
+    """ Record the digest of the configuration file content """
+    f_stat = filepath.stat()
+    _digests_file.data[str(filepath.absolute())] = dict(
+        size=f_stat.st_size, mtime_ns=f_stat.st_mtime_ns, sha256=digest
+    )
+    _digests_file.changed = True
+
+
+async def file_digest(filepath: Path) -> Optional[str]:
+    """
+    Returns the digest of the configuration file content, or None if the file
+    does not exist.  The stored digest is used if the file size and
+    modification time have not changed since the digest was recorded;
+    otherwise the file content is read to compute the digest.
+    """
+    try:
+        f_stat = filepath.stat()
+    except FileNotFoundError:
+        return None
+
+    stored = _digests_file.data.get(str(filepath.absolute()))
+    if stored and (stored.get("size"), stored.get("mtime_ns")) == (
+        f_stat.st_size,
+        f_stat.st_mtime_ns,
+    ):
+        return stored.get("sha256")
+
+    hasher = hashlib.sha256()
+    async with aiofiles.open(filepath, mode="rb") as ifile:
+        while chunk := await ifile.read(ConfigFileWriter.WRITE_BUFFER_SIZE):
+            hasher.update(chunk)
+
+    digest = hasher.hexdigest()
+    record_digest(filepath, digest)
+    return digest
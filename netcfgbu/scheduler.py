@@ -0,0 +1,546 @@
+"""
+This module contains the worker-pool scheduler used to process inventory
+records with a bounded number of concurrent tasks.  The scheduler pulls
+inventory records from the given iterable only when a worker is available so
+that the per-host objects (connectors, copied os-specs, futures) exist only
+while the host is being processed.  The records can also be an asynchronous
+iterable, for example records claimed from a work queue.
+
+The scheduler also supports per-group concurrency limits, where a group is
+keyed by an inventory column value, for example "site", or by the jump host
+used by the record.  A record whose group is at the limit is set aside so that
+the workers can process records from other groups.
+
+A record that fails with a transient error can be retried; the retry is
+re-queued after a delay, rather than sleeping in the worker, so that the
+workers continue to process other records in the meantime.
+
+When a run deadline is given, the scheduler stops taking new records once the
+deadline expires, and cancels the records in progress; these records, and the
+records waiting to retry, are handed to the Caller as failed with the
+DeadlineExpired exception.  The records that were not started are skipped.
+"""
+
+# -----------------------------------------------------------------------------
+# System Imports
+# -----------------------------------------------------------------------------
+
+from typing import (
+    Iterable,
+    AsyncIterable,
+    Callable,
+    Awaitable,
+    Tuple,
+    Dict,
+    Any,
+    Optional,
+    List,
+    Union,
+)
+from collections import defaultdict, deque
+from collections.abc import AsyncIterable as AsyncIterableABC
+import asyncio
+import time
+
+# -----------------------------------------------------------------------------
+# Private Imports
+# -----------------------------------------------------------------------------
+
+from .config_model import ConcurrencySpec, GroupLimitSpec
+from . import jumphosts
+
+__all__ = ["Scheduler", "GroupLimit", "DeadlineExpired", "make_group_limits"]
+
+
+# -----------------------------------------------------------------------------
+#
+#                              CODE BEGINS
+#
+# -----------------------------------------------------------------------------
+
+
+class DeadlineExpired(asyncio.TimeoutError):
+    """ The run deadline expired before the record completed """
+
+
+class GroupLimit(object):
+    """
+    A GroupLimit defines the concurrency limit for each group of inventory
+    records, where the group is the value returned by the `key_fn` function.
+    Records for which the `key_fn` returns None are not limited.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        key_fn: Callable[[Dict], Optional[str]],
+        limit: int,
+        limits: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Parameters
+        ----------
+        name:
+            The group name, for example the inventory column name.
+
+        key_fn:
+            Function that is given an inventory record and returns the group
+            value, or None if the record is not limited.
+
+        limit:
+            The concurrency limit for each group value.
+
+        limits:
+            The concurrency limit for specific group values, overriding the
+            `limit` value.
+        """
+        self.name = name
+        self.key_fn = key_fn
+        self.limit = limit
+        self.limits = limits or {}
+
+    def key(self, rec: Dict) -> Optional[Tuple[str, str]]:
+        if (value := self.key_fn(rec)) is None:
+            return None
+        return self.name, value
+
+    def limit_for(self, value: str) -> int:
+        return self.limits.get(value, self.limit)
+
+
+class Scheduler(object):
+    """
+    The Scheduler runs a fixed number of worker tasks.  Each worker pulls the
+    next inventory record, awaits the `work_fn` coroutine for that record, and
+    hands the completed future to the Caller through the `run()` async
+    generator.  When a `retry_fn` is given, a failed record is re-queued after
+    the delay returned by that function, and only the future of the final
+    attempt is handed to the Caller.
+
+    Examples
+    --------
+
+        sched = Scheduler(
+            work_fn=lambda rec: make_host_connector(rec, app_cfg).backup_config(),
+            max_workers=100
+        )
+
+        async for rec, done in sched.run(inventory_recs):
+            try:
+                res = done.result()
+            except Exception as exc:
+                ...
+    """
+
+    def __init__(
+        self,
+        work_fn: Callable[[Dict], Awaitable[Any]],
+        max_workers: int,
+        groups: Optional[List[GroupLimit]] = None,
+        max_parked: Optional[int] = None,
+        retry_fn: Optional[
+            Callable[[Dict, asyncio.Future, int], Optional[float]]
+        ] = None,
+        deadline: Optional[float] = None,
+    ):
+        """
+        Parameters
+        ----------
+        work_fn:
+            Function that is given an inventory record and returns the
+            awaitable that processes the record.  This function is only called
+            once a worker is ready to process the record.
+
+        max_workers:
+            The number of worker tasks, and therefore the maximum number of
+            records processed concurrently.
+
+        groups:
+            The optional list of per-group concurrency limits.
+
+        max_parked:
+            The maximum number of records set aside, because their group is
+            at the limit, before the workers wait for a group to have
+            capacity.  Defaults to 10 times the number of workers.
+
+        retry_fn:
+            Optional function that is given the inventory record, the future
+            of the completed attempt, and the attempt number starting at 1; and
+            returns the delay, in seconds, before the record is retried, or
+            None if the record should not be retried.
+
+        deadline:
+            Optional time, as returned by time.time(), when the run expires.
+            Once expired, no new records are started and the records in
+            progress are cancelled.
+        """
+        self.work_fn = work_fn
+        self.max_workers = max_workers
+        self.groups = groups or []
+        self.max_parked = max_parked or max_workers * 10
+        self.retry_fn = retry_fn
+        self.deadline = deadline
+        self.expired = False
+
+        self._records = None
+        self._records_lock: Optional[asyncio.Lock] = None
+        self._exhausted = False
+        self._in_flight = defaultdict(int)
+        self._parked = dict()
+        self._parked_n = 0
+        self._released: Optional[asyncio.Event] = None
+
+        # the records being processed, the retries waiting for their delay to
+        # expire, and the retries that are ready to be processed.
+
+        self._running = 0
+        self._delayed = dict()
+        self._ready = deque()
+        self._attempts = dict()
+        self._tasks = set()
+
+    # -------------------------------------------------------------------------
+    #
+    #                            Group Limits
+    #
+    # -------------------------------------------------------------------------
+
+    def _group_keys(self, rec) -> Tuple:
+        return tuple(
+            (key, group) for group in self.groups if (key := group.key(rec)) is not None
+        )
+
+    def _has_capacity(self, group_keys) -> bool:
+        return all(
+            self._in_flight[key] < group.limit_for(key[1]) for key, group in group_keys
+        )
+
+    def _acquire(self, group_keys):
+        for key, _ in group_keys:
+            self._in_flight[key] += 1
+
+    def _release(self, group_keys):
+        if not group_keys:
+            return
+
+        for key, _ in group_keys:
+            self._in_flight[key] -= 1
+
+        self._released.set()
+
+    def _pop_parked(self):
+        for group_keys, parked in self._parked.items():
+            if self._has_capacity(group_keys):
+                rec = parked.popleft()
+                if not parked:
+                    del self._parked[group_keys]
+                self._parked_n -= 1
+                return rec, group_keys
+
+        return None
+
+    def _park(self, rec, group_keys):
+        self._parked.setdefault(group_keys, deque()).append(rec)
+        self._parked_n += 1
+
+    # -------------------------------------------------------------------------
+    #
+    #                               Retries
+    #
+    # -------------------------------------------------------------------------
+
+    def _retry_later(self, rec: Dict, delay: float):
+        loop = asyncio.get_running_loop()
+        self._delayed[id(rec)] = (
+            loop.call_later(delay, self._retry_ready, rec),
+            rec,
+        )
+
+    def _retry_ready(self, rec: Dict):
+        del self._delayed[id(rec)]
+        self._ready.append(rec)
+        self._released.set()
+
+    def _pop_ready(self):
+        rec = self._ready.popleft()
+        group_keys = self._group_keys(rec)
+        if self._has_capacity(group_keys):
+            return rec, group_keys
+
+        self._park(rec, group_keys)
+        return None
+
+    # -------------------------------------------------------------------------
+    #
+    #                               Deadline
+    #
+    # -------------------------------------------------------------------------
+
+    def _expire(self):
+        """
+        Called when the run deadline expires.  The records waiting to retry,
+        including those set aside because their group is at the limit, are
+        made ready so that the workers hand them to the Caller as failed; the
+        other records that were set aside were not started, and are skipped.
+        """
+        self.expired = True
+
+        for timer, rec in self._delayed.values():
+            timer.cancel()
+            self._ready.append(rec)
+
+        self._delayed.clear()
+
+        for parked in self._parked.values():
+            self._ready.extend(rec for rec in parked if id(rec) in self._attempts)
+
+        self._parked.clear()
+        self._parked_n = 0
+
+        for task in self._tasks:
+            task.cancel()
+
+        self._released.set()
+
+    async def _run_work(self, rec: Dict):
+        """
+        Run the `work_fn` awaitable as a task, so that it can be cancelled when
+        the run deadline expires.
+        """
+        task = asyncio.ensure_future(self.work_fn(rec))
+        self._tasks.add(task)
+        try:
+            return await task
+
+        except asyncio.CancelledError:
+            if self.expired and task.cancelled():
+                raise DeadlineExpired(f"Deadline expired for {rec.get('host')}")
+            raise
+
+        finally:
+            self._tasks.discard(task)
+
+    # -------------------------------------------------------------------------
+    #
+    #                            Next Record
+    #
+    # -------------------------------------------------------------------------
+
+    async def _read_record(self) -> Optional[Dict]:
+        """
+        Returns the next record of the records iterable, or None when there are
+        no more records.  The records of an asynchronous iterable are read by
+        one worker at a time.
+        """
+        if self._records_lock is None:
+            return next(self._records, None)
+
+        async with self._records_lock:
+            try:
+                return await self._records.__anext__()
+            except StopAsyncIteration:
+                return None
+
+    async def _next_record(self) -> Optional[Tuple[Dict, Tuple]]:
+        """
+        Return the next record that can be processed and its group keys; or
+        None when there are no more records.
+        """
+
+        # once the deadline expires, only the records waiting to retry are
+        # handed to the Caller; no new records are started.
+
+        if self.expired:
+            return (self._ready.popleft(), ()) if self._ready else None
+
+        # without group limits or retries, there is no need to check capacity.
+
+        if not (self.groups or self.retry_fn):
+            rec = await self._read_record()
+            return None if rec is None else (rec, ())
+
+        while True:
+            # retries and records that were set aside have priority over new
+            # records.
+
+            if self._ready and (ready := self._pop_ready()):
+                return ready
+
+            if self._parked_n and (parked := self._pop_parked()):
+                return parked
+
+            if not self._exhausted and self._parked_n < self.max_parked:
+                if (rec := await self._read_record()) is None:
+                    self._exhausted = True
+                    continue
+
+                group_keys = self._group_keys(rec)
+                if self._has_capacity(group_keys):
+                    return rec, group_keys
+
+                self._park(rec, group_keys)
+                continue
+
+            # a record in progress may yet be retried, so the worker is only
+            # done when there are no records in progress or waiting to retry.
+
+            if (
+                self._exhausted
+                and not (self._parked_n or self._ready or self._delayed)
+                and not (self.retry_fn and self._running)
+            ):
+                return None
+
+            # all of the remaining records are in groups at their limit, or are
+            # waiting to retry; wait for a record in progress to complete.
+
+            self._released.clear()
+            await self._released.wait()
+
+            if self.expired:
+                return await self._next_record()
+
+    # -------------------------------------------------------------------------
+    #
+    #                               Workers
+    #
+    # -------------------------------------------------------------------------
+
+    async def _worker(self, done_que: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+
+        # the records iterator is shared by all of the workers; since the
+        # workers run in the same event loop there is no need for locking,
+        # other than for an asynchronous iterable; see _read_record().
+
+        try:
+            while (next_rec := await self._next_record()) is not None:
+                rec, group_keys = next_rec
+                done = loop.create_future()
+
+                if self.expired:
+                    self._attempts.pop(id(rec), None)
+                    done.set_exception(
+                        DeadlineExpired(f"Deadline expired for {rec.get('host')}")
+                    )
+                    await done_que.put((rec, done))
+                    continue
+
+                self._acquire(group_keys)
+                self._running += 1
+                work_fn = self._run_work if self.deadline else self.work_fn
+                try:
+                    done.set_result(await work_fn(rec))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    done.set_exception(exc)
+                finally:
+                    self._running -= 1
+                    self._release(group_keys)
+
+                if self.retry_fn and not self.expired:
+                    attempt = self._attempts.pop(id(rec), 1)
+                    if (delay := self.retry_fn(rec, done, attempt)) is not None:
+                        self._attempts[id(rec)] = attempt + 1
+                        self._retry_later(rec, delay)
+                        continue
+
+                    # wake any worker waiting for this record to complete, to
+                    # determine if there are no more records.
+
+                    self._released.set()
+
+                await done_que.put((rec, done))
+
+        except Exception as exc:
+            # an error not related to a specific record, for example reading
+            # the inventory source, is handed to the Caller to raise.
+            await done_que.put((None, exc))
+            return
+
+        # wake any worker waiting on group capacity so that it can determine
+        # there are no more records.
+
+        self._released.set()
+        await done_que.put((None, None))
+
+    async def run(
+        self, records: Union[Iterable[Dict], AsyncIterable[Dict]]
+    ) -> AsyncIterable[Tuple[Dict, asyncio.Future]]:
+        """
+        Process the inventory records, yielding the tuple (record, future) as
+        each record completes.  The future result is the return value of the
+        `work_fn` awaitable; or the exception it raised.
+        """
+        if isinstance(records, AsyncIterableABC):
+            self._records = records.__aiter__()
+            self._records_lock = asyncio.Lock()
+        else:
+            self._records = iter(records)
+
+        self._released = asyncio.Event()
+        done_que = asyncio.Queue(maxsize=self.max_workers)
+
+        workers = [
+            asyncio.ensure_future(self._worker(done_que))
+            for _ in range(self.max_workers)
+        ]
+
+        # each worker puts a (None, <exc>) item into the done queue when it has
+        # no more records to process.
+
+        active = len(workers)
+
+        expire_timer = None
+        if self.deadline:
+            loop = asyncio.get_running_loop()
+            expire_timer = loop.call_later(
+                max(0, self.deadline - time.time()), self._expire
+            )
+
+        try:
+            while active:
+                rec, done = await done_que.get()
+                if rec is None:
+                    active -= 1
+                    if done is not None:
+                        raise done
+                    continue
+
+                yield rec, done
+
+        finally:
+            for task in workers:
+                task.cancel()
+
+            for timer, _ in self._delayed.values():
+                timer.cancel()
+
+            if expire_timer:
+                expire_timer.cancel()
+
+
+def make_group_limits(spec: ConcurrencySpec) -> List[GroupLimit]:
+    """
+    Return the list of GroupLimit instances defined in the concurrency spec.
+    The group column "jumphost" is the name of the jump host used by the
+    inventory record; otherwise the group column is an inventory field name.
+    """
+
+    def make_key_fn(group_spec: GroupLimitSpec):
+        if group_spec.column == "jumphost":
+            return lambda rec: getattr(jumphosts.get_jumphost(rec), "name", None)
+
+        column = group_spec.column
+        return lambda rec: rec.get(column) or None
+
+    return [
+        GroupLimit(
+            name=group_spec.column,
+            key_fn=make_key_fn(group_spec),
+            limit=group_spec.limit,
+            limits=group_spec.limits,
+        )
+        for group_spec in spec.groups or []
+    ]
@@ -0,0 +1,469 @@
+"""
+This module contains a simulated network device farm, used to measure the
+throughput of the `netcfgbu` commands against real SSH sessions rather than
+mocks.  Each device is an asyncssh server listening on its own loopback
+address, 127.1.x.y, on a common port; so that the inventory uses the device
+address and the port is defined in the [ssh_configs] of the configuration
+file.  Linux routes all of 127.0.0.0/8 to the loopback interface; on other
+systems the addresses must be configured.
+
+Each device emulates the CLI of its os_name profile: the prompt, the commands
+that disable paging, and the command that outputs the configuration.  When
+paging is not disabled, the output stops at a "--More--" prompt every page.
+A device can be configured with the configuration size, the latency of each
+response, the bandwidth of the output, and to fail authentication or hang
+after login.
+
+Usage:
+    python -m netcfgbu.simulator --devices 1000 --port 2222 --inventory farm.csv
+"""
+
+# -----------------------------------------------------------------------------
+# System Imports
+# -----------------------------------------------------------------------------
+
+from typing import Optional, List, Dict, NamedTuple, Tuple
+from functools import lru_cache
+from ipaddress import IPv4Address
+from time import monotonic
+import asyncio
+import csv
+import random
+import resource
+import re
+
+import asyncssh
+import click
+
+__all__ = [
+    "DeviceProfile",
+    "DeviceSpec",
+    "DeviceFarm",
+    "FarmStats",
+    "PROFILES",
+    "make_devices",
+    "parse_size",
+]
+
+FARM_BASE_ADDRESS = IPv4Address("127.1.0.1")
+FARM_USERNAME = "netcfgbu"
+FARM_PASSWORD = "netcfgbu"
+
+OUTPUT_CHUNK_SIZE = 16 * 1024
+MORE_PROMPT = b" --More-- "
+
+
+# -----------------------------------------------------------------------------
+#
+#                              CODE BEGINS
+#
+# -----------------------------------------------------------------------------
+
+
+class DeviceProfile(NamedTuple):
+    """ The CLI behavior of an os_name """
+
+    prompt_end: str = "#"
+    paging_commands: Tuple[str, ...] = ("terminal length 0",)
+    get_config: Tuple[str, ...] = ("show running-config",)
+    config_header: str = "Building configuration...\n\nCurrent configuration :\n!\n"
+    config_footer: str = "end\n"
+    page_lines: int = 24
+
+
+# the profiles match the os_name specifications in the sample netcfgbu.toml.
+
+PROFILES: Dict[str, DeviceProfile] = {
+    "ios": DeviceProfile(),
+    "iosxe": DeviceProfile(),
+    "eos": DeviceProfile(config_header="! device: eos\n!\n"),
+    "nxos": DeviceProfile(
+        get_config=("show running-config | no-more", "show running-config"),
+        config_header="!Command: show running-config\n!Time: Mon Jan 1 00:00:00 2020\n",
+    ),
+    "iosxr": DeviceProfile(config_header="Building configuration...\n!! IOS XR\n"),
+    "asa": DeviceProfile(paging_commands=("terminal pager 0",)),
+    "junos": DeviceProfile(
+        prompt_end=">",
+        paging_commands=("set cli screen-length 0",),
+        get_config=("show configuration | display set",),
+        config_header="",
+        config_footer="",
+    ),
+}
+
+DEFAULT_PROFILE = PROFILES["ios"]
+
+
+class DeviceSpec(NamedTuple):
+    """ A simulated device, and its behavior """
+
+    host: str
+    address: str
+    os_name: str
+    config_size: int = 64 * 1024
+    latency: float = 0.0
+    bandwidth: Optional[float] = None
+    auth_fail: bool = False
+    hang: bool = False
+
+    @property
+    def profile(self) -> DeviceProfile:
+        return PROFILES.get(self.os_name, DEFAULT_PROFILE)
+
+    @property
+    def prompt(self) -> bytes:
+        return f"{self.host}{self.profile.prompt_end}".encode()
+
+
+class FarmStats(object):
+    """
+    The FarmStats records, from the device side, the duration of each
+    connection, the authentication failures, and the configuration bytes sent.
+    """
+
+    def __init__(self):
+        self.connections: List[float] = list()
+        self.auth_failures = 0
+        self.config_bytes = 0
+
+    def reset(self):
+        self.__init__()
+
+
+def parse_size(value: str) -> int:
+    """ Returns the number of bytes of a size, for example "64k" or "10M" """
+    mobj = re.fullmatch(r"(\d+(?:\.\d+)?)([kmg]?)b?", str(value).strip().lower())
+    if not mobj:
+        raise ValueError(f"Invalid size: {value}")
+
+    num, unit = mobj.groups()
+    return int(float(num) * 1024 ** " kmg".index(unit or " "))
+
+
+@lru_cache(maxsize=16)
+def config_body(size: int) -> bytes:
+    """ Returns the configuration content, of about `size` bytes, shared by devices """
+    lines = list()
+    total = 0
+    index = 0
+    while total < size:
+        line = (
+            f"interface Ethernet{index}\r\n"
+            f" description simulated interface {index}\r\n"
+            f" switchport access vlan {index % 4094 + 1}\r\n"
+            "!\r\n"
+        )
+        lines.append(line)
+        total += len(line)
+        index += 1
+
+    return "".join(lines).encode()
+
+
+def make_devices(
+    count: int,
+    os_names: List[str],
+    config_size: int = 64 * 1024,
+    latency: float = 0.0,
+    bandwidth: Optional[float] = None,
+    auth_fail: float = 0.0,
+    hang: float = 0.0,
+    seed: int = 0,
+) -> List[DeviceSpec]:
+    """
+    Returns the list of `count` devices, assigned the os_names in turn.  The
+    `auth_fail` and `hang` values are the fraction of the devices that fail
+    authentication, and that hang after login; the devices are chosen at
+    random, using the `seed` so that the farm is the same for each run.
+    """
+    rand = random.Random(seed)
+    return [
+        DeviceSpec(
+            host=f"sim{index:05d}",
+            address=str(FARM_BASE_ADDRESS + index),
+            os_name=os_names[index % len(os_names)],
+            config_size=config_size,
+            latency=latency,
+            bandwidth=bandwidth,
+            auth_fail=rand.random() < auth_fail,
+            hang=rand.random() < hang,
+        )
+        for index in range(count)
+    ]
+
+
+# -----------------------------------------------------------------------------
+#                             Device Server
+# -----------------------------------------------------------------------------
+
+
+class DeviceServer(asyncssh.SSHServer):
+    """ The SSH server of a device, accepting the farm credentials """
+
+    def __init__(self, device: DeviceSpec, stats: FarmStats):
+        self.device = device
+        self.stats = stats
+        self.started = monotonic()
+
+    def connection_made(self, conn):
+        self.started = monotonic()
+
+    def connection_lost(self, exc):
+        self.stats.connections.append(monotonic() - self.started)
+
+    def begin_auth(self, username):
+        return True
+
+    def password_auth_supported(self):
+        return True
+
+    async def validate_password(self, username, password):
+        if self.device.latency:
+            await asyncio.sleep(self.device.latency)
+
+        if self.device.auth_fail or (username, password) != (
+            FARM_USERNAME,
+            FARM_PASSWORD,
+        ):
+            self.stats.auth_failures += 1
+            return False
+
+        return True
+
+
+class DeviceSession(object):
+    """ The CLI session of a device, for an interactive shell or a command """
+
+    def __init__(self, device: DeviceSpec, stats: FarmStats, process):
+        self.device = device
+        self.profile = device.profile
+        self.stats = stats
+        self.process = process
+        self.paging = True
+
+    async def run(self):
+        try:
+            if self.process.command is not None:
+                # the command request output starts with the command, as the
+                # connector expects of the devices.
+                await self.write(self.process.command.encode() + b"\r\n")
+                await self.run_command(self.process.command, paging=False)
+            else:
+                await self.run_shell()
+
+        except (asyncssh.Error, ConnectionError, asyncio.IncompleteReadError):
+            pass
+
+        finally:
+            self.process.exit(0)
+
+    async def write(self, data: bytes):
+        self.process.stdout.write(data)
+        await self.process.stdout.drain()
+
+    async def run_shell(self):
+        if self.device.hang:
+            await asyncio.Event().wait()
+
+        await self.write(b"\r\n" + self.device.prompt)
+
+        while line := await self.process.stdin.readline():
+            command = line.strip().decode("utf-8", errors="ignore")
+            await self.write(line.rstrip(b"\r\n") + b"\r\n")
+
+            if command in ("exit", "quit", "logout"):
+                break
+
+            await self.run_command(command, paging=self.paging)
+            await self.write(self.device.prompt)
+
+    async def run_command(self, command: str, paging: bool):
+        if self.device.latency:
+            await asyncio.sleep(self.device.latency)
+
+        if command in self.profile.paging_commands:
+            self.paging = False
+            return
+
+        if command in self.profile.get_config:
+            paging = paging and not command.endswith("| no-more")
+            await self.send_config(paging)
+            return
+
+        if command:
+            await self.write(b"% Invalid input detected\r\n")
+
+    async def send_config(self, paging: bool):
+        header = self.profile.config_header.replace("\n", "\r\n").encode()
+        footer = self.profile.config_footer.replace("\n", "\r\n").encode()
+        hostname = f"hostname {self.device.host}\r\n".encode()
+
+        content = memoryview(config_body(self.device.config_size))
+        page_size = self.profile.page_lines * 40 if paging else None
+        bandwidth = self.device.bandwidth
+
+        await self.write(header + hostname)
+
+        for offset in range(0, len(content), OUTPUT_CHUNK_SIZE):
+            chunk = content[offset : offset + OUTPUT_CHUNK_SIZE]
+
+            # when paging is not disabled, the output stops at the More prompt
+            # until a key is pressed; the page is approximated by bytes.
+
+            if page_size:
+                for page_at in range(0, len(chunk), page_size):
+                    await self.write(bytes(chunk[page_at : page_at + page_size]))
+                    await self.write(MORE_PROMPT)
+                    await self.process.stdin.read(1)
+                    await self.write(b"\r" + b" " * len(MORE_PROMPT) + b"\r")
+            else:
+                await self.write(bytes(chunk))
+
+            if bandwidth:
+                await asyncio.sleep(len(chunk) / bandwidth)
+
+        await self.write(footer)
+        self.stats.config_bytes += len(header) + len(content) + len(footer)
+
+
+# -----------------------------------------------------------------------------
+#                               Device Farm
+# -----------------------------------------------------------------------------
+
+
+class DeviceFarm(object):
+    """
+    The DeviceFarm starts a listener for each device, sharing a single host
+    key.
+
+    Examples
+    --------
+
+        farm = DeviceFarm(make_devices(1000, ["ios", "eos"]), port=2222)
+        await farm.start()
+        farm.write_inventory("farm.csv")
+        ...
+        await farm.stop()
+    """
+
+    def __init__(self, devices: List[DeviceSpec], port: int = 2222):
+        self.devices = devices
+        self.port = port
+        self.stats = FarmStats()
+        self.servers = list()
+        self.sessions = set()
+        self._host_key = asyncssh.generate_private_key("ssh-ed25519")
+
+    async def start(self):
+        raise_nofile_limit(len(self.devices) * 2 + 1024)
+
+        for device in self.devices:
+            self.servers.append(await self._listen(device))
+
+        # when the port is 0, each device is assigned a port; the port of the
+        # first device is used.
+
+        if not self.port and self.servers:
+            self.port = self.servers[0].sockets[0].getsockname()[1]
+
+    async def _listen(self, device: DeviceSpec):
+        # the session tasks are referenced until done, since the event loop
+        # does not reference a task that is waiting, as a hung device does.
+
+        def process_factory(process):
+            task = asyncio.ensure_future(
+                DeviceSession(device, self.stats, process).run()
+            )
+            self.sessions.add(task)
+            task.add_done_callback(self.sessions.discard)
+            return task
+
+        return await asyncssh.listen(
+            host=device.address,
+            port=self.port,
+            server_factory=lambda: DeviceServer(device, self.stats),
+            process_factory=process_factory,
+            server_host_keys=[self._host_key],
+            encoding=None,
+            reuse_address=True,
+        )
+
+    async def stop(self):
+        for server in self.servers:
+            server.close()
+
+        for server in self.servers:
+            await server.wait_closed()
+
+        self.servers.clear()
+
+        # the sessions of the hung devices do not end on their own.
+
+        for task in list(self.sessions):
+            task.cancel()
+
+    def write_inventory(self, filepath):
+        with open(filepath, "w") as ofile:
+            wr_csv = csv.writer(ofile)
+            wr_csv.writerow(["host", "ipaddr", "os_name"])
+            wr_csv.writerows(
+                [device.host, device.address, device.os_name] for device in self.devices
+            )
+
+
+def raise_nofile_limit(count: int):
+    """ Raise the open files limit, up to the hard limit, for the listeners """
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < count:
+        want = count if hard == resource.RLIM_INFINITY else min(count, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (want, hard))
+
+
+# -----------------------------------------------------------------------------
+#                                   CLI
+# -----------------------------------------------------------------------------
+
+
+@click.command()
+@click.option("--devices", type=int, default=100, help="number of devices")
+@click.option("--port", type=int, default=2222, help="SSH port of the devices")
+@click.option("--os-name", default="ios,eos", help="comma separated os_names")
+@click.option("--config-size", default="64k", help="configuration size, e.g. 10M")
+@click.option("--latency", type=float, default=0.0, help="response latency (s)")
+@click.option("--bandwidth", help="output bandwidth per device, e.g. 1M")
+@click.option("--auth-fail", type=float, default=0.0, help="fraction failing auth")
+@click.option("--hang", type=float, default=0.0, help="fraction hanging at login")
+@click.option("--inventory", default="farm.csv", help="inventory file to write")
+def main(**opts):
+    """ Run the simulated device farm until interrupted """
+    devices = make_devices(
+        count=opts["devices"],
+        os_names=opts["os_name"].split(","),
+        config_size=parse_size(opts["config_size"]),
+        latency=opts["latency"],
+        bandwidth=parse_size(opts["bandwidth"]) if opts["bandwidth"] else None,
+        auth_fail=opts["auth_fail"],
+        hang=opts["hang"],
+    )
+
+    farm = DeviceFarm(devices, port=opts["port"])
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(farm.start())
+    farm.write_inventory(opts["inventory"])
+    print(
+        f"{len(devices)} devices on {devices[0].address}-{devices[-1].address} "
+        f"port {farm.port}; inventory {opts['inventory']}; "
+        f"credentials {FARM_USERNAME}/{FARM_PASSWORD}"
+    )
+
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(farm.stop())
+
+
+if __name__ == "__main__":
+    main()
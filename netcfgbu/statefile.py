@@ -0,0 +1,91 @@
+"""
+This module contains the JSON state file used to store information in the
+application state directory between runs, for example the credential hints.
+"""
+
+# -----------------------------------------------------------------------------
+# System Imports
+# -----------------------------------------------------------------------------
+
+from typing import Dict
+from pathlib import Path
+import json
+import os
+
+# -----------------------------------------------------------------------------
+# Private Imports
+# -----------------------------------------------------------------------------
+
+from .logger import get_logger
+
+__all__ = ["JsonStateFile"]
+
+
+# -----------------------------------------------------------------------------
+#
+#                              CODE BEGINS
+#
+# -----------------------------------------------------------------------------
+
+
+class JsonStateFile(object):
+    """
+    A JsonStateFile instance holds a dictionary that is loaded from, and saved
+    to, a JSON file in the state directory.  The `changed` attribute should be
+    set by the Caller when the data is changed so that the file is only saved
+    when necessary.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.filepath = None
+        self.data: Dict = dict()
+        self.changed = False
+
+    def load(self, state_dir: Path):
+        """
+        Load the data from the state directory.  If the file does not exist,
+        or cannot be read, then the data starts empty.
+        """
+        self.filepath = Path(state_dir) / self.filename
+        self.data = dict()
+        self.changed = False
+
+        if not self.filepath.exists():
+            return
+
+        try:
+            self.data = json.loads(self.filepath.read_text())
+        except (OSError, ValueError) as exc:
+            get_logger().warning(f"STATE: unable to load {self.filepath}: {exc}")
+
+    def merge(self, data: Dict):
+        """
+        Merge the data, for example the data changed by another process, into
+        this state file data.
+        """
+        for key, value in data.items():
+            if self.data.get(key) != value:
+                self.data[key] = value
+                self.changed = True
+
+    def save(self):
+        """
+        Save the data to the state directory if it was changed since it was
+        loaded.  The file is replaced atomically so that an interrupted run
+        does not leave a partial file; the temporary file is unique to the
+        process, since the worker processes share the state directory.
+        """
+        if not (self.changed and self.filepath):
+            return
+
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        tmp_filepath = self.filepath.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp_filepath.write_text(json.dumps(self.data))
+            os.replace(tmp_filepath, self.filepath)
+        except BaseException:
+            tmp_filepath.unlink(missing_ok=True)
+            raise
+
+        self.changed = False
@@ -0,0 +1,327 @@
+"""
+This module contains the per-phase latency instrumentation of the backup
+process.  Each host connector records the duration of the phases of its
+backup: the waits on the sessions and startups concurrency limits, the TCP
+connect, the SSH handshake, each credential attempt, the first prompt, the
+pre-get-config commands, the configuration transfer, the lint, and the save.
+The durations of all of the hosts are aggregated by the host os_name and by
+the jump host used, in bounded histograms, so that the report can show the
+percentiles of each phase, and the phase that limits the throughput.
+"""
+
+# -----------------------------------------------------------------------------
+# System Imports
+# -----------------------------------------------------------------------------
+
+from typing import Optional, List, Tuple, Dict
+from collections import defaultdict, Counter
+from contextlib import contextmanager
+from time import monotonic
+import json
+import math
+
+import asyncssh
+
+# -----------------------------------------------------------------------------
+# Private Imports
+# -----------------------------------------------------------------------------
+
+from . import jumphosts
+
+__all__ = [
+    "PHASES",
+    "PhaseTimer",
+    "TimingSSHClient",
+    "TimingStats",
+    "DurationHistogram",
+    "percentile",
+]
+
+PHASES = (
+    "session_wait",
+    "startup_wait",
+    "connect",
+    "handshake",
+    "auth",
+    "prompt",
+    "pre_get_config",
+    "get_config",
+    "lint",
+    "save",
+)
+
+# the group value used for the hosts that do not use a jump host.
+DIRECT = "direct"
+
+# the durations are counted in log-spaced buckets, each 2**(1/16) times, about
+# 4.4%, wider than the previous; so the percentiles are within that error and
+# the memory of each phase is bounded.  The first bucket is the durations up
+# to MIN_DURATION seconds.
+
+BUCKETS_PER_DOUBLING = 16
+MIN_DURATION = 0.0001
+
+
+# -----------------------------------------------------------------------------
+#
+#                              CODE BEGINS
+#
+# -----------------------------------------------------------------------------
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """ Returns the nearest-rank percentile of the sorted values """
+    if not values:
+        return 0.0
+
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+class PhaseTimer(object):
+    """
+    The PhaseTimer records the duration of each phase of the backup of a
+    host; a phase can be recorded more than once, for example a credential
+    attempt.  The timestamps are taken from the monotonic clock.
+
+    Examples
+    --------
+
+        timer = PhaseTimer()
+        with timer.phase("prompt"):
+            await read_until_prompt()
+    """
+
+    def __init__(self):
+        self.samples: List[Tuple[str, float]] = list()
+        self.config_bytes = 0
+
+    def add(self, phase: str, seconds: float):
+        self.samples.append((phase, seconds))
+
+    def merge(self, other: "PhaseTimer"):
+        """ Merge the phases of another attempt of the same host """
+        self.samples.extend(other.samples)
+        self.config_bytes += other.config_bytes
+
+    def to_dict(self) -> Dict:
+        """ Returns the phases as a JSON compatible dictionary """
+        return dict(samples=self.samples, config_bytes=self.config_bytes)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PhaseTimer":
+        timer = cls()
+        timer.samples = [(phase, seconds) for phase, seconds in data["samples"]]
+        timer.config_bytes = data["config_bytes"]
+        return timer
+
+    @contextmanager
+    def phase(self, phase: str):
+        """ Record the duration of the phase, including a phase that fails """
+        started = monotonic()
+        try:
+            yield
+        finally:
+            self.add(phase, monotonic() - started)
+
+
+class DurationHistogram(object):
+    """
+    The DurationHistogram counts the durations of a phase in log-spaced
+    buckets, with the exact count, total, min, and max; so that the
+    percentiles are computed without keeping each duration.
+    """
+
+    def __init__(self):
+        self.buckets: Counter = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        ratio = max(seconds, MIN_DURATION) / MIN_DURATION
+        self.buckets[math.ceil(math.log2(ratio) * BUCKETS_PER_DOUBLING)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "DurationHistogram"):
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, pct: float) -> float:
+        """
+        Returns the nearest-rank percentile, as the upper bound of its bucket
+        within the min and max durations.
+        """
+        if not self.count:
+            return 0.0
+
+        rank = max(1, math.ceil(pct / 100 * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                upper = MIN_DURATION * 2 ** (index / BUCKETS_PER_DOUBLING)
+                return min(max(upper, self.min), self.max)
+
+        return self.max
+
+
+class TimingSSHClient(asyncssh.SSHClient):
+    """
+    The TimingSSHClient is used as the asyncssh client factory so that the
+    login can be split into the TCP connect, the SSH handshake (key exchange),
+    and the authentication phases.  A client instance is used for each
+    credential attempt.  The `connected` attribute is True once the TCP
+    connection was made, so that a failure of the handshake or authentication
+    can be told apart from a host that could not be reached.
+    """
+
+    def __init__(self, timer: PhaseTimer):
+        self.timer = timer
+        self.mark = monotonic()
+        self.auth_started: Optional[float] = None
+        self.connected = False
+
+    def _lap(self, phase: str):
+        now = monotonic()
+        self.timer.add(phase, now - self.mark)
+        self.mark = now
+
+    def connection_made(self, conn):
+        self.connected = True
+        self._lap("connect")
+
+    def begin_auth(self, username):
+        self._lap("handshake")
+        self.auth_started = self.mark
+        return True
+
+    def auth_completed(self):
+        self._lap("auth")
+        self.auth_started = None
+
+    def auth_failed(self):
+        """ Record the duration of a credential attempt that was rejected """
+        if self.auth_started is not None:
+            self._lap("auth")
+            self.auth_started = None
+
+
+class TimingStats(object):
+    """
+    The TimingStats aggregates the phase durations of the hosts by os_name and
+    by jump host.
+
+    Examples
+    --------
+
+        stats = TimingStats()
+        stats.add_host(rec, conn.timer)
+        ...
+        stats.save_json("timing.json")
+    """
+
+    GROUP_BY = ("os_name", "jumphost")
+
+    def __init__(self):
+        # (group_by, group value, phase) -> the histogram of the durations
+        self.durations: Dict[Tuple[str, str, str], DurationHistogram] = defaultdict(
+            DurationHistogram
+        )
+
+        # (group_by, group value) -> total configuration bytes transferred
+        self.config_bytes: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    @staticmethod
+    def host_groups(rec: Dict) -> Tuple[Tuple[str, str], ...]:
+        jh = jumphosts.get_jumphost(rec)
+        return (
+            ("os_name", rec.get("os_name") or ""),
+            ("jumphost", jh.name if jh else DIRECT),
+        )
+
+    def add_host(self, rec: Dict, timer: Optional[PhaseTimer]):
+        if not timer:
+            return
+
+        for group in self.host_groups(rec):
+            for phase, seconds in timer.samples:
+                self.durations[(*group, phase)].add(seconds)
+
+            self.config_bytes[group] += timer.config_bytes
+
+    def merge(self, other: "TimingStats"):
+        """ Merge the durations aggregated by another process """
+        for key, durations in other.durations.items():
+            self.durations[key].merge(durations)
+
+        for key, count in other.config_bytes.items():
+            self.config_bytes[key] += count
+
+    def summary(self) -> Dict:
+        """
+        Returns the dictionary of the phase percentiles, in seconds, for each
+        group; for example:
+
+            {"os_name": {"eos": {"connect": {"count": 10, "p50": 0.02, ...}}}}
+
+        The get_config phase includes the total bytes and the throughput.
+        """
+        result = {group_by: dict() for group_by in self.GROUP_BY}
+
+        for (group_by, value, phase), durations in self.durations.items():
+            phase_stats = {
+                "count": durations.count,
+                "total": durations.total,
+                "min": durations.min,
+                "p50": durations.percentile(50),
+                "p95": durations.percentile(95),
+                "p99": durations.percentile(99),
+                "max": durations.max,
+            }
+
+            if phase == "get_config":
+                n_bytes = self.config_bytes[(group_by, value)]
+                phase_stats["bytes"] = n_bytes
+                phase_stats["bytes_per_sec"] = (
+                    n_bytes / phase_stats["total"] if phase_stats["total"] else 0.0
+                )
+
+            result[group_by].setdefault(value, dict())[phase] = phase_stats
+
+        # present the phases in the order of the backup process.
+
+        for groups in result.values():
+            for value, phases in groups.items():
+                groups[value] = {
+                    phase: phases[phase] for phase in PHASES if phase in phases
+                }
+
+        return result
+
+    def save_json(self, filepath: str):
+        with open(filepath, "w") as ofile:
+            json.dump(self.summary(), ofile, indent=2)
+
+    def tabular_data(self) -> List[List]:
+        return [
+            [
+                f"{group_by}={value}",
+                phase,
+                stats["count"],
+                f"{stats['p50']:.3f}",
+                f"{stats['p95']:.3f}",
+                f"{stats['p99']:.3f}",
+                f"{stats['max']:.3f}",
+            ]
+            for group_by, groups in self.summary().items()
+            for value, phases in sorted(groups.items())
+            for phase, stats in phases.items()
+        ]
@@ -0,0 +1,439 @@
+"""
+This module contains the work queue used to distribute a backup run across
+several `netcfgbu` processes, for example collectors in different regions.
+
+The coordinator process publishes the inventory records of a run to the work
+queue, and then collects the results.  Each worker process claims records
+from the queue with a lease, performs the backup, and completes the records
+with their results.  A worker renews the lease of the records it has claimed
+while it is running; if a worker dies, the lease of its records expires and
+the records are claimed by the other workers.
+
+The WorkQueue class defines the interface of a work queue backend.  The
+SQLiteWorkQueue is the reference implementation, using an SQLite database
+file that must be reachable by the coordinator and all of the workers; the
+file is locked using the file system locks, and so the shared storage must
+support them.  Other
+backends can be used by defining the `backend` value in the [workqueue]
+configuration section, in the form "<module>.<class>".
+"""
+
+# -----------------------------------------------------------------------------
+# System Imports
+# -----------------------------------------------------------------------------
+
+from typing import Optional, List, Tuple, Dict, Iterable, NamedTuple
+from abc import ABC, abstractmethod
+from importlib import import_module
+from pathlib import Path
+import json
+import sqlite3
+import time
+
+# -----------------------------------------------------------------------------
+# Private Imports
+# -----------------------------------------------------------------------------
+
+from .config_model import AppConfig, WorkQueueSpec
+
+__all__ = ["WorkQueue", "WorkResult", "SQLiteWorkQueue", "get_workqueue"]
+
+WORKQUEUE_FILENAME = "workqueue.db"
+
+
+# -----------------------------------------------------------------------------
+#
+#                              CODE BEGINS
+#
+# -----------------------------------------------------------------------------
+
+
+class WorkResult(NamedTuple):
+    """ The result of a completed record, as reported by a worker """
+
+    seq: int
+    rec: Dict
+    ok: bool
+    reason: Optional[str]
+    raised: bool
+    attempts: int
+    save_status: Optional[str]
+    worker_id: str
+    timing: Optional[Dict] = None
+
+
+class WorkQueue(ABC):
+    """
+    The WorkQueue defines the interface of a work queue backend.  The records
+    of a run are identified by the run ID, and each record by an item ID
+    assigned by the backend.
+    """
+
+    def __init__(self, spec: WorkQueueSpec, app_cfg: AppConfig):
+        self.spec = spec
+        self.app_cfg = app_cfg
+
+    # -------------------------------------------------------------------------
+    #                           Coordinator API
+    # -------------------------------------------------------------------------
+
+    @abstractmethod
+    def publish(self, run_id: str, records: Iterable[Dict]):
+        """ Publish the records of the run, and open the run to the workers """
+
+    @abstractmethod
+    def results(self, run_id: str, after_seq: int = 0) -> List[WorkResult]:
+        """ Returns the results of the run reported after the given sequence """
+
+    @abstractmethod
+    def close_run(self, run_id: str):
+        """ Close the run so that the workers stop claiming records """
+
+    def in_progress(self, run_id: str) -> Optional[int]:
+        """
+        Returns the number of records of the run that are claimed by a worker,
+        and not completed; or None if the backend does not support it.
+        """
+        return None
+
+    # -------------------------------------------------------------------------
+    #                             Worker API
+    # -------------------------------------------------------------------------
+
+    @abstractmethod
+    def open_run_id(self) -> Optional[str]:
+        """ Returns the ID of the most recent open run, or None """
+
+    @abstractmethod
+    def claim(self, run_id: str, worker_id: str, count: int) -> List[Tuple[int, Dict]]:
+        """
+        Claim up to `count` records of the run, returning the list of (item ID,
+        record).  The records that are not completed, or whose lease has
+        expired, are claimed.
+        """
+
+    @abstractmethod
+    def renew(self, run_id: str, worker_id: str):
+        """ Renew the lease of the records claimed by the worker """
+
+    @abstractmethod
+    def complete(
+        self,
+        run_id: str,
+        worker_id: str,
+        item_id: int,
+        ok: bool,
+        reason: Optional[str] = None,
+        raised: bool = False,
+        attempts: int = 1,
+        save_status: Optional[str] = None,
+        timing: Optional[Dict] = None,
+    ) -> bool:
+        """
+        Complete the claimed record with its result, and the phase durations
+        of its backup as returned by PhaseTimer.to_dict().  Returns False if
+        the record is no longer claimed by the worker, for example the lease
+        expired and the record was claimed by another worker; in which case
+        the result is ignored.
+        """
+
+    def complete_batch(
+        self, run_id: str, worker_id: str, results: List[Dict]
+    ) -> List[bool]:
+        """
+        Complete several claimed records, where each result is the dictionary
+        of the `complete` arguments from `item_id`.  Returns the `complete`
+        return value of each result.
+        """
+        return [self.complete(run_id, worker_id, **result) for result in results]
+
+    @abstractmethod
+    def is_done(self, run_id: str) -> bool:
+        """ Returns True if the run is closed, or all records are completed """
+
+    def close(self):
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    The SQLiteWorkQueue stores the work queue in an SQLite database file.
+    Records are claimed in a write transaction, started with BEGIN IMMEDIATE,
+    so that a record is claimed by only one worker.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS runs (
+        run_id TEXT PRIMARY KEY,
+        is_open INTEGER NOT NULL,
+        created REAL NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS items (
+        run_id TEXT NOT NULL,
+        item_id INTEGER NOT NULL,
+        rec TEXT NOT NULL,
+        worker_id TEXT,
+        lease_expires REAL,
+        is_done INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (run_id, item_id)
+    );
+
+    CREATE INDEX IF NOT EXISTS items_claim ON items (run_id, is_done, lease_expires);
+
+    CREATE TABLE IF NOT EXISTS results (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        run_id TEXT NOT NULL,
+        item_id INTEGER NOT NULL,
+        ok INTEGER NOT NULL,
+        reason TEXT,
+        raised INTEGER NOT NULL,
+        attempts INTEGER NOT NULL,
+        save_status TEXT,
+        worker_id TEXT NOT NULL,
+        timing TEXT
+    );
+    """
+
+    def __init__(self, spec: WorkQueueSpec, app_cfg: AppConfig):
+        super().__init__(spec, app_cfg)
+        self.filepath = Path(
+            spec.path or Path(app_cfg.defaults.state_dir) / WORKQUEUE_FILENAME
+        )
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+
+        # the rollback journal is used, rather than WAL, since the WAL index
+        # is in shared memory and so does not work for processes on other
+        # systems using a file on shared storage.  The journal mode is stored
+        # in the file, and so is set on each connect.
+
+        self._db = sqlite3.connect(str(self.filepath), timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=DELETE")
+        self._db.executescript(self.SCHEMA)
+
+        # the timing column was added to the results table; a file created
+        # before then is updated.
+
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(results)")}
+        if "timing" not in columns:
+            self._db.execute("ALTER TABLE results ADD COLUMN timing TEXT")
+
+    def close(self):
+        self._db.close()
+
+    def _transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        return self._db
+
+    # -------------------------------------------------------------------------
+    #                           Coordinator API
+    # -------------------------------------------------------------------------
+
+    def publish(self, run_id: str, records: Iterable[Dict]):
+        db = self._transaction()
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO runs (run_id, is_open, created) "
+                "VALUES (?, 1, ?)",
+                (run_id, time.time()),
+            )
+            db.execute("DELETE FROM items WHERE run_id=?", (run_id,))
+            db.execute("DELETE FROM results WHERE run_id=?", (run_id,))
+            db.executemany(
+                "INSERT INTO items (run_id, item_id, rec) VALUES (?, ?, ?)",
+                (
+                    (run_id, item_id, json.dumps(rec))
+                    for item_id, rec in enumerate(records)
+                ),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def results(self, run_id: str, after_seq: int = 0) -> List[WorkResult]:
+        cur = self._db.execute(
+            "SELECT results.seq, items.rec, results.ok, results.reason, "
+            "results.raised, results.attempts, results.save_status, "
+            "results.worker_id, results.timing "
+            "FROM results JOIN items "
+            "ON results.run_id = items.run_id AND results.item_id = items.item_id "
+            "WHERE results.run_id=? AND results.seq > ? ORDER BY results.seq",
+            (run_id, after_seq),
+        )
+        return [
+            WorkResult(
+                seq=seq,
+                rec=json.loads(rec),
+                ok=bool(ok),
+                reason=reason,
+                raised=bool(raised),
+                attempts=attempts,
+                save_status=save_status,
+                worker_id=worker_id,
+                timing=json.loads(timing) if timing else None,
+            )
+            for (
+                seq,
+                rec,
+                ok,
+                reason,
+                raised,
+                attempts,
+                save_status,
+                worker_id,
+                timing,
+            ) in cur
+        ]
+
+    def close_run(self, run_id: str):
+        self._db.execute("UPDATE runs SET is_open=0 WHERE run_id=?", (run_id,))
+
+    def in_progress(self, run_id: str) -> Optional[int]:
+        row = self._db.execute(
+            "SELECT COUNT(*) FROM items "
+            "WHERE run_id=? AND is_done=0 AND lease_expires >= ?",
+            (run_id, time.time()),
+        ).fetchone()
+        return row[0]
+
+    # -------------------------------------------------------------------------
+    #                             Worker API
+    # -------------------------------------------------------------------------
+
+    def open_run_id(self) -> Optional[str]:
+        row = self._db.execute(
+            "SELECT run_id FROM runs WHERE is_open=1 ORDER BY created DESC LIMIT 1"
+        ).fetchone()
+        return row[0] if row else None
+
+    def claim(self, run_id: str, worker_id: str, count: int) -> List[Tuple[int, Dict]]:
+        now = time.time()
+        db = self._transaction()
+        try:
+            rows = db.execute(
+                "SELECT item_id, rec FROM items "
+                "WHERE run_id=? AND is_done=0 "
+                "AND (lease_expires IS NULL OR lease_expires < ?) LIMIT ?",
+                (run_id, now, count),
+            ).fetchall()
+
+            db.executemany(
+                "UPDATE items SET worker_id=?, lease_expires=? "
+                "WHERE run_id=? AND item_id=?",
+                (
+                    (worker_id, now + self.spec.lease_timeout, run_id, item_id)
+                    for item_id, _ in rows
+                ),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+        return [(item_id, json.loads(rec)) for item_id, rec in rows]
+
+    def renew(self, run_id: str, worker_id: str):
+        self._db.execute(
+            "UPDATE items SET lease_expires=? "
+            "WHERE run_id=? AND worker_id=? AND is_done=0",
+            (time.time() + self.spec.lease_timeout, run_id, worker_id),
+        )
+
+    def complete(
+        self,
+        run_id: str,
+        worker_id: str,
+        item_id: int,
+        ok: bool,
+        reason: Optional[str] = None,
+        raised: bool = False,
+        attempts: int = 1,
+        save_status: Optional[str] = None,
+        timing: Optional[Dict] = None,
+    ) -> bool:
+        (completed,) = self.complete_batch(
+            run_id,
+            worker_id,
+            [
+                dict(
+                    item_id=item_id,
+                    ok=ok,
+                    reason=reason,
+                    raised=raised,
+                    attempts=attempts,
+                    save_status=save_status,
+                    timing=timing,
+                )
+            ],
+        )
+        return completed
+
+    def complete_batch(
+        self, run_id: str, worker_id: str, results: List[Dict]
+    ) -> List[bool]:
+        # the results are completed in one transaction, so that the lock is
+        # taken, and the journal committed, once for the batch.
+
+        completed = list()
+        db = self._transaction()
+        try:
+            for result in results:
+                cur = db.execute(
+                    "UPDATE items SET is_done=1 "
+                    "WHERE run_id=? AND item_id=? AND worker_id=? AND is_done=0",
+                    (run_id, result["item_id"], worker_id),
+                )
+                completed.append(cur.rowcount == 1)
+                if not completed[-1]:
+                    continue
+
+                timing = result.get("timing")
+                db.execute(
+                    "INSERT INTO results (run_id, item_id, ok, reason, raised, "
+                    "attempts, save_status, worker_id, timing) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run_id,
+                        result["item_id"],
+                        result["ok"],
+                        result.get("reason"),
+                        result.get("raised", False),
+                        result.get("attempts", 1),
+                        result.get("save_status"),
+                        worker_id,
+                        json.dumps(timing) if timing else None,
+                    ),
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+        return completed
+
+    def is_done(self, run_id: str) -> bool:
+        row = self._db.execute(
+            "SELECT is_open FROM runs WHERE run_id=?", (run_id,)
+        ).fetchone()
+        if not row or not row[0]:
+            return True
+
+        row = self._db.execute(
+            "SELECT 1 FROM items WHERE run_id=? AND is_done=0 LIMIT 1", (run_id,)
+        ).fetchone()
+        return row is None
+
+
+def get_workqueue(app_cfg: AppConfig) -> WorkQueue:
+    """
+    Returns the work queue instance for the [workqueue] configuration; the
+    SQLiteWorkQueue unless a backend class is configured.
+    """
+    spec = app_cfg.workqueue
+    if not spec.backend:
+        return SQLiteWorkQueue(spec, app_cfg)
+
+    mod_name, _, cls_name = spec.backend.rpartition(".")
+    backend_cls = getattr(import_module(mod_name), cls_name)
+    return backend_cls(spec, app_cfg)
@@ -26,3 +26,40 @@ def clean(ctx):
     ctx.run("rm -rf netcfgbu.egg-info")
     ctx.run("rm -rf .pytest_cache .pytest_tmpdir .coverage")
     ctx.run("rm -rf htmlcov")
+
+
+@task(
+    help={
+        "devices": "number of simulated devices",
+        "config_size": "configuration size of each device, e.g. 64k or 10M",
+        "commands": "comma separated commands to run",
+    }
+)
+def bench(ctx, devices=1000, config_size="64k", commands="probe,login,backup"):
+    """ Run the commands against the simulated device farm """
+    ctx.run(
+        f"python benchmarks/bench_farm.py --devices {devices} "
+        f"--config-size {config_size} --commands {commands}",
+        pty=True,
+    )
+
+
+@task(
+    help={
+        "save": "save the results as the baseline",
+        "threshold": "percent slower than the baseline that fails",
+        "baseline": "baseline JSON file",
+    }
+)
+def bench_hotpaths(
+    ctx, save=False, threshold=10.0, baseline=".benchmarks/hotpaths.json"
+):
+    """ Run the hot path benchmarks, and compare them to the baseline """
+    if save:
+        ctx.run(f"python benchmarks/bench_hotpaths.py run --save {baseline}", pty=True)
+    else:
+        ctx.run(
+            f"python benchmarks/bench_hotpaths.py compare --baseline {baseline} "
+            f"--threshold {threshold}",
+            pty=True,
+        )
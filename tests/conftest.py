@@ -2,6 +2,8 @@
 
 import pytest
 import logging
+import socket
+from ipaddress import ip_address
 from pathlib import Path
 
 
@@ -11,10 +13,31 @@ def fake_inventory_file(tmpdir):
 
 
 @pytest.fixture()
-def netcfgbu_envars(monkeypatch):
+def netcfgbu_envars(monkeypatch, tmpdir):
     monkeypatch.setenv("NETCFGBU_DEFAULT_USERNAME", "dummy-username")
     monkeypatch.setenv("NETCFGBU_DEFAULT_PASSWORD", "dummy-password")
     monkeypatch.setenv("NETCFGBU_INVENTORY", "/tmp/inventory.csv")
+    monkeypatch.setenv("NETCFGBU_STATEDIR", str(tmpdir))
+
+
+@pytest.fixture(autouse=True)
+def no_network_dns(monkeypatch):
+    """
+    The test inventory host names are not resolved using the network DNS; the
+    lookup of a name, other than localhost, fails without delay.
+    """
+    getaddrinfo = socket.getaddrinfo
+
+    def local_getaddrinfo(host, *args, **kwargs):
+        try:
+            if host and host != "localhost":
+                ip_address(host)
+        except ValueError:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+
+        return getaddrinfo(host, *args, **kwargs)
+
+    monkeypatch.setattr(socket, "getaddrinfo", local_getaddrinfo)
 
 
 class RecordsCollector(logging.Handler):
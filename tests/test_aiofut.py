@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest  # noqa
+
+from netcfgbu.aiofut import iter_completed, as_completed
+
+
+async def sleeper(delay, value):
+    await asyncio.sleep(delay)
+    return value
+
+
+@pytest.mark.asyncio
+async def test_aiofut_pass_iter_completed():
+    """
+    Test the use-case where the tasks complete in a different order than they
+    were given; ensure each task is yielded with its key in completion order.
+    """
+    work = [(f"key{i}", sleeper(delay, i)) for i, delay in enumerate([0.03, 0, 0.01])]
+    results = [(key, task.result()) async for key, task in iter_completed(work)]
+    assert results == [("key1", 1), ("key2", 2), ("key0", 0)]
+
+
+@pytest.mark.asyncio
+async def test_aiofut_pass_async_work():
+    """
+    Test the use-case where the work is an async iterable; ensure that tasks
+    complete before all of the work is produced.
+    """
+    produced = 0
+
+    async def gen_work():
+        nonlocal produced
+        for i in range(3):
+            produced += 1
+            yield i, sleeper(0, i)
+            await asyncio.sleep(0.01)
+
+    seen = list()
+    async for key, task in iter_completed(gen_work()):
+        seen.append((key, produced))
+
+    assert [key for key, _ in seen] == [0, 1, 2]
+    assert seen[0][1] < 3
+
+
+@pytest.mark.asyncio
+async def test_aiofut_fail_deadline():
+    """
+    Test the use-case where the deadline expires; ensure the completed tasks
+    are yielded, and that the pending tasks are cancelled.
+    """
+    slow = sleeper(10, "slow")
+    work = [("fast", sleeper(0, "fast")), ("slow", slow)]
+
+    seen = list()
+    with pytest.raises(asyncio.TimeoutError):
+        async for key, task in iter_completed(work, timeout=0.05):
+            seen.append(key)
+
+    assert seen == ["fast"]
+    await asyncio.sleep(0)
+    assert slow.cr_frame is None
+
+
+@pytest.mark.asyncio
+async def test_aiofut_pass_close():
+    """
+    Test the use-case where the Caller stops iterating; ensure the pending
+    tasks are cancelled.
+    """
+    work = [(i, sleeper(i * 10, i)) for i in range(3)]
+    agen = iter_completed(work)
+    key, task = await agen.__anext__()
+    assert key == 0
+    await agen.aclose()
+
+    await asyncio.sleep(0)
+    assert all(coro.cr_frame is None for _, coro in work)
+
+
+@pytest.mark.asyncio
+async def test_aiofut_pass_max_inflight():
+    """
+    Test the use-case where the number of tasks running is bounded; ensure the
+    work is taken only as the tasks complete, for an iterable and an async
+    iterable.
+    """
+    running = peak = 0
+
+    async def worker(i):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.001 * (i % 3))
+        running -= 1
+        return i
+
+    async def gen_work():
+        for i in range(20):
+            yield i, worker(i)
+
+    for work in ([(i, worker(i)) for i in range(20)], gen_work()):
+        peak = 0
+        keys = [key async for key, _ in iter_completed(work, max_inflight=3)]
+        assert sorted(keys) == list(range(20))
+        assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_aiofut_fail_work():
+    """
+    Test the use-case where the work iterable raises an exception; ensure the
+    exception is raised to the Caller and the started tasks are cancelled.
+    """
+    started = list()
+
+    def gen_work():
+        for i in range(2):
+            started.append(sleeper(10, i))
+            yield i, started[-1]
+        raise ValueError("bad work")
+
+    with pytest.raises(ValueError):
+        async for _ in iter_completed(gen_work()):
+            pass
+
+    await asyncio.sleep(0)
+    assert len(started) == 2
+    assert all(coro.cr_frame is None for coro in started)
+
+
+@pytest.mark.asyncio
+async def test_aiofut_pass_as_completed():
+    coros = [sleeper(0, i) for i in range(3)]
+    results = {task.get_coro(): task.result() async for task in as_completed(coros)}
+    assert [results[coro] for coro in coros] == [0, 1, 2]
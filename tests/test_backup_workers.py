@@ -0,0 +1,139 @@
+from unittest.mock import Mock
+
+import pytest  # noqa
+from click.testing import CliRunner
+
+from netcfgbu import config
+from netcfgbu import inventory
+from netcfgbu import credhints
+from netcfgbu.config_model import OSNameSpec, GroupLimitSpec
+from netcfgbu.connectors.basic import BasicSSHConnector
+from netcfgbu.timing import TimingStats
+from netcfgbu.metrics import BackupMetrics
+from netcfgbu.cli import backup
+
+
+class FakeConnector(BasicSSHConnector):
+    """ connector used by the worker processes in place of SSH """
+
+    async def backup_config(self):
+        if self.name.startswith("bad"):
+            raise ConnectionRefusedError()
+
+        credhints.set_hint(self.host_cfg, 0, "dummy-username")
+        self.timer.add("get_config", 0.01)
+        self.timer.config_bytes = 100
+        self.save_status = "new"
+        return True
+
+
+@pytest.fixture()
+def app_cfg(netcfgbu_envars, monkeypatch, tmpdir):
+    monkeypatch.setenv("NETCFGBU_STATEDIR", str(tmpdir))
+    monkeypatch.setenv("NETCFGBU_CONFIGSDIR", str(tmpdir))
+    app_cfg = config.load()
+    app_cfg.os_name = dict(
+        eos=OSNameSpec(connection=f"{__name__}.{FakeConnector.__name__}")
+    )
+    return app_cfg
+
+
+def test_backup_workers_pass_shards(app_cfg):
+    recs = [dict(host=f"switch{i}", site=f"site{i % 3}") for i in range(12)]
+
+    shards = backup.shard_inventory(app_cfg, recs, 4)
+    assert len(shards) == 4
+    assert sorted(rec["host"] for shard in shards for rec in shard) == sorted(
+        rec["host"] for rec in recs
+    )
+    assert all(len(shard) == 3 for shard in shards)
+
+    # with group limits, each group is processed by a single worker.
+
+    app_cfg.concurrency.groups = [GroupLimitSpec(column="site", limit=2)]
+    shards = backup.shard_inventory(app_cfg, recs, 4)
+    for site in ("site0", "site1", "site2"):
+        assert sum(any(rec["site"] == site for rec in shard) for shard in shards) == 1
+
+    shard_cfg = backup.shard_app_config(app_cfg, 3)
+    assert shard_cfg.concurrency.max_sessions == 167
+    assert shard_cfg.concurrency.max_startups == 34
+    assert app_cfg.concurrency.max_sessions == 500
+
+    # the limits of the groups other than the first are divided.
+
+    app_cfg.concurrency.groups.append(
+        GroupLimitSpec(column="jumphost", limit=10, limits=dict(jh1=4))
+    )
+    shard_cfg = backup.shard_app_config(app_cfg, 3)
+    site_spec, jumphost_spec = shard_cfg.concurrency.groups
+    assert site_spec.limit == 2
+    assert jumphost_spec.limit == 4
+    assert jumphost_spec.limits == dict(jh1=2)
+    assert app_cfg.concurrency.groups[1].limit == 10
+
+
+def test_backup_workers_pass_exec(app_cfg):
+    """
+    Test the use-case where the backup runs in worker processes; ensure the
+    results of all records are passed to the parent process along with the
+    credential hints recorded by the workers, and the progress of each host
+    for the metrics.
+    """
+    recs = [dict(host=f"switch{i}", os_name="eos") for i in range(6)]
+    recs.append(dict(host="bad1", os_name="eos"))
+
+    credhints.load_hints(app_cfg.defaults.state_dir)
+    results = list()
+    timing = TimingStats()
+    metrics = BackupMetrics()
+
+    backup.exec_backup_shards(
+        app_cfg,
+        recs,
+        2,
+        on_result=lambda *result: results.append(result),
+        timing=timing,
+        metrics=metrics,
+    )
+
+    assert len(results) == 7
+    by_host = {rec["host"]: (res, raised) for rec, res, raised, *_ in results}
+    assert by_host["switch0"] == (True, False)
+    assert by_host["bad1"] == ("ConnectionRefusedError: ", True)
+    assert credhints.get_hint(dict(host="switch5", os_name="eos")) is not None
+
+    # the phase durations of the worker processes are merged.
+
+    get_config = timing.summary()["os_name"]["eos"]["get_config"]
+    assert get_config["count"] == 6
+    assert get_config["bytes"] == 600
+
+    assert metrics.in_flight == 0
+    assert metrics.config_bytes == 600
+    assert sum(metrics.histograms[("get_config", "eos")][:-1]) == 6
+
+
+def test_backup_workers_pass_stream(netcfgbu_envars, files_dir, monkeypatch):
+    """
+    Test the use-case where the backup streams the inventory records; ensure
+    the records are not loaded, and that the stream is not used with worker
+    processes.
+    """
+    test_inv = files_dir.joinpath("test-small-inventory.csv")
+    monkeypatch.setenv("NETCFGBU_INVENTORY", str(test_inv))
+
+    mock_exec = Mock()
+    monkeypatch.setattr(backup, "exec_backup", mock_exec)
+
+    runner = CliRunner()
+    res = runner.invoke(backup.cli_backup, obj={}, args=["--stream"])
+    assert res.exit_code == 0
+
+    inv_stream = mock_exec.call_args.kwargs["inventory_recs"]
+    assert isinstance(inv_stream, inventory.InventoryStream)
+    assert len(list(inv_stream)) == 6
+
+    res = runner.invoke(backup.cli_backup, obj={}, args=["--stream", "-w", "2"])
+    assert res.exit_code != 0
+    assert "--stream cannot be used with --workers" in res.output
@@ -0,0 +1,100 @@
+from unittest.mock import Mock
+
+import asyncssh
+import pytest  # noqa
+from asynctest import CoroutineMock
+from click.testing import CliRunner
+
+from netcfgbu import config
+from netcfgbu.config_model import OSNameSpec
+from netcfgbu.connectors.basic import BasicSSHConnector
+from netcfgbu.consts import DEFAULT_PROBE_TIMEOUT
+from netcfgbu.cli import backup, pipeline
+
+
+class FakeConnector(BasicSSHConnector):
+    """ connector that fails the login or the get-config by host name """
+
+    async def backup_config(self):
+        if self.name.startswith("badlogin"):
+            raise asyncssh.PermissionDenied(reason="No valid username/password")
+
+        self.conn = Mock()
+        if self.name.startswith("badconfig"):
+            return TimeoutError("Timeout getting running configuration")
+
+        self.save_status = "new"
+        return True
+
+
+@pytest.fixture()
+def app_cfg(netcfgbu_envars, monkeypatch, tmpdir):
+    monkeypatch.setenv("NETCFGBU_STATEDIR", str(tmpdir))
+    monkeypatch.setenv("NETCFGBU_CONFIGSDIR", str(tmpdir))
+    monkeypatch.chdir(tmpdir)
+    app_cfg = config.load()
+    app_cfg.os_name = dict(
+        eos=OSNameSpec(connection=f"{__name__}.{FakeConnector.__name__}")
+    )
+    return app_cfg
+
+
+def test_cli_pipeline_pass(netcfgbu_envars, files_dir, monkeypatch):
+    test_inv = files_dir.joinpath("test-small-inventory.csv")
+    monkeypatch.setenv("NETCFGBU_INVENTORY", str(test_inv))
+
+    mock_exec = Mock()
+    monkeypatch.setattr(pipeline, "exec_backup", mock_exec)
+
+    runner = CliRunner()
+    res = runner.invoke(pipeline.cli_run, obj={})
+
+    assert res.exit_code == 0
+    assert mock_exec.call_args.kwargs["probe_timeout"] == DEFAULT_PROBE_TIMEOUT
+    assert len(mock_exec.call_args.kwargs["inventory_recs"]) == 6
+
+
+def test_cli_pipeline_pass_exec(app_cfg, monkeypatch, capsys):
+    """
+    Test the use-case where the hosts fail at each stage of the pipeline;
+    ensure that the unreachable hosts are not logged into, and the report
+    includes the stage of each failure.
+    """
+
+    async def mock_probe(host, timeout, port, raise_exc):
+        if host.startswith("down"):
+            raise ConnectionRefusedError()
+        return True
+
+    mock_probe = CoroutineMock(side_effect=mock_probe)
+    monkeypatch.setattr(backup, "probe", mock_probe)
+    monkeypatch.setattr(
+        backup, "make_host_connector", Mock(wraps=backup.make_host_connector)
+    )
+
+    recs = [
+        dict(host=host, os_name="eos")
+        for host in ("switch1", "switch2", "down1", "badlogin1", "badconfig1")
+    ]
+    backup.exec_backup(app_cfg, recs, probe_timeout=5)
+
+    assert mock_probe.call_count == 5
+    assert mock_probe.call_args.kwargs["timeout"] == 5
+    assert mock_probe.call_args.kwargs["port"] == 22
+
+    # the unreachable host does not have a login attempt.
+
+    login_hosts = {
+        call.args[0]["host"] for call in backup.make_host_connector.mock_calls
+    }
+    assert "down1" not in login_hosts
+
+    output = capsys.readouterr().out
+    assert "OK=2, FAIL=3" in output
+    assert "PROBE-FAIL=1, LOGIN-FAIL=1, GET_CONFIG-FAIL=1" in output
+
+    failures = {
+        line.split(",")[0]: line.split(",")[-1]
+        for line in open("failures.csv").read().splitlines()[1:]
+    }
+    assert failures == dict(down1="probe", badlogin1="login", badconfig1="get_config")
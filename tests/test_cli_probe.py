@@ -4,7 +4,6 @@ import asyncio
 import pytest
 from click.testing import CliRunner
 from unittest.mock import Mock
-from asynctest import CoroutineMock
 from netcfgbu.cli import probe
 
 
@@ -28,9 +27,23 @@ def test_cli_probe_pass(monkeypatch):
     assert len(inv_rec) == 6
 
 
+def mock_bulk_probe(result):
+    class MockBulkProbe(object):
+        peak_inflight = 1
+
+        def __init__(self, **kwargs):
+            pass
+
+        async def run(self, targets):
+            for rec, host, port in targets:
+                assert port == 22
+                yield rec, result
+
+    return MockBulkProbe
+
+
 def test_cli_probe_pass_exec(monkeypatch, log_vcr):
-    mock_probe = CoroutineMock()
-    monkeypatch.setattr(probe, "probe", mock_probe)
+    monkeypatch.setattr(probe, "BulkProbe", mock_bulk_probe(True))
     monkeypatch.setattr(probe, "get_logger", Mock(return_value=log_vcr))
 
     runner = CliRunner()
@@ -41,9 +54,7 @@ def test_cli_probe_pass_exec(monkeypatch, log_vcr):
 
 
 def test_cli_probe_fail_exec(monkeypatch, log_vcr):
-    mock_probe = CoroutineMock()
-    mock_probe.side_effect = asyncio.TimeoutError
-    monkeypatch.setattr(probe, "probe", mock_probe)
+    monkeypatch.setattr(probe, "BulkProbe", mock_bulk_probe(asyncio.TimeoutError()))
     monkeypatch.setattr(probe, "get_logger", Mock(return_value=log_vcr))
 
     runner = CliRunner()
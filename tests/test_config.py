@@ -9,6 +9,7 @@ import toml
 
 from netcfgbu.config import load
 from netcfgbu import config_model
+from netcfgbu import consts
 
 
 def test_config_onlyenvars_pass(monkeypatch, netcfgbu_envars):
@@ -297,3 +298,24 @@ def test_vcs_fail_config(tmpdir):
 
     errs = excinfo.value.errors()
     assert errs[0]["msg"].startswith("Only one of")
+
+
+def test_config_concurrency_pass(netcfgbu_envars, request):
+    """
+    Test the use-case where the [concurrency] section is not defined, and
+    where it is defined.
+    """
+    app_cfg = load()
+    assert app_cfg.concurrency.max_startups == consts.DEFAULT_MAX_STARTUPS
+    assert app_cfg.concurrency.max_sessions == consts.DEFAULT_MAX_SESSIONS
+
+    abs_filepath = request.fspath.dirname + "/files/test-config-concurrency.toml"
+    app_cfg = load(filepath=abs_filepath)
+    assert app_cfg.concurrency.max_startups == 20
+    assert app_cfg.concurrency.max_sessions == 200
+
+    groups = app_cfg.concurrency.groups
+    assert len(groups) == 2
+    assert groups[0].column == "site"
+    assert groups[0].limits["nyc1"] == 2
+    assert groups[1].limits is None
@@ -1,6 +1,14 @@
+import asyncio
+from unittest.mock import Mock
+
+from asynctest import CoroutineMock
+
 import pytest  # noqa
 
 from netcfgbu import connectors
+from netcfgbu import config
+from netcfgbu import os_specs
+from netcfgbu.config_model import OSNameSpec, TimeoutsSpec
 
 
 def test_connectors_pass():
@@ -19,3 +27,122 @@ def test_connectors_pass_named():
 def test_connectors_fail_named(tmpdir):
     with pytest.raises(ModuleNotFoundError):
         connectors.get_connector_class(str(tmpdir))
+
+
+def make_stdout_reader(content: bytes, chunk_size: int):
+    """ returns a mock process.stdout.read that returns the content in chunks """
+    chunks = [content[i : i + chunk_size] for i in range(0, len(content), chunk_size)]
+
+    async def read(_n):
+        return chunks.pop(0) if chunks else b""
+
+    return read
+
+
+@pytest.fixture()
+def connector(netcfgbu_envars):
+    app_cfg = config.load()
+    conn = os_specs.make_host_connector(dict(host="switch1", os_name="eos"), app_cfg)
+    conn.process = Mock()
+    return conn
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 7, 8192])
+async def test_connectors_pass_read_until_prompt(connector, chunk_size):
+    """
+    Test the use-case where the output, and the prompt, are split across many
+    reads; ensure the output before the prompt line is returned.
+    """
+    content = b"".join(b"interface Ethernet%d\r\n" % i for i in range(500))
+    connector.process.stdout.read = make_stdout_reader(
+        content + b"switch1#", chunk_size
+    )
+
+    output = await connector.read_until_prompt()
+    assert output == content[:-1]
+    assert connector._cur_prompt == b"switch1#"
+
+
+@pytest.mark.asyncio
+async def test_connectors_fail_read_until_prompt_eof(connector):
+    """
+    Test the use-case where the output ends without a prompt; ensure an
+    IncompleteReadError is raised rather than reading forever.
+    """
+    connector.process.stdout.read = make_stdout_reader(b"some output\n", 8192)
+
+    with pytest.raises(asyncio.IncompleteReadError):
+        await connector.read_until_prompt()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 7, 8192])
+async def test_connectors_pass_read_until_prompt_writer(connector, chunk_size):
+    """
+    Test the use-case where the output is written as it is read; ensure the
+    writer is given only complete lines, and all of the lines before the
+    prompt.
+    """
+    content = b"".join(b"interface Ethernet%d\r\n" % i for i in range(500))
+    connector.process.stdout.read = make_stdout_reader(
+        content + b"switch1#", chunk_size
+    )
+
+    written = list()
+    writer = Mock()
+    writer.write = CoroutineMock(side_effect=written.append)
+
+    output = await connector.read_until_prompt(writer=writer)
+    assert output == b""
+    assert b"".join(written) == content
+    assert all(chunk.endswith(b"\n") for chunk in written)
+
+
+def test_connectors_pass_phase_timeout(connector):
+    """
+    Test the use-case where the phase timeouts are not configured; ensure the
+    connect and get-config phases use the os_spec timeout, and the prompt
+    phase uses the default.
+    """
+    connector.os_spec.timeout = 120
+    assert connector.phase_timeout("connect") == 120
+    assert connector.phase_timeout("get_config") == 120
+    assert connector.phase_timeout("prompt") == 10
+    assert connector.phase_timeout("auth") is None
+    assert connector.phase_timeout("save") is None
+
+
+def test_connectors_pass_phase_timeout_os_name(netcfgbu_envars):
+    """
+    Test the use-case where the os_name defines the phase timeouts; ensure the
+    configured value is used.
+    """
+    app_cfg = config.load()
+    app_cfg.os_name = dict(
+        eos=OSNameSpec(timeouts=TimeoutsSpec(connect=5, prompt=2, save=30))
+    )
+    conn = os_specs.make_host_connector(dict(host="switch1", os_name="eos"), app_cfg)
+    assert conn.phase_timeout("connect") == 5
+    assert conn.phase_timeout("prompt") == 2
+    assert conn.phase_timeout("save") == 30
+    assert conn.phase_timeout("get_config") == conn.os_spec.timeout
+
+
+@pytest.mark.asyncio
+async def test_connectors_fail_prompt_timeout(connector):
+    """
+    Test the use-case where the device does not present the prompt within the
+    prompt timeout; ensure the timeout error identifies the phase.
+    """
+    connector.os_spec.timeouts = TimeoutsSpec(prompt=0.01)
+
+    async def read(_n):
+        await asyncio.sleep(1)
+
+    connector.process.stdout.read = read
+
+    with pytest.raises(asyncio.TimeoutError) as excinfo:
+        await connector.get_running_config()
+
+    assert excinfo.value.args[0] == "Timeout awaiting prompt"
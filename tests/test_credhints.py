@@ -0,0 +1,174 @@
+from unittest.mock import Mock, MagicMock
+import asyncio
+
+import pytest  # noqa
+from asynctest import CoroutineMock  # noqa
+import asyncssh
+
+from netcfgbu import credhints
+from netcfgbu import statefile
+from netcfgbu import config
+from netcfgbu import os_specs
+from netcfgbu import jumphosts
+from netcfgbu.connectors import basic
+from netcfgbu.config_model import Credential, OSNameSpec
+
+
+@pytest.fixture()
+def creds():
+    return [Credential(username=f"user{i}", password=f"password{i}") for i in range(3)]
+
+
+@pytest.fixture()
+def hints_dir(tmpdir):
+    credhints.load_hints(tmpdir)
+    return tmpdir
+
+
+def test_credhints_pass_nohint(hints_dir, creds):
+    rec = dict(host="switch1", os_name="eos")
+    ordered = credhints.order_credentials(rec, creds)
+    assert [i for i, _ in ordered] == [0, 1, 2]
+
+
+def test_credhints_pass_hint(hints_dir, creds):
+    """
+    Test the use-case where a hint is recorded, saved, and reloaded; ensure
+    the hinted credential is ordered first and that the password is not
+    stored.
+    """
+    rec = dict(host="switch1", os_name="eos")
+    credhints.set_hint(rec, 2, "user2")
+    credhints.save_hints()
+
+    hints_file = hints_dir.join(credhints.HINTS_FILENAME)
+    assert "password" not in hints_file.read()
+
+    credhints.load_hints(hints_dir)
+    ordered = credhints.order_credentials(rec, creds)
+    assert [i for i, _ in ordered] == [2, 0, 1]
+
+    # the hint is ignored when the os_name has changed
+
+    rec = dict(host="switch1", os_name="nxos")
+    ordered = credhints.order_credentials(rec, creds)
+    assert [i for i, _ in ordered] == [0, 1, 2]
+
+
+def test_credhints_pass_hint_moved(hints_dir, creds):
+    """
+    Test the use-case where the credentials configuration has changed since
+    the hint was recorded; the hint username is used to find the credential.
+    """
+    rec = dict(host="switch1", os_name="eos")
+    credhints.set_hint(rec, 0, "user1")
+    ordered = credhints.order_credentials(rec, creds)
+    assert [i for i, _ in ordered] == [1, 0, 2]
+
+    credhints.set_hint(rec, 0, "nouser")
+    ordered = credhints.order_credentials(rec, creds)
+    assert [i for i, _ in ordered] == [0, 1, 2]
+
+
+def test_credhints_pass_badfile(tmpdir, creds):
+    tmpdir.join(credhints.HINTS_FILENAME).write("not-json")
+    credhints.load_hints(tmpdir)
+    rec = dict(host="switch1", os_name="eos")
+    assert credhints.get_hint(rec) is None
+
+
+def test_credhints_pass_save_workers(hints_dir, monkeypatch):
+    """
+    Test the use-case where the worker processes save the hints to the same
+    state directory; ensure each process writes its own temporary file.
+    """
+    replaced = list()
+    os_replace = statefile.os.replace
+
+    def mock_replace(src, dst):
+        replaced.append(src.name)
+        os_replace(src, dst)
+
+    monkeypatch.setattr(statefile.os, "replace", mock_replace)
+
+    for pid in (101, 102):
+        monkeypatch.setattr(statefile.os, "getpid", lambda: pid)
+        credhints.set_hint(dict(host=f"switch{pid}", os_name="eos"), 0, "user0")
+        credhints.save_hints()
+
+    assert replaced[0] != replaced[1]
+    assert [path.basename for path in hints_dir.listdir()] == [credhints.HINTS_FILENAME]
+
+
+@pytest.mark.asyncio
+async def test_credhints_pass_login(hints_dir, monkeypatch, netcfgbu_envars):
+    """
+    Test the use-case where the login succeeds with the second credential;
+    ensure the hint is recorded and the next login tries it first.
+    """
+    monkeypatch.setenv("ENABLE_PASSWORD", "enable-password")
+    app_cfg = config.load()
+    app_cfg.credentials = [Credential(username="superadmin", password="secret")]
+    rec = dict(host="switch1", os_name="eos")
+
+    tried = list()
+
+    async def fake_connect(**conn_args):
+        tried.append(conn_args["username"])
+        if conn_args["username"] != "superadmin":
+            raise asyncssh.PermissionDenied(reason="bad")
+        return Mock()
+
+    monkeypatch.setattr(basic.asyncssh, "connect", fake_connect)
+    monkeypatch.setattr(jumphosts.JumpHost, "available", [])
+
+    await os_specs.make_host_connector(rec, app_cfg).login()
+    assert tried == ["dummy-username", "superadmin"]
+    assert credhints.get_hint(rec)["username"] == "superadmin"
+
+    tried.clear()
+    await os_specs.make_host_connector(rec, app_cfg).login()
+    assert tried == ["superadmin"]
+
+
+@pytest.mark.asyncio
+async def test_credhints_pass_inband_login(hints_dir, monkeypatch, netcfgbu_envars):
+    """
+    Test the use-case where the SSH connection succeeds and the device login
+    is completed in-band; ensure the hint is recorded only when the device
+    prompt is read after the in-band login.
+    """
+    app_cfg = config.load()
+    app_cfg.os_name = dict(
+        eos=OSNameSpec(
+            connection="netcfgbu.connectors.ssh.LoginPromptUserPass",
+            pre_get_config="terminal length 0",
+        )
+    )
+    rec = dict(host="switch1", os_name="eos")
+    outputs = list()
+
+    def fake_connect(**conn_args):
+        process = Mock()
+        process.stdout.readuntil = CoroutineMock()
+        process.stdout.read = CoroutineMock(side_effect=outputs.pop(0))
+        conn = MagicMock()
+        conn.create_process = CoroutineMock(return_value=process)
+        return conn
+
+    monkeypatch.setattr(
+        basic.asyncssh, "connect", CoroutineMock(side_effect=fake_connect)
+    )
+    monkeypatch.setattr(jumphosts.JumpHost, "available", [])
+
+    # the device closes the session after the in-band login is rejected.
+
+    outputs.append([b"Access denied\n", b""])
+    with pytest.raises(asyncio.IncompleteReadError):
+        await os_specs.make_host_connector(rec, app_cfg).test_login(timeout=5)
+    assert credhints.get_hint(rec) is None
+
+    outputs.append([b"Welcome\nswitch1#"])
+    conn = os_specs.make_host_connector(rec, app_cfg)
+    assert await conn.test_login(timeout=5) == "dummy-username"
+    assert credhints.get_hint(rec)["username"] == "dummy-username"
@@ -1,8 +1,29 @@
+from pathlib import Path
+from unittest.mock import Mock
+import os
+
 import pytest  # noqa
 from first import first
 
 from netcfgbu import inventory
 from netcfgbu import config
+from netcfgbu import jumphosts
+from netcfgbu.config_model import JumphostSpec
+from netcfgbu.filtering import create_filter
+from netcfgbu.inventory import Inventory
+
+
+@pytest.fixture()
+def inventory_recs():
+    return [
+        dict(
+            host=f"switch{i}.{('nyc1', 'dc1', 'sfo1')[i % 3]}",
+            ipaddr=(f"10.0.{i // 16}.{i % 16}" if i % 5 else f"2620:abcd:10::{i}"),
+            os_name=("eos", "ios", "nxos", "EOS")[i % 4],
+            site=f"site{i % 7}",
+        )
+        for i in range(100)
+    ]
 
 
 def test_inventory_pass(request, monkeypatch, netcfgbu_envars):
@@ -27,6 +48,237 @@ def test_inventory_pass(request, monkeypatch, netcfgbu_envars):
     assert inv_recs[0]["host"] == "switch2"
 
 
+def test_inventory_pass_records(inventory_recs):
+    """
+    Test the use-case where the inventory records are stored by column;
+    ensure the records, the column values, and the host lookup are the same
+    as the original records.
+    """
+    inv = Inventory.from_records(inventory_recs)
+
+    assert len(inv) == 100
+    assert list(inv) == inventory_recs
+    assert inv[-1] == inventory_recs[-1]
+    assert inv[1::40] == inventory_recs[1::40]
+    assert list(inv.column("site")) == [rec["site"] for rec in inventory_recs]
+    assert inv.get("switch7.dc1") == inventory_recs[7]
+    assert inv.get("switch7.nyc1") is None
+
+    # the distinct values are stored once
+
+    assert len(inv._columns["os_name"].values) == 4
+
+    # a missing value is an empty string, and an extra value is ignored.
+
+    inv = Inventory(["host", "os_name"], [["switch1"], ["switch2", "eos", "x"]])
+    assert list(inv) == [
+        dict(host="switch1", os_name=""),
+        dict(host="switch2", os_name="eos"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "constraints",
+    [
+        ["os_name=eos"],
+        ["os_name=eos|nxos", "host=.*nyc1"],
+        ["site=site3"],
+        ["ipaddr=10.0.2.0/28"],
+        ["ipaddr=10.0.2.1"],
+        ["ipaddr=2620:abcd:10::/64"],
+        ["ipaddr=10.0.1.*"],
+        ["host=switch1.nyc1"],
+        ["host=nothing"],
+    ],
+)
+def test_inventory_pass_select(inventory_recs, constraints):
+    """
+    Test the use-case where the inventory is filtered using the indexes;
+    ensure the selected records are the same as those of the filter function,
+    for the include and exclude constraints, and for a selection of a
+    selection.
+    """
+    inv = Inventory.from_records(inventory_recs)
+    field_names = inv.field_names
+
+    for include in (True, False):
+        filter_fn = create_filter(constraints, field_names, include=include)
+        expected = [rec for rec in inventory_recs if filter_fn(rec)]
+        assert list(inv.select(constraints, include=include)) == expected
+
+        view = inv.select(["os_name=eos"])
+        expected = [rec for rec in view if filter_fn(rec)]
+        assert list(view.select(constraints, include=include)) == expected
+
+
+def test_inventory_pass_select_file(inventory_recs, tmpdir):
+    """
+    Test the use-case where the inventory is filtered by the hosts in a CSV
+    file; ensure the host lookup is exact.
+    """
+    filepath = tmpdir.join("hosts.csv")
+    filepath.write("host\nswitch3.nyc1\nSWITCH4.dc1\nswitch5.sfo1\n")
+
+    inv = Inventory.from_records(inventory_recs).select([f"@{filepath}"])
+    assert [rec["host"] for rec in inv] == ["switch3.nyc1", "switch5.sfo1"]
+
+
+def test_inventory_pass_select_fallback(inventory_recs):
+    """
+    Test the use-case where the inventory is filtered by a filter that has no
+    index; ensure a filter of one field is evaluated once for each distinct
+    value, and any other filter once for each record.
+    """
+    inv = Inventory.from_records(inventory_recs)
+
+    field_filter = Mock(side_effect=lambda rec: rec["os_name"] == "ios")
+    field_filter.fieldname = "os_name"
+    field_filter.hostnames = None
+    expected = [rec for rec in inventory_recs if rec["os_name"] == "ios"]
+
+    assert [inv[row] for row in sorted(inv.match_rows([field_filter]))] == expected
+    assert field_filter.call_count == 4
+
+    def rec_filter(rec):
+        return rec["os_name"] == "ios" and rec["site"] == "site1"
+
+    expected = [rec for rec in inventory_recs if rec_filter(rec)]
+    assert [inv[row] for row in sorted(inv.match_rows([rec_filter]))] == expected
+
+
+def test_inventory_pass_jumphosts(inventory_recs):
+    """
+    Test the use-case where the required jump hosts are selected using the
+    inventory indexes; ensure the selection is the same as when each record is
+    matched to its first jump host.
+    """
+    specs = [
+        JumphostSpec(proxy="jh1", include=["host=.*nyc1"]),
+        JumphostSpec(proxy="jh2", include=["os_name=eos", "site=site1"]),
+        JumphostSpec(proxy="jh3", include=["ipaddr=10.0.0.0/24"]),
+        JumphostSpec(proxy="jh4", exclude=["host=.*dc1", "host=.*sfo1"]),
+        JumphostSpec(proxy="jh5", include=["site=site6"]),
+    ]
+
+    inv = Inventory.from_records(inventory_recs)
+    jumphosts.init_jumphosts(specs, inv)
+    selected = [jh.name for jh in jumphosts.JumpHost.available]
+
+    jh_list = [jumphosts.JumpHost(spec, inv.field_names) for spec in specs]
+    expected = {
+        first(jh.name for jh in jh_list if jh.filter(rec)) for rec in inventory_recs
+    }
+    assert selected == [jh.name for jh in jh_list if jh.name in expected]
+    assert selected == ["jh1", "jh2", "jh3", "jh5"]
+
+    jumphosts.JumpHost.available = []
+
+
+def test_inventory_pass_cache(tmpdir, monkeypatch, netcfgbu_envars):
+    """
+    Test the use-case where the inventory is loaded from the cache; ensure the
+    CSV file is not parsed when it has not changed, when it was only touched,
+    and that it is parsed again when the content has changed.
+    """
+    inventory_file = tmpdir.join("inventory.csv")
+    inventory_file.write("host,os_name\nswitch1,eos\n# comment\nswitch2,ios\n")
+    monkeypatch.setenv("NETCFGBU_INVENTORY", str(inventory_file))
+    app_cfg = config.load()
+
+    from_csv = Mock(wraps=Inventory.from_csv)
+    monkeypatch.setattr(Inventory, "from_csv", from_csv)
+
+    def load_hosts():
+        return [rec["host"] for rec in inventory.load(app_cfg)]
+
+    assert load_hosts() == ["switch1", "switch2"]
+    assert from_csv.call_count == 1
+
+    cache_file = inventory.cache_filepath(
+        Path(inventory_file), app_cfg.defaults.state_dir
+    )
+    assert cache_file.exists()
+
+    assert load_hosts() == ["switch1", "switch2"]
+    assert from_csv.call_count == 1
+
+    # the file is touched, the content has not changed
+
+    os.utime(inventory_file, ns=(0, 0))
+    assert load_hosts() == ["switch1", "switch2"]
+    assert from_csv.call_count == 1
+
+    # the content has changed, with the same size
+
+    inventory_file.write("host,os_name\nswitch1,eos\n# comment\nswitch3,ios\n")
+    os.utime(inventory_file, ns=(10 ** 9, 10 ** 9))
+    assert load_hosts() == ["switch1", "switch3"]
+    assert from_csv.call_count == 2
+
+
+def test_inventory_pass_cache_corrupt(tmpdir, monkeypatch, netcfgbu_envars, log_vcr):
+    """
+    Test the use-case where the inventory cache cannot be read; ensure the
+    CSV file is parsed, and the cache is saved again.
+    """
+    monkeypatch.setattr(inventory, "get_logger", Mock(return_value=log_vcr))
+    inventory_file = tmpdir.join("inventory.csv")
+    inventory_file.write("host,os_name\nswitch1,eos\n")
+    monkeypatch.setenv("NETCFGBU_INVENTORY", str(inventory_file))
+    app_cfg = config.load()
+
+    cache_file = inventory.cache_filepath(
+        Path(inventory_file), app_cfg.defaults.state_dir
+    )
+    cache_file.write_bytes(b"not a pickle")
+
+    assert [rec["host"] for rec in inventory.load(app_cfg)] == ["switch1"]
+    records = log_vcr.handlers[0].records
+    assert len(records) == 1
+    assert "unable to load cache" in records[0].getMessage()
+    assert inventory.read_cache(cache_file) is not None
+
+
+def test_inventory_pass_stream(inventory_recs, tmpdir, monkeypatch, netcfgbu_envars):
+    """
+    Test the use-case where the inventory records are streamed from the file;
+    ensure the records are the same as those of the loaded inventory, and are
+    read as they are iterated.
+    """
+    inventory_file = tmpdir.join("inventory.csv")
+    lines = ["host,ipaddr,os_name,site", "# comment"]
+    lines += [",".join(rec.values()) for rec in inventory_recs]
+    inventory_file.write("\n".join(lines) + "\nswitch100\n")
+    monkeypatch.setenv("NETCFGBU_INVENTORY", str(inventory_file))
+    app_cfg = config.load()
+
+    limits, excludes = ["os_name=eos|nxos"], ["ipaddr=10.0.2.0/24"]
+    inv_stream = inventory.load(app_cfg, limits, excludes, stream=True)
+    assert isinstance(inv_stream, inventory.InventoryStream)
+    assert inv_stream.field_names == ["host", "ipaddr", "os_name", "site"]
+
+    iter_recs = iter(inv_stream)
+    assert next(iter_recs) == inventory_recs[0]
+    assert inv_stream.count == 1
+
+    expected = list(inventory.load(app_cfg, limits, excludes))
+    assert list(inv_stream) == expected
+    assert inv_stream.count == 1 + len(expected)
+
+    # the records with missing values, and the filter expressions.
+
+    assert list(inventory.load(app_cfg, ["host=switch100"], stream=True)) == [
+        dict(host="switch100", ipaddr="", os_name="", site="")
+    ]
+
+    with pytest.raises(ValueError):
+        inventory.load(app_cfg, ["nosuchfield=eos"], stream=True)
+
+    jumphosts.init_jumphosts([JumphostSpec(proxy="jh1")], inv_stream)
+    assert [jh.name for jh in jumphosts.JumpHost.available] == ["jh1"]
+    jumphosts.JumpHost.available = []
+
+
 def test_inventory_fail_nofilegiven(tmpdir, netcfgbu_envars):
     """
     Test the use-case where the inventory is given in configuration file,
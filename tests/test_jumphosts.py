@@ -137,3 +137,36 @@ async def test_jumphosts_fail_connect(
         log_recs[-1].msg
         == "JUMPHOST: connect to dummy-user@1.2.3.4:8022 failed: nooooope"
     )
+
+
+@pytest.mark.asyncio
+async def test_jumphosts_pass_connect_many(mock_asyncssh_connect, monkeypatch):
+    """
+    Test the use-case where many jump hosts are used; ensure they are
+    connected at the same time, up to the connect limit.
+    """
+    monkeypatch.setattr(jumphosts, "JUMPHOST_MAX_CONNECTS", 3)
+    inflight = peak = 0
+
+    async def mock_connect(**conn_args):
+        nonlocal inflight, peak
+        inflight += 1
+        peak = max(peak, inflight)
+        await asyncio.sleep(0.01)
+        inflight -= 1
+        return Mock()
+
+    mock_asyncssh_connect.side_effect = mock_connect
+
+    jh_specs = [
+        config_model.JumphostSpec(proxy=f"10.0.0.{i}", include=["os_name=eos"])
+        for i in range(5)
+    ]
+    jumphosts.init_jumphosts(jumphost_specs=jh_specs, inventory=None)
+
+    assert await jumphosts.connect_jumphosts()
+    assert mock_asyncssh_connect.call_count == 5
+    assert peak == 3
+    assert all(jh.is_active for jh in jumphosts.JumpHost.available)
+
+    jumphosts.JumpHost.available = []
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest  # noqa
+
+from netcfgbu.limiter import AdaptiveLimiter
+from netcfgbu import connectors
+from netcfgbu.config_model import ConcurrencySpec
+
+
+@pytest.mark.asyncio
+async def test_limiter_pass_increase():
+    """
+    Test the use-case where all contexts complete within the target latency;
+    the limit is increased up to the max limit, by one for each context until
+    the limit is first cut, and then by one for each limit-worth of contexts.
+    """
+    limiter = AdaptiveLimiter(min_limit=10, max_limit=100, target_latency=5)
+
+    for _ in range(40):
+        async with limiter:
+            pass
+
+    assert limiter.limit == 50
+    assert limiter.in_use == 0
+
+    limiter.record(latency=1, overloaded=True)
+    assert limiter.limit == 25
+
+    for _ in range(25):
+        limiter.record(latency=1, overloaded=False)
+
+    assert limiter.limit == 26
+
+    for _ in range(10000):
+        limiter.record(latency=1, overloaded=False)
+
+    assert limiter.limit == 100
+
+
+def test_limiter_pass_min_above_max():
+    """
+    Test the use-case where the max limit, for example the --batch option, is
+    below the min limit; ensure the limit never goes above the max limit.
+    """
+    limiter = AdaptiveLimiter(min_limit=10, max_limit=4, target_latency=5)
+    assert limiter.limit == 4
+
+    for _ in range(20):
+        limiter.record(latency=1, overloaded=False)
+
+    assert limiter.limit == 4
+
+
+@pytest.mark.asyncio
+async def test_limiter_pass_decrease():
+    """
+    Test the use-case where a context raises an overload error; the limit is
+    cut in half, and not below the min limit.
+    """
+    limiter = AdaptiveLimiter(min_limit=2, max_limit=100, target_latency=5)
+    limiter._limit = 40
+
+    with pytest.raises(asyncio.TimeoutError):
+        async with limiter:
+            raise asyncio.TimeoutError()
+
+    assert limiter.limit == 20
+
+    for _ in range(10):
+        with pytest.raises(ConnectionResetError):
+            async with limiter:
+                raise ConnectionResetError()
+
+    assert limiter.limit == 2
+
+
+@pytest.mark.asyncio
+async def test_limiter_pass_nodecrease_stale():
+    """
+    Test the use-case where many concurrent contexts fail with an overload
+    error; the limit is cut only once for the contexts that started before
+    the first decrease.
+    """
+    limiter = AdaptiveLimiter(min_limit=1, max_limit=100, target_latency=5)
+    limiter._limit = 40
+
+    async def fails():
+        async with limiter:
+            await asyncio.sleep(0)
+            raise asyncio.TimeoutError()
+
+    await asyncio.gather(*(fails() for _ in range(10)), return_exceptions=True)
+    assert limiter.limit == 20
+
+
+@pytest.mark.asyncio
+async def test_limiter_pass_bounded():
+    """
+    Test the use-case where more tasks than the limit use the limiter; ensure
+    that the number in use never exceeds the limit.
+    """
+    limiter = AdaptiveLimiter(min_limit=3, max_limit=3, target_latency=5)
+    max_in_use = 0
+
+    async def work():
+        nonlocal max_in_use
+        async with limiter:
+            max_in_use = max(max_in_use, limiter.in_use)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(work() for _ in range(20)))
+    assert max_in_use == 3
+
+
+def test_limiter_pass_set_concurrency():
+    """
+    Test the use-case where the concurrency spec enables the adaptive limiter.
+    """
+    spec = ConcurrencySpec(adaptive=True, min_startups=5, max_startups=50)
+    limiter = connectors.set_concurrency(spec)
+    assert isinstance(limiter, AdaptiveLimiter)
+    assert limiter.limit == 5
+    assert connectors.BasicSSHConnector._max_startups_sem4 is limiter
+
+    assert connectors.set_concurrency(ConcurrencySpec()) is None
+    assert isinstance(
+        connectors.BasicSSHConnector._max_startups_sem4, asyncio.Semaphore
+    )
@@ -0,0 +1,99 @@
+from urllib.request import urlopen
+
+import pytest  # noqa
+
+from netcfgbu.config_model import MetricsSpec
+from netcfgbu.metrics import BackupMetrics, MetricsExporter, reason_category
+from netcfgbu.timing import PhaseTimer
+
+
+@pytest.fixture()
+def metrics():
+    metrics = BackupMetrics()
+
+    for index in range(3):
+        timer = PhaseTimer()
+        timer.add("session_wait", 0.5)
+        timer.add("get_config", 2.0 * (index + 1))
+        timer.config_bytes = 100
+
+        metrics.host_started()
+        metrics.host_stopped(dict(host=f"switch{index}", os_name="eos"), timer)
+        metrics.host_result(
+            index != 2,
+            None
+            if index != 2
+            else "ConnectionRefusedError: [Errno 111] Connect call failed "
+            "('10.0.0.2', 22)",
+        )
+
+    metrics.host_started()
+    return metrics
+
+
+def test_metrics_pass_render(metrics):
+    """
+    Test the use-case where hosts have completed and failed; ensure the
+    counters and the phase histograms are rendered in the exposition format.
+    """
+    lines = metrics.render().splitlines()
+
+    assert "netcfgbu_sessions_in_flight 1" in lines
+    assert "netcfgbu_hosts_completed_total 2" in lines
+    assert 'netcfgbu_hosts_failed_total{reason="ECONNREFUSED"} 1' in lines
+    assert "netcfgbu_config_bytes_total 300" in lines
+    assert (
+        'netcfgbu_semaphore_wait_seconds_total{semaphore="sessions"} 1.500000' in lines
+    )
+
+    labels = 'phase="get_config",os_name="eos"'
+    assert f'netcfgbu_phase_duration_seconds_bucket{{{labels},le="2.5"}} 1' in lines
+    assert f'netcfgbu_phase_duration_seconds_bucket{{{labels},le="5.0"}} 2' in lines
+    assert f'netcfgbu_phase_duration_seconds_bucket{{{labels},le="+Inf"}} 3' in lines
+    assert f"netcfgbu_phase_duration_seconds_sum{{{labels}}} 12.000000" in lines
+    assert f"netcfgbu_phase_duration_seconds_count{{{labels}}} 3" in lines
+
+
+@pytest.mark.parametrize(
+    "reason, category",
+    [
+        ("TIMEOUT", "TIMEOUT"),
+        ("TIMEOUT('read',)", "TIMEOUT"),
+        ("ECONNREFUSED", "ECONNREFUSED"),
+        ("ConnectionResetError: [Errno 104] Connection reset by peer", "ECONNRESET"),
+        ("PermissionDenied: No valid username/password", "PermissionDenied"),
+        ("DeadlineExpired: Deadline expired for switch1", "DEADLINE"),
+        ("UNREACHABLE 12s ago: ECONNREFUSED", "UNREACHABLE"),
+        ("worker 1 did not complete", "OTHER"),
+        (None, "OTHER"),
+    ],
+)
+def test_metrics_pass_reason_category(reason, category):
+    """
+    Test the use-case where a host failed; ensure the failure reason label is
+    a category without the host specific text of the reason.
+    """
+    assert reason_category(reason) == category
+
+
+def test_metrics_pass_exporter(metrics, tmpdir):
+    """
+    Test the use-case where the metrics are exported to a textfile and served
+    over HTTP; ensure both present the rendered metrics.
+    """
+    textfile = tmpdir.join("netcfgbu.prom")
+    spec = MetricsSpec(textfile=str(textfile), port=0, interval=60)
+
+    exporter = MetricsExporter(spec, metrics)
+    assert exporter.enabled
+    exporter.start()
+    try:
+        host, port = exporter.server.server_address
+        with urlopen(f"http://{host}:{port}/metrics") as resp:
+            assert resp.headers["Content-Type"].startswith("text/plain")
+            assert resp.read().decode() == metrics.render()
+    finally:
+        exporter.stop()
+
+    assert textfile.read() == metrics.render()
+    assert not MetricsExporter(MetricsSpec(), metrics).enabled
@@ -1,11 +1,15 @@
 import asyncio
+import errno
+import socket
 from unittest.mock import Mock
 
 from asynctest import CoroutineMock  # noqa
 import pytest  # noqa
 
-from netcfgbu import probe
+from netcfgbu import config, probe
+from netcfgbu.config_model import OSNameSpec
 from netcfgbu.consts import DEFAULT_PROBE_TIMEOUT
+from netcfgbu.os_specs import get_ssh_port
 
 
 @pytest.mark.asyncio
@@ -55,3 +59,103 @@ async def test_probe_pass_raises_timeout(monkeypatch):
 
     with pytest.raises(asyncio.TimeoutError):
         await probe.probe(host="1.2.3.4", timeout=DEFAULT_PROBE_TIMEOUT, raise_exc=True)
+
+
+@pytest.mark.asyncio
+async def test_probe_pass_closes():
+    """
+    Test the use-case where the probe connects to the port; ensure that the
+    connection is closed rather than leaked.
+    """
+    closed = asyncio.Event()
+
+    async def on_connect(reader, writer):
+        await reader.read()
+        closed.set()
+
+    server = await asyncio.start_server(on_connect, host="127.0.0.1", port=0)
+    port = server.sockets[0].getsockname()[1]
+
+    try:
+        assert await probe.probe(host="127.0.0.1", port=port, timeout=1) is True
+        await asyncio.wait_for(closed.wait(), timeout=1)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def open_port():
+    """ returns a listening socket, and a port number that is not listening """
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(100)
+
+    closed = socket.socket()
+    closed.bind(("127.0.0.1", 0))
+    closed_port = closed.getsockname()[1]
+    closed.close()
+
+    return listener, closed_port
+
+
+@pytest.mark.asyncio
+async def test_probe_bulk_pass():
+    """
+    Test the use-case where hosts are probed in bulk with a limit on the
+    connects in progress; ensure the result of each host, by address or name,
+    is the connect result.
+    """
+    listener, closed_port = open_port()
+    port = listener.getsockname()[1]
+
+    targets = [(f"up{i}", "127.0.0.1", port) for i in range(10)]
+    targets.append(("down", "127.0.0.1", closed_port))
+    targets.append(("byname", "localhost", port))
+
+    prober = probe.BulkProbe(timeout=2, max_inflight=4)
+    try:
+        results = {key: res async for key, res in prober.run(targets)}
+    finally:
+        listener.close()
+
+    assert len(results) == 12
+    assert all(results[f"up{i}"] is True for i in range(10))
+    assert results["byname"] is True
+    assert isinstance(results["down"], OSError)
+    assert results["down"].errno == errno.ECONNREFUSED
+    assert prober.peak_inflight <= 4
+
+
+@pytest.mark.asyncio
+async def test_probe_bulk_pass_rate():
+    """
+    Test the use-case where the probe rate is limited; ensure the probes are
+    started no faster than the rate.
+    """
+    listener, _ = open_port()
+    port = listener.getsockname()[1]
+    loop = asyncio.get_running_loop()
+
+    targets = [(i, "127.0.0.1", port) for i in range(5)]
+    prober = probe.BulkProbe(timeout=2, rate=20)
+
+    started = loop.time()
+    try:
+        results = [res async for _, res in prober.run(targets)]
+    finally:
+        listener.close()
+
+    assert results == [True] * 5
+    assert loop.time() - started >= 0.15
+
+
+def test_probe_pass_ssh_port(netcfgbu_envars):
+    app_cfg = config.load()
+    app_cfg.ssh_configs = dict(port=2222)
+    app_cfg.os_name = dict(eos=OSNameSpec(ssh_configs=dict(port=8022)))
+
+    assert get_ssh_port(dict(host="sw1", os_name="eos"), app_cfg) == 8022
+    assert get_ssh_port(dict(host="sw2", os_name="ios"), app_cfg) == 2222
+
+    app_cfg.ssh_configs = None
+    assert get_ssh_port(dict(host="sw2", os_name="ios"), app_cfg) == 22
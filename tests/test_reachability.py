@@ -0,0 +1,175 @@
+import asyncio
+import json
+from unittest.mock import Mock
+
+import pytest  # noqa
+
+from netcfgbu import config
+from netcfgbu import reachability
+from netcfgbu.config_model import OSNameSpec, TimeoutsSpec
+from netcfgbu.connectors import basic
+from netcfgbu.connectors.basic import BasicSSHConnector
+from netcfgbu.scheduler import DeadlineExpired
+from netcfgbu.cli import backup
+
+
+class FakeConnector(BasicSSHConnector):
+    """ connector that fails to connect to the "down" hosts """
+
+    async def backup_config(self):
+        if self.name.startswith("down"):
+            raise ConnectionRefusedError(111, "Connect call failed")
+
+        self.conn = Mock()
+        self.save_status = "new"
+        return True
+
+
+@pytest.fixture()
+def app_cfg(netcfgbu_envars, monkeypatch, tmpdir):
+    monkeypatch.setenv("NETCFGBU_STATEDIR", str(tmpdir))
+    monkeypatch.setenv("NETCFGBU_CONFIGSDIR", str(tmpdir))
+    monkeypatch.chdir(tmpdir)
+    app_cfg = config.load()
+    app_cfg.os_name = dict(
+        eos=OSNameSpec(connection=f"{__name__}.{FakeConnector.__name__}")
+    )
+    return app_cfg
+
+
+def test_reachability_pass_ttl(tmpdir, monkeypatch):
+    """
+    Test the use-case where a host is recorded unreachable, saved, and
+    reloaded; ensure the host is unreachable until the TTL expires, or the
+    host is recorded reachable.
+    """
+    reachability.load_reachability(tmpdir)
+    recs = [dict(host=f"switch{i}", os_name="eos") for i in range(3)]
+
+    reachability.record_unreachable(recs[1], "TIMEOUT")
+    reachability.record_unreachable(recs[1], "ECONNREFUSED")
+    reachability.record_reachable(recs[2])
+    reachability.save_reachability()
+
+    reachability.load_reachability(tmpdir)
+    entry = reachability.get_unreachable(recs[1], ttl=60)
+    assert entry["reason"] == "ECONNREFUSED"
+    assert entry["count"] == 2
+
+    reachable, unreachable = reachability.partition_unreachable(recs, ttl=60)
+    assert reachable == [recs[0], recs[2]]
+    assert unreachable == [(recs[1], entry)]
+
+    unreachable = list()
+    iter_recs = reachability.iter_reachable(iter(recs), 60, unreachable)
+    assert list(iter_recs) == [recs[0], recs[2]]
+    assert unreachable == [(recs[1], entry)]
+
+    # the entry expires after the TTL, and a TTL of 0 disables the cache.
+
+    now = entry["ts"] + 61
+    monkeypatch.setattr(reachability.time, "time", lambda: now)
+    assert reachability.get_unreachable(recs[1], ttl=60) is None
+    assert reachability.partition_unreachable(recs, ttl=0) == (recs, [])
+
+    reachability.record_reachable(recs[1])
+    assert reachability.get_unreachable(recs[1], ttl=3600) is None
+
+
+def test_reachability_pass_errors():
+    assert reachability.is_unreachable_error(asyncio.TimeoutError())
+    assert reachability.is_unreachable_error(ConnectionRefusedError())
+    assert not reachability.is_unreachable_error(DeadlineExpired())
+    assert not reachability.is_unreachable_error(ValueError())
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_reachability_pass_backup_skip(app_cfg, monkeypatch, capsys, stream):
+    """
+    Test the use-case where the backup skips the hosts that were recently
+    unreachable; ensure that no connection is attempted to those hosts and
+    they are reported with the reason, including when the inventory records
+    are streamed.
+    """
+    reachability.load_reachability(app_cfg.defaults.state_dir)
+    reachability.record_unreachable(dict(host="switch2"), "ECONNREFUSED")
+    reachability.save_reachability()
+
+    mock_connector = Mock(wraps=backup.make_host_connector)
+    monkeypatch.setattr(backup, "make_host_connector", mock_connector)
+    app_cfg.probe.unreachable = reachability.UNREACHABLE_SKIP
+
+    recs = [dict(host=f"switch{i}", os_name="eos") for i in range(3)]
+    backup.exec_backup(app_cfg, iter(recs) if stream else recs)
+
+    assert [call.args[0]["host"] for call in mock_connector.mock_calls] == [
+        "switch0",
+        "switch1",
+    ]
+
+    output = capsys.readouterr().out
+    assert "OK=2, FAIL=1" in output
+    assert "UNREACHABLE-SKIPPED=1" in output
+    assert "UNREACHABLE 0s ago: ECONNREFUSED" in output
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_reachability_pass_backup_defer(app_cfg, monkeypatch, stream):
+    """
+    Test the use-case where the backup defers the hosts that were recently
+    unreachable; ensure those hosts are backed up last, including when the
+    inventory records are streamed, and the connect failures and successes
+    are recorded in the cache.
+    """
+    reachability.load_reachability(app_cfg.defaults.state_dir)
+    reachability.record_unreachable(dict(host="switch0"), "TIMEOUT")
+    reachability.save_reachability()
+
+    mock_connector = Mock(wraps=backup.make_host_connector)
+    monkeypatch.setattr(backup, "make_host_connector", mock_connector)
+    app_cfg.concurrency.max_sessions = 1
+
+    recs = [dict(host=f"switch{i}", os_name="eos") for i in range(3)]
+    recs.append(dict(host="down1", os_name="eos"))
+    backup.exec_backup(app_cfg, iter(recs) if stream else recs)
+
+    assert [call.args[0]["host"] for call in mock_connector.mock_calls] == [
+        "switch1",
+        "switch2",
+        "down1",
+        "switch0",
+    ]
+
+    cache_file = app_cfg.defaults.state_dir / reachability.REACHABILITY_FILENAME
+    data = json.loads(cache_file.read_text())
+    assert data["switch0"] == dict(ok=True)
+    assert data["down1"]["ok"] is False
+    assert data["down1"]["reason"].startswith("ConnectionRefusedError")
+
+
+@pytest.mark.parametrize("connected", [False, True])
+def test_reachability_pass_backup_auth_timeout(app_cfg, monkeypatch, connected):
+    """
+    Test the use-case where the login times out; ensure the host is recorded
+    as unreachable when the TCP connection was not made, and not when the
+    timeout is in the SSH handshake or authentication.
+    """
+
+    async def fake_connect(client_factory, **_conn_args):
+        if connected:
+            client_factory().connection_made(Mock())
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(basic.asyncssh, "connect", fake_connect)
+    app_cfg.os_name = dict(eos=OSNameSpec(timeouts=TimeoutsSpec(connect=0.05)))
+
+    reachability.load_reachability(app_cfg.defaults.state_dir)
+    backup.exec_backup(app_cfg, [dict(host="switch1", os_name="eos")])
+
+    cache_file = app_cfg.defaults.state_dir / reachability.REACHABILITY_FILENAME
+    data = json.loads(cache_file.read_text()) if cache_file.exists() else dict()
+    if connected:
+        assert "switch1" not in data
+    else:
+        assert data["switch1"]["ok"] is False
+        assert data["switch1"]["reason"] == "TIMEOUT"
@@ -0,0 +1,198 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest  # noqa
+
+from netcfgbu import resolver
+from netcfgbu import jumphosts
+from netcfgbu import config
+from netcfgbu.config_model import DNSSpec, OSNameSpec
+from netcfgbu.connectors import BasicSSHConnector
+
+
+class FakeGetAddrInfo(object):
+    """ getaddrinfo that counts the lookups, and the lookups in progress """
+
+    def __init__(self):
+        self.lookups = list()
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, host, port, family=0, type=0, proto=0, flags=0):
+        with self.lock:
+            self.lookups.append(host)
+            self.inflight += 1
+            self.peak_inflight = max(self.peak_inflight, self.inflight)
+
+        try:
+            time.sleep(0.5 if host.startswith("slow") else 0.01)
+            if host.startswith("bad"):
+                raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+
+            addr = f"10.0.0.{int(host.rpartition('-')[-1])}"
+            addrinfo = [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (addr, 0))]
+            if host.startswith("multi"):
+                addrinfo.append(
+                    (socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("::1", 0))
+                )
+            return addrinfo
+
+        finally:
+            with self.lock:
+                self.inflight -= 1
+
+
+@pytest.fixture()
+def fake_getaddrinfo(monkeypatch):
+    fake = FakeGetAddrInfo()
+    monkeypatch.setattr(socket, "getaddrinfo", fake)
+    return fake
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def test_resolver_pass_inventory(tmpdir, fake_getaddrinfo):
+    """
+    Test the use-case where the inventory host names are resolved before the
+    dispatch; ensure each name is resolved once, the lookups in progress are
+    bounded, and the records with an address are not resolved.
+    """
+    resolver.load_dns_cache(tmpdir, DNSSpec(max_inflight=4))
+
+    recs = [dict(host=f"switch-{i % 20}") for i in range(40)]
+    recs.append(dict(host="switch-99", ipaddr="192.168.1.1"))
+    recs.append(dict(host="192.168.1.2"))
+    recs.append(dict(host="bad-1"))
+
+    run(resolver.resolve_inventory(recs))
+
+    assert sorted(fake_getaddrinfo.lookups) == sorted(
+        [f"switch-{i}" for i in range(20)] + ["bad-1"]
+    )
+    assert fake_getaddrinfo.peak_inflight <= 4
+
+    assert resolver.get_address(recs[5]) == "10.0.0.5"
+    assert resolver.get_address(recs[40]) == "192.168.1.1"
+    assert resolver.get_address(recs[41]) == "192.168.1.2"
+    assert resolver.get_address(recs[42]) == "bad-1"
+
+    # the cached names, including the name that could not be resolved, are
+    # not resolved again.
+
+    fake_getaddrinfo.lookups.clear()
+    run(resolver.resolve_inventory(recs))
+    run(resolver.resolve_host(recs[0]))
+    run(resolver.resolve_host(recs[42]))
+    assert fake_getaddrinfo.lookups == []
+    assert resolver.get_dns_cache()["bad-1"]["addr"] is None
+
+
+def test_resolver_pass_ttl(tmpdir, fake_getaddrinfo, monkeypatch):
+    """
+    Test the use-case where the cached address expires after the TTL, and
+    where the lookups of the same name in progress are shared.
+    """
+    resolver.load_dns_cache(tmpdir, DNSSpec(ttl=60))
+    rec = dict(host="switch-1")
+
+    async def resolve_many():
+        await asyncio.gather(*(resolver.resolve_host(rec) for _ in range(5)))
+
+    run(resolve_many())
+    assert fake_getaddrinfo.lookups == ["switch-1"]
+    assert resolver.get_address(rec) == "10.0.0.1"
+
+    now = time.time() + 61
+    monkeypatch.setattr(resolver.time, "time", lambda: now)
+    assert resolver.get_address(rec) == "switch-1"
+
+
+def test_resolver_pass_resolve_host(tmpdir, fake_getaddrinfo):
+    """
+    Test the use-case where the host names are resolved as the records are
+    read; ensure the lookups in progress are bounded, the time waiting for a
+    lookup slot is not counted in the timeout, and a lookup that times out is
+    not cached.
+    """
+    resolver.load_dns_cache(tmpdir, DNSSpec(max_inflight=2, timeout=0.1))
+    recs = [dict(host=f"switch-{i}") for i in range(40)]
+
+    async def resolve_all():
+        await asyncio.gather(*(resolver.resolve_host(rec) for rec in recs))
+
+    run(resolve_all())
+    assert fake_getaddrinfo.peak_inflight <= 2
+    assert all(resolver.get_address(rec) != rec["host"] for rec in recs)
+
+    rec = dict(host="slow-1")
+    run(resolver.resolve_host(rec))
+    assert resolver.get_address(rec) == "slow-1"
+    assert "slow-1" not in resolver.get_dns_cache()
+
+    run(resolver.resolve_host(rec))
+    assert fake_getaddrinfo.lookups.count("slow-1") == 2
+
+
+def test_resolver_pass_unpinned(tmpdir, fake_getaddrinfo, monkeypatch):
+    """
+    Test the use-case where a name has several addresses, and where a host is
+    reached through a jump host; ensure the host name is used to connect so
+    that it is resolved when connecting, or by the jump host.
+    """
+    monkeypatch.setattr(
+        jumphosts, "get_jumphost", lambda rec: rec["host"].startswith("remote")
+    )
+    resolver.load_dns_cache(tmpdir, DNSSpec())
+
+    recs = [dict(host="multi-1"), dict(host="remote-2"), dict(host="switch-3")]
+    run(resolver.resolve_inventory(recs))
+    run(resolver.resolve_host(recs[1]))
+
+    assert sorted(fake_getaddrinfo.lookups) == ["multi-1", "switch-3"]
+    assert resolver.get_address(recs[0]) == "multi-1"
+    assert resolver.get_address(recs[1]) == "remote-2"
+    assert resolver.get_address(recs[2]) == "10.0.0.3"
+
+
+def test_resolver_pass_persist(tmpdir, fake_getaddrinfo):
+    """
+    Test the use-case where the cache is persisted in the state directory,
+    and where it is not.
+    """
+    rec = dict(host="switch-1")
+    resolver.load_dns_cache(tmpdir, DNSSpec())
+    run(resolver.resolve_host(rec))
+    resolver.save_dns_cache()
+    assert not tmpdir.join(resolver.DNS_CACHE_FILENAME).exists()
+
+    resolver.load_dns_cache(tmpdir, DNSSpec(persist=True))
+    assert resolver.get_address(rec) == "switch-1"
+    run(resolver.resolve_host(rec))
+    resolver.save_dns_cache()
+
+    resolver.load_dns_cache(tmpdir, DNSSpec(persist=True))
+    assert resolver.get_address(rec) == "10.0.0.1"
+    assert fake_getaddrinfo.lookups == ["switch-1", "switch-1"]
+
+
+def test_resolver_pass_connector(tmpdir, netcfgbu_envars, fake_getaddrinfo):
+    """
+    Test the use-case where the connector connects to the cached address of
+    the host name.
+    """
+    app_cfg = config.load()
+    resolver.load_dns_cache(tmpdir, app_cfg.dns)
+
+    rec = dict(host="switch-7", os_name="eos")
+    conn = BasicSSHConnector(rec, OSNameSpec(), app_cfg)
+    assert conn.conn_args["host"] == "switch-7"
+
+    run(resolver.resolve_host(rec))
+    conn = BasicSSHConnector(rec, OSNameSpec(), app_cfg)
+    assert conn.conn_args["host"] == "10.0.0.7"
+    assert conn.name == "switch-7"
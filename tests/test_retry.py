@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest  # noqa
+
+from netcfgbu.config_model import RetrySpec
+from netcfgbu.retry import RetryPolicy, make_retry_fn
+from netcfgbu import config
+
+
+def test_retry_pass_policy():
+    policy = RetryPolicy(
+        RetrySpec(max_attempts=4, backoff_base=1, backoff_max=3, jitter=0)
+    )
+
+    assert [policy.delay(attempt) for attempt in range(1, 5)] == [1, 2, 3, 3]
+
+    assert policy.retry_delay(asyncio.TimeoutError(), 1) == 1
+    assert policy.retry_delay(ConnectionRefusedError(), 3) == 3
+    assert policy.retry_delay(ConnectionRefusedError(), 4) is None
+    assert policy.retry_delay(RuntimeError(), 1) is None
+    assert policy.retry_delay(None, 1) is None
+
+
+def test_retry_pass_jitter():
+    policy = RetryPolicy(RetrySpec(backoff_base=10, jitter=0.5))
+    delays = [policy.delay(1) for _ in range(100)]
+    assert all(5 <= delay <= 10 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_retry_pass_baseclass():
+    policy = RetryPolicy(RetrySpec(max_attempts=2, retry_on=["OSError"]))
+    assert policy.retry_delay(ConnectionResetError(), 1) is not None
+
+
+def test_retry_pass_retry_fn(netcfgbu_envars, request):
+    app_cfg = config.load()
+    assert make_retry_fn(app_cfg) is None
+
+    abs_filepath = request.fspath.dirname + "/files/test-config-retry.toml"
+    app_cfg = config.load(filepath=abs_filepath)
+    retry_fn = make_retry_fn(app_cfg)
+
+    loop = asyncio.new_event_loop()
+    failed = loop.create_future()
+    failed.set_exception(asyncio.TimeoutError())
+
+    # the backup_config coroutine returns the exception
+
+    returned = loop.create_future()
+    returned.set_result(asyncio.TimeoutError())
+
+    ok = loop.create_future()
+    ok.set_result(True)
+    loop.close()
+
+    eos_rec = dict(host="switch1", os_name="eos")
+    ios_rec = dict(host="switch2", os_name="ios")
+
+    assert retry_fn(eos_rec, failed, 2) is not None
+    assert retry_fn(eos_rec, returned, 2) is not None
+    assert retry_fn(eos_rec, failed, 3) is None
+    assert retry_fn(eos_rec, ok, 1) is None
+
+    assert retry_fn(ios_rec, failed, 1) is None
+    assert retry_fn(ios_rec, returned, 1) is None
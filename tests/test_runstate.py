@@ -0,0 +1,95 @@
+import pytest  # noqa
+
+from netcfgbu import config
+from netcfgbu.runstate import RunStateStore
+from netcfgbu.cli import backup
+from netcfgbu.cli.backup import select_inventory
+
+
+@pytest.fixture()
+def inventory_recs():
+    return [dict(host=f"switch{i}", os_name="eos") for i in range(5)]
+
+
+def test_runstate_pass_record(tmpdir, inventory_recs):
+    """
+    Test the use-case where the results of a run are recorded, the run is
+    interrupted, and then resumed; ensure only the hosts that did not succeed
+    are selected.
+    """
+    runs = RunStateStore(tmpdir)
+    run_id = runs.start_run("backup")
+
+    runs.record(inventory_recs[0], ok=True)
+    runs.record(inventory_recs[1], ok=False, reason="TIMEOUT")
+    runs.close()
+
+    runs = RunStateStore(tmpdir)
+    assert runs.last_run_id("backup") == run_id
+    assert runs.hosts(run_id, ok=True) == {"switch0"}
+    assert runs.hosts(run_id, ok=False) == {"switch1"}
+
+    selected = select_inventory(runs, inventory_recs, resume=run_id)
+    assert [rec["host"] for rec in selected] == [
+        "switch1",
+        "switch2",
+        "switch3",
+        "switch4",
+    ]
+
+    assert runs.start_run("backup", run_id=run_id) == run_id
+    runs.record(inventory_recs[1], ok=True)
+    runs.stop_run()
+    assert runs.hosts(run_id, ok=True) == {"switch0", "switch1"}
+    assert runs.hosts(run_id, ok=False) == set()
+
+
+def test_runstate_pass_only_failed(tmpdir, inventory_recs):
+    runs = RunStateStore(tmpdir)
+
+    first_id = runs.start_run("backup")
+    runs.record(inventory_recs[0], ok=False, reason="TIMEOUT")
+    runs.stop_run()
+
+    last_id = runs.start_run("backup")
+    assert last_id != first_id
+    runs.record(inventory_recs[0], ok=True)
+    runs.record(inventory_recs[3], ok=False, reason="ECONNREFUSED")
+    runs.stop_run()
+
+    selected = select_inventory(runs, inventory_recs, only_failed=True)
+    assert [rec["host"] for rec in selected] == ["switch3"]
+
+
+def test_runstate_fail_select(tmpdir, inventory_recs):
+    runs = RunStateStore(tmpdir)
+
+    with pytest.raises(ValueError) as excinfo:
+        select_inventory(runs, inventory_recs, only_failed=True)
+    assert "No previous backup run" in str(excinfo.value)
+
+    with pytest.raises(ValueError) as excinfo:
+        select_inventory(runs, inventory_recs, resume="nosuchrun")
+    assert "No backup run with ID" in str(excinfo.value)
+
+    with pytest.raises(ValueError):
+        select_inventory(runs, inventory_recs, resume="run", only_failed=True)
+
+
+def test_runstate_fail_backup_select(netcfgbu_envars, monkeypatch, tmpdir):
+    """
+    Test the use-case where the backup hosts cannot be selected; ensure the
+    run-state store is closed.
+    """
+    monkeypatch.setenv("NETCFGBU_STATEDIR", str(tmpdir))
+    monkeypatch.chdir(tmpdir)
+    app_cfg = config.load()
+
+    closed = list()
+    monkeypatch.setattr(RunStateStore, "close", lambda runs: closed.append(runs))
+
+    with pytest.raises(ValueError) as excinfo:
+        backup.exec_backup(app_cfg, [dict(host="switch1")], only_failed=True)
+
+    assert "No previous backup run" in str(excinfo.value)
+    assert len(closed) == 1
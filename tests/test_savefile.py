@@ -0,0 +1,179 @@
+from pathlib import Path
+
+import pytest  # noqa
+
+from netcfgbu import config_model
+from netcfgbu import linter
+from netcfgbu import savefile
+from netcfgbu.savefile import ConfigFileWriter
+
+
+def split_lines(content: bytes, lines_per_chunk: int):
+    """ returns the content in chunks of complete lines """
+    lines = content.splitlines(keepends=True)
+    return [
+        b"".join(lines[i : i + lines_per_chunk])
+        for i in range(0, len(lines), lines_per_chunk)
+    ]
+
+
+@pytest.fixture()
+def device_output(files_dir):
+    good_content = files_dir.joinpath("test-content-config.txt").read_text()
+    return (
+        "!Command: show running-config\r\n"
+        "!Time: Sat Jun 27 17:54:17 2020\r\n"
+        + good_content.replace("\n", "\r\n")
+        + "! end-test-marker\r\n"
+        + "! trailer\r\n"
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("lines_per_chunk", [1, 3, 1000])
+async def test_savefile_pass_lint(tmpdir, device_output, lines_per_chunk):
+    """
+    Test the use-case where the device output is written in chunks with a
+    linter; ensure the file content is the same as the lint_content result.
+    """
+    lint_spec = config_model.LinterSpec(
+        config_starts_after="!Time:", config_ends_at="! end-test-marker"
+    )
+
+    filepath = Path(tmpdir.join("switch1.cfg"))
+    writer = ConfigFileWriter(filepath, lint_spec=lint_spec)
+    await writer.open()
+    for chunk in split_lines(device_output.encode(), lines_per_chunk):
+        await writer.write(chunk)
+    await writer.close()
+
+    expected = linter.lint_content(device_output.replace("\r", ""), lint_spec)
+    assert filepath.read_text() == expected + "\n"
+    assert writer.linted is True
+    assert not writer.tmp_filepath.exists()
+
+
+@pytest.mark.asyncio
+async def test_savefile_pass_nolint(tmpdir, device_output):
+    """
+    Test the use-case where there is no linter, and the output starts with the
+    command echo that is skipped.
+    """
+    filepath = Path(tmpdir.join("switch1.cfg"))
+    writer = ConfigFileWriter(filepath, skip=len("show run\r\n"))
+    await writer.open()
+    await writer.write(b"show run\r\n" + device_output.encode())
+    await writer.close()
+
+    assert filepath.read_text() == device_output.replace("\r", "")
+    assert writer.linted is False
+
+
+@pytest.mark.asyncio
+async def test_savefile_pass_abort(tmpdir):
+    """
+    Test the use-case where the writer is aborted; ensure the existing file is
+    not changed and the temporary file is removed.
+    """
+    filepath = Path(tmpdir.join("switch1.cfg"))
+    filepath.write_text("original\n")
+
+    writer = ConfigFileWriter(filepath)
+    await writer.open()
+    await writer.write(b"partial content\n")
+    await writer.abort()
+
+    assert filepath.read_text() == "original\n"
+    assert not writer.tmp_filepath.exists()
+
+
+@pytest.mark.asyncio
+async def test_savefile_pass_concurrent(tmpdir):
+    """
+    Test the use-case where two writers save the same host at the same time;
+    ensure the temporary files do not collide, and the file is the content of
+    the last writer closed.
+    """
+    filepath = Path(tmpdir.join("switch1.cfg"))
+
+    writers = [ConfigFileWriter(filepath), ConfigFileWriter(filepath)]
+    assert writers[0].tmp_filepath != writers[1].tmp_filepath
+
+    for index, writer in enumerate(writers):
+        await writer.open()
+        await writer.write(f"content {index}\n".encode())
+
+    for writer in writers:
+        await writer.close()
+        assert not writer.tmp_filepath.exists()
+
+    assert filepath.read_text() == "content 1\n"
+
+
+async def save_content(filepath, content: bytes, lint_spec=None, lines_per_chunk=3):
+    writer = ConfigFileWriter(filepath, lint_spec=lint_spec)
+    await writer.open()
+    for chunk in split_lines(content, lines_per_chunk):
+        await writer.write(chunk)
+    return await writer.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("lines_per_chunk", [1, 3, 1000])
+async def test_savefile_pass_unchanged(tmpdir, device_output, lines_per_chunk):
+    """
+    Test the use-case where the same configuration is saved twice; ensure the
+    second save does not change the file, and that a changed configuration
+    replaces the file.
+    """
+    savefile.load_digests(tmpdir)
+    lint_spec = config_model.LinterSpec(
+        config_starts_after="!Time:", config_ends_at="! end-test-marker"
+    )
+    filepath = Path(tmpdir.join("switch1.cfg"))
+    content = device_output.encode()
+
+    status = await save_content(filepath, content, lint_spec, lines_per_chunk)
+    assert status == savefile.SAVE_NEW
+    mtime_ns = filepath.stat().st_mtime_ns
+
+    status = await save_content(filepath, content, lint_spec, lines_per_chunk)
+    assert status == savefile.SAVE_UNCHANGED
+    assert filepath.stat().st_mtime_ns == mtime_ns
+
+    # the trailer is not part of the linted content.
+
+    status = await save_content(
+        filepath, content.replace(b"! trailer", b"! other"), lint_spec, lines_per_chunk
+    )
+    assert status == savefile.SAVE_UNCHANGED
+
+    status = await save_content(
+        filepath, b"hostname new\r\n" + content, None, lines_per_chunk
+    )
+    assert status == savefile.SAVE_CHANGED
+    assert not list(Path(tmpdir).glob(".*.tmp"))
+
+
+@pytest.mark.asyncio
+async def test_savefile_pass_digests(tmpdir):
+    """
+    Test the use-case where the digests are saved and reloaded; ensure an
+    existing file without a stored digest, or changed since the digest was
+    stored, is compared by content.
+    """
+    filepath = Path(tmpdir.join("switch1.cfg"))
+    filepath.write_text("hostname switch1\n")
+
+    savefile.load_digests(tmpdir)
+    assert await save_content(filepath, b"hostname switch1") == savefile.SAVE_UNCHANGED
+    savefile.save_digests()
+    assert tmpdir.join(savefile.DIGESTS_FILENAME).exists()
+
+    savefile.load_digests(tmpdir)
+    status = await save_content(filepath, b"hostname switch1\n")
+    assert status == savefile.SAVE_UNCHANGED
+
+    filepath.write_text("hostname changed-by-user\n")
+    assert await save_content(filepath, b"hostname switch1\n") == savefile.SAVE_CHANGED
+    assert filepath.read_text() == "hostname switch1\n"
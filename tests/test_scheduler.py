@@ -0,0 +1,290 @@
+import asyncio
+import time
+from collections import Counter
+
+import pytest  # noqa
+
+from netcfgbu.scheduler import (
+    Scheduler,
+    GroupLimit,
+    DeadlineExpired,
+    make_group_limits,
+)
+from netcfgbu.config_model import ConcurrencySpec
+
+
+@pytest.mark.asyncio
+async def test_scheduler_pass_bounded():
+    """
+    Test the use-case where more records are provided than workers; ensure
+    that the number of concurrent work items never exceeds the worker count.
+    """
+    in_flight = 0
+    max_in_flight = 0
+
+    async def work(rec):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(in_flight, max_in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        return rec["host"]
+
+    recs = [dict(host=f"switch{i}") for i in range(50)]
+    sched = Scheduler(work_fn=work, max_workers=4)
+
+    results = [(rec, done.result()) async for rec, done in sched.run(recs)]
+
+    assert len(results) == 50
+    assert all(rec["host"] == res for rec, res in results)
+    assert max_in_flight == 4
+
+
+@pytest.mark.asyncio
+async def test_scheduler_pass_lazy():
+    """
+    Test the use-case where the records are provided by a generator; ensure
+    that records are only pulled from the source when a worker is available.
+    """
+    pulled = 0
+
+    def gen_recs():
+        nonlocal pulled
+        for i in range(10):
+            pulled += 1
+            yield dict(host=f"switch{i}")
+
+    async def work(rec):
+        await asyncio.sleep(0)
+        return True
+
+    sched = Scheduler(work_fn=work, max_workers=2)
+    agen = sched.run(gen_recs())
+    await agen.__anext__()
+    assert pulled <= 4
+    await agen.aclose()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_pass_async_records():
+    """
+    Test the use-case where the records are provided by an asynchronous
+    generator, with and without group limits; ensure all of the records are
+    processed, and the generator is read by one worker at a time.
+    """
+    reading = 0
+
+    async def gen_recs():
+        nonlocal reading
+        for i in range(20):
+            reading += 1
+            assert reading == 1
+            await asyncio.sleep(0)
+            reading -= 1
+            yield dict(host=f"switch{i}", site=f"site{i % 2}")
+
+    async def work(rec):
+        await asyncio.sleep(0)
+        return rec["host"]
+
+    for groups in (None, [GroupLimit("site", lambda rec: rec["site"], limit=1)]):
+        sched = Scheduler(work_fn=work, max_workers=4, groups=groups)
+        results = [done.result() async for _, done in sched.run(gen_recs())]
+        assert sorted(results) == sorted(f"switch{i}" for i in range(20))
+
+
+@pytest.mark.asyncio
+async def test_scheduler_pass_exception():
+    """
+    Test the use-case where the work function raises an exception; the
+    exception is captured in the completed future for that record.
+    """
+
+    async def work(rec):
+        raise asyncio.TimeoutError()
+
+    sched = Scheduler(work_fn=work, max_workers=2)
+
+    async for rec, done in sched.run([dict(host="switch1")]):
+        with pytest.raises(asyncio.TimeoutError):
+            done.result()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_fail_records():
+    """
+    Test the use-case where the records source raises an exception; ensure
+    the exception is raised to the Caller.
+    """
+
+    def gen_recs():
+        yield dict(host="switch1")
+        raise ValueError("bad inventory")
+
+    async def work(rec):
+        return True
+
+    sched = Scheduler(work_fn=work, max_workers=1)
+
+    with pytest.raises(ValueError):
+        async for _ in sched.run(gen_recs()):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_scheduler_pass_groups():
+    """
+    Test the use-case where a per-group limit is defined; ensure that the
+    group limit is never exceeded, that records in other groups are processed
+    while the group is at its limit, and that the per-value limits are used.
+    """
+    in_flight = Counter()
+    max_in_flight = Counter()
+
+    async def work(rec):
+        in_flight[rec["site"]] += 1
+        max_in_flight[rec["site"]] = max(
+            in_flight[rec["site"]], max_in_flight[rec["site"]]
+        )
+        await asyncio.sleep(0)
+        in_flight[rec["site"]] -= 1
+        return True
+
+    # the inventory is ordered so that all of the "small" site records are
+    # first.
+
+    recs = [dict(host=f"small{i}", site="small") for i in range(20)]
+    recs += [dict(host=f"big{i}", site="big") for i in range(20)]
+    recs += [dict(host=f"nosite{i}", site="") for i in range(5)]
+
+    groups = [
+        GroupLimit(
+            name="site",
+            key_fn=lambda rec: rec["site"] or None,
+            limit=5,
+            limits=dict(small=1),
+        )
+    ]
+
+    sched = Scheduler(work_fn=work, max_workers=8, groups=groups, max_parked=100)
+    results = [rec async for rec, _ in sched.run(recs)]
+
+    assert len(results) == 45
+    assert max_in_flight["small"] == 1
+    assert max_in_flight["big"] == 5
+
+    # the big site records did not wait for all of the small site records
+
+    first_big = min(i for i, rec in enumerate(results) if rec["site"] == "big")
+    assert first_big < 10
+
+
+def test_scheduler_pass_make_group_limits():
+    spec = ConcurrencySpec(
+        groups=[dict(column="os_name", limit=2), dict(column="jumphost", limit=3)]
+    )
+    groups = make_group_limits(spec)
+    assert len(groups) == 2
+    assert groups[0].key(dict(os_name="eos")) == ("os_name", "eos")
+    assert groups[0].key(dict(os_name="")) is None
+    assert groups[1].key(dict(os_name="eos")) is None
+
+
+@pytest.mark.asyncio
+async def test_scheduler_pass_retry():
+    """
+    Test the use-case where records fail and are retried after a delay; ensure
+    only the final attempt is handed to the Caller, and that the workers
+    continue to process other records while the retries are delayed.
+    """
+    calls = Counter()
+    order = list()
+
+    async def work(rec):
+        calls[rec["host"]] += 1
+        order.append(rec["host"])
+        if rec["host"] == "flaky" and calls["flaky"] < 3:
+            raise ConnectionRefusedError()
+        if rec["host"] == "broken":
+            raise ConnectionRefusedError()
+        return True
+
+    def retry_fn(rec, done, attempt):
+        return 0.01 if done.exception() and attempt < 3 else None
+
+    recs = [dict(host="flaky"), dict(host="broken")] + [
+        dict(host=f"switch{i}") for i in range(5)
+    ]
+    sched = Scheduler(work_fn=work, max_workers=1, retry_fn=retry_fn)
+
+    results = {rec["host"]: done async for rec, done in sched.run(recs)}
+
+    assert len(results) == 7
+    assert results["flaky"].result() is True
+    with pytest.raises(ConnectionRefusedError):
+        results["broken"].result()
+
+    assert calls["flaky"] == 3
+    assert calls["broken"] == 3
+    assert order.index("switch0") < order.index("flaky", 1)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_pass_deadline():
+    """
+    Test the use-case where the run deadline expires; ensure the records in
+    progress are cancelled and handed to the Caller as failed, and the records
+    not started are skipped.
+    """
+    started = list()
+    cancelled = list()
+
+    async def work(rec):
+        started.append(rec["host"])
+        try:
+            await asyncio.sleep(rec["delay"])
+        except asyncio.CancelledError:
+            cancelled.append(rec["host"])
+            raise
+        return True
+
+    recs = [dict(host="fast", delay=0), dict(host="slow", delay=10)] + [
+        dict(host=f"switch{i}", delay=10) for i in range(5)
+    ]
+    sched = Scheduler(work_fn=work, max_workers=2, deadline=time.time() + 0.1)
+
+    results = {rec["host"]: done async for rec, done in sched.run(recs)}
+
+    assert sched.expired
+    assert results["fast"].result() is True
+    assert set(results) == {"fast", "slow", "switch0"}
+    assert set(cancelled) == {"slow", "switch0"}
+    with pytest.raises(DeadlineExpired):
+        results["slow"].result()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_pass_deadline_retry():
+    """
+    Test the use-case where the deadline expires while a record is waiting to
+    retry; ensure the record is handed to the Caller as failed and is not
+    retried.
+    """
+    calls = Counter()
+
+    async def work(rec):
+        calls[rec["host"]] += 1
+        raise ConnectionRefusedError()
+
+    def retry_fn(rec, done, attempt):
+        return 10
+
+    sched = Scheduler(
+        work_fn=work, max_workers=1, retry_fn=retry_fn, deadline=time.time() + 0.05
+    )
+    results = [(rec, done) async for rec, done in sched.run([dict(host="flaky")])]
+
+    assert calls["flaky"] == 1
+    assert len(results) == 1
+    with pytest.raises(DeadlineExpired):
+        results[0][1].result()
@@ -0,0 +1,114 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import asyncssh
+import pytest  # noqa
+
+from netcfgbu import config, jumphosts
+from netcfgbu.config_model import OSNameSpec, TimeoutsSpec
+from netcfgbu.os_specs import make_host_connector
+from netcfgbu.simulator import DeviceFarm, DeviceSpec, parse_size
+
+
+def test_simulator_pass_parse_size():
+    assert parse_size("512") == 512
+    assert parse_size("64k") == 64 * 1024
+    assert parse_size("10M") == 10 * 1024 * 1024
+    assert parse_size("1.5kb") == 1536
+
+    with pytest.raises(ValueError):
+        parse_size("ten")
+
+
+DEVICES = [
+    DeviceSpec(host="sim1", address="127.0.0.1", os_name="ios", config_size=50000),
+    DeviceSpec(host="sim2", address="127.0.0.1", os_name="eos"),
+    DeviceSpec(host="sim3", address="127.0.0.1", os_name="ios", auth_fail=True),
+    DeviceSpec(host="sim4", address="127.0.0.1", os_name="ios", hang=True),
+]
+
+
+@asynccontextmanager
+async def run_farm():
+    # each device is on its own port, using the same address, so that the
+    # test does not depend on the loopback addresses.
+
+    farms = [DeviceFarm([device], port=0) for device in DEVICES]
+    for dev_farm in farms:
+        await dev_farm.start()
+
+    try:
+        yield {dev_farm.devices[0].host: dev_farm for dev_farm in farms}
+    finally:
+        for dev_farm in farms:
+            await dev_farm.stop()
+
+
+@pytest.fixture()
+def app_cfg(netcfgbu_envars, monkeypatch, tmpdir):
+    monkeypatch.setenv("NETCFGBU_DEFAULT_USERNAME", "netcfgbu")
+    monkeypatch.setenv("NETCFGBU_DEFAULT_PASSWORD", "netcfgbu")
+    monkeypatch.setenv("NETCFGBU_CONFIGSDIR", str(tmpdir))
+    monkeypatch.setattr(jumphosts.JumpHost, "available", [])
+    app_cfg = config.load()
+    app_cfg.os_name = dict(
+        ios=OSNameSpec(
+            pre_get_config="terminal length 0", timeouts=TimeoutsSpec(prompt=0.5)
+        )
+    )
+    return app_cfg
+
+
+def make_connector(app_cfg, dev_farm):
+    device = dev_farm.devices[0]
+    app_cfg.ssh_configs = dict(port=dev_farm.port)
+    rec = dict(host=device.host, ipaddr=device.address, os_name=device.os_name)
+    return make_host_connector(rec, app_cfg)
+
+
+@pytest.mark.asyncio
+async def test_simulator_pass_backup(app_cfg, tmpdir):
+    """
+    Test the use-case where the configuration is backed up from the simulated
+    devices, using the interactive shell and the command request; ensure the
+    configuration file is saved with the device content.
+    """
+    async with run_farm() as farm:
+        for host in ("sim1", "sim2"):
+            conn = make_connector(app_cfg, farm[host])
+            assert await conn.backup_config() is True
+
+            content = tmpdir.join(f"{host}.cfg").read()
+            assert f"hostname {host}\n" in content
+            assert "interface Ethernet0\n" in content
+            assert conn.timer.config_bytes > 0
+
+    assert len(tmpdir.join("sim1.cfg").read()) > 45000
+    assert farm["sim1"].stats.config_bytes > 50000
+
+
+@pytest.mark.asyncio
+async def test_simulator_fail_auth(app_cfg):
+    """
+    Test the use-case where the device rejects the credentials; ensure the
+    login fails with permission denied.
+    """
+    async with run_farm() as farm:
+        conn = make_connector(app_cfg, farm["sim3"])
+        with pytest.raises(asyncssh.PermissionDenied):
+            await conn.backup_config()
+
+        assert farm["sim3"].stats.auth_failures == 1
+
+
+@pytest.mark.asyncio
+async def test_simulator_fail_hang(app_cfg):
+    """
+    Test the use-case where the device hangs after login; ensure the prompt
+    timeout expires.
+    """
+    async with run_farm() as farm:
+        conn = make_connector(app_cfg, farm["sim4"])
+        res = await conn.backup_config()
+        assert isinstance(res, asyncio.TimeoutError)
+        assert res.args[0] == "Timeout awaiting prompt"
@@ -0,0 +1,106 @@
+import json
+
+import pytest  # noqa
+
+from netcfgbu.timing import (
+    PhaseTimer,
+    TimingStats,
+    TimingSSHClient,
+    DurationHistogram,
+    percentile,
+)
+
+
+def test_timing_pass_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([2.0], 99) == 2.0
+    assert percentile([], 50) == 0.0
+
+
+def test_timing_pass_histogram():
+    """
+    Test the use-case where many durations are counted; ensure the memory is
+    bounded by the buckets, and the percentiles are within the bucket error,
+    including for merged histograms.
+    """
+    hist, other = DurationHistogram(), DurationHistogram()
+    for index in range(1, 10001):
+        (hist if index % 2 else other).add(index / 1000)
+
+    hist.merge(other)
+    assert hist.count == 10000
+    assert len(hist.buckets) < 300
+    assert hist.min == 0.001
+    assert hist.max == 10.0
+    assert hist.total == pytest.approx(50005)
+    for pct in (50, 95, 99):
+        assert hist.percentile(pct) == pytest.approx(pct / 10, rel=0.05)
+
+    assert DurationHistogram().percentile(50) == 0.0
+
+
+def test_timing_pass_ssh_client():
+    """
+    Test the use-case where a credential is rejected and the next is accepted;
+    ensure the connect, handshake, and each auth attempt are recorded.
+    """
+    timer = PhaseTimer()
+
+    client = TimingSSHClient(timer)
+    client.connection_made(None)
+    assert client.begin_auth("admin") is True
+    client.auth_failed()
+
+    client = TimingSSHClient(timer)
+    client.connection_made(None)
+    client.begin_auth("admin")
+    client.auth_completed()
+    client.auth_failed()
+
+    phases = [phase for phase, _ in timer.samples]
+    assert phases == ["connect", "handshake", "auth"] * 2
+
+
+def test_timing_pass_stats(tmpdir):
+    """
+    Test the use-case where the phase durations of several hosts are
+    aggregated; ensure the durations are grouped by os_name and jump host, and
+    can be saved as JSON.
+    """
+    stats = TimingStats()
+
+    for index in range(10):
+        timer = PhaseTimer()
+        timer.add("get_config", index + 1)
+        timer.add("connect", 0.5)
+        timer.config_bytes = 1000
+        stats.add_host(dict(host=f"switch{index}", os_name="eos"), timer)
+
+    stats.add_host(dict(host="switch10", os_name="eos"), None)
+
+    other = TimingStats()
+    timer = PhaseTimer()
+    with timer.phase("prompt"):
+        pass
+    other.add_host(dict(host="router1", os_name="ios"), timer)
+    stats.merge(other)
+
+    summary = stats.summary()
+    eos = summary["os_name"]["eos"]
+    assert list(eos) == ["connect", "get_config"]
+    assert eos["get_config"]["count"] == 10
+    assert eos["get_config"]["p50"] == pytest.approx(5, rel=0.05)
+    assert eos["get_config"]["p99"] == 10
+    assert eos["get_config"]["bytes"] == 10000
+    assert eos["get_config"]["bytes_per_sec"] == 10000 / 55
+    assert summary["jumphost"]["direct"]["get_config"]["count"] == 10
+    assert summary["os_name"]["ios"]["prompt"]["count"] == 1
+
+    json_file = tmpdir.join("timing.json")
+    stats.save_json(str(json_file))
+    assert json.loads(json_file.read()) == summary
+
+    assert len(stats.tabular_data()) == 3 * 2
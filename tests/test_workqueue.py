@@ -0,0 +1,239 @@
+import sqlite3
+import threading
+from unittest.mock import Mock
+
+import pytest  # noqa
+from click.testing import CliRunner
+
+from netcfgbu import config
+from netcfgbu import jumphosts
+from netcfgbu.workqueue import SQLiteWorkQueue, get_workqueue
+from netcfgbu.metrics import BackupMetrics
+from netcfgbu.timing import PhaseTimer
+from netcfgbu.cli import backup
+
+
+@pytest.fixture()
+def app_cfg(netcfgbu_envars, monkeypatch, tmpdir):
+    monkeypatch.setenv("NETCFGBU_STATEDIR", str(tmpdir))
+    monkeypatch.setenv("NETCFGBU_CONFIGSDIR", str(tmpdir))
+    return config.load()
+
+
+@pytest.fixture()
+def inventory_recs():
+    return [dict(host=f"switch{i}", os_name="eos") for i in range(5)]
+
+
+def test_workqueue_pass_claim(app_cfg, inventory_recs):
+    """
+    Test the use-case where two workers claim the records of a run; ensure a
+    record is claimed by only one worker, and that the results are reported
+    to the coordinator.
+    """
+    work_que = get_workqueue(app_cfg)
+    assert isinstance(work_que, SQLiteWorkQueue)
+    assert work_que.open_run_id() is None
+
+    work_que.publish("run1", inventory_recs)
+    assert work_que.open_run_id() == "run1"
+
+    claimed1 = work_que.claim("run1", "worker1", 3)
+    claimed2 = work_que.claim("run1", "worker2", 3)
+    assert len(claimed1) == 3
+    assert len(claimed2) == 2
+    assert work_que.claim("run1", "worker3", 3) == []
+    assert work_que.in_progress("run1") == 5
+
+    timing = dict(samples=[["get_config", 0.5]], config_bytes=100)
+
+    for item_id, rec in claimed1 + claimed2:
+        worker_id = "worker1" if (item_id, rec) in claimed1 else "worker2"
+        ok = rec["host"] != "switch0"
+        assert work_que.complete(
+            "run1",
+            worker_id,
+            item_id,
+            ok,
+            None if ok else "TIMEOUT",
+            not ok,
+            timing=timing if ok else None,
+        )
+
+    assert work_que.is_done("run1")
+    assert work_que.in_progress("run1") == 0
+
+    results = work_que.results("run1")
+    assert len(results) == 5
+    assert {res.rec["host"] for res in results if not res.ok} == {"switch0"}
+    assert {res.rec["host"] for res in results if res.timing == timing} == {
+        f"switch{i}" for i in range(1, 5)
+    }
+    assert work_que.results("run1", after_seq=results[-1].seq) == []
+
+
+def test_workqueue_pass_lease_expired(app_cfg, inventory_recs):
+    """
+    Test the use-case where a worker dies; ensure the records it claimed are
+    claimed by another worker once the lease expires, and that a late result
+    from the dead worker is ignored.
+    """
+    app_cfg.workqueue.lease_timeout = 1
+    work_que = get_workqueue(app_cfg)
+    work_que.publish("run1", inventory_recs[:2])
+
+    claimed = work_que.claim("run1", "worker1", 2)
+    assert work_que.claim("run1", "worker2", 2) == []
+
+    # expire the lease of the worker1 records
+
+    work_que._db.execute("UPDATE items SET lease_expires=0")
+
+    reclaimed = work_que.claim("run1", "worker2", 2)
+    assert [item_id for item_id, _ in reclaimed] == [item_id for item_id, _ in claimed]
+
+    item_id = claimed[0][0]
+    assert not work_que.complete("run1", "worker1", item_id, True)
+    assert work_que.complete("run1", "worker2", item_id, True)
+    assert not work_que.is_done("run1")
+
+    work_que.close_run("run1")
+    assert work_que.is_done("run1")
+    assert work_que.open_run_id() is None
+
+
+def test_workqueue_pass_complete_batch(app_cfg, inventory_recs):
+    """
+    Test the use-case where a worker completes a batch of records; ensure the
+    records still claimed by the worker are completed, and the others are
+    ignored.
+    """
+    work_que = get_workqueue(app_cfg)
+    work_que.publish("run1", inventory_recs[:3])
+    claimed = work_que.claim("run1", "worker1", 3)
+    work_que._db.execute("UPDATE items SET worker_id='worker2' WHERE item_id=0")
+
+    assert work_que.complete_batch(
+        "run1",
+        "worker1",
+        [dict(item_id=item_id, ok=True, attempts=2) for item_id, _ in claimed],
+    ) == [False, True, True]
+
+    results = work_que.results("run1")
+    assert [res.rec["host"] for res in results] == ["switch1", "switch2"]
+    assert all(res.ok and res.attempts == 2 for res in results)
+
+
+def test_workqueue_pass_worker(app_cfg, inventory_recs, monkeypatch):
+    """
+    Test the use-case where a worker process completes a published run, and
+    the coordinator collects the results and the metrics.
+    """
+
+    class FakeConnector(object):
+        def __init__(self, rec):
+            self.rec = rec
+            self.save_status = None
+            self.timer = PhaseTimer()
+
+        async def backup_config(self):
+            if self.rec["host"] == "switch0":
+                raise ConnectionRefusedError()
+
+            self.timer.add("get_config", 0.5)
+            self.timer.config_bytes = 100
+            self.save_status = "unchanged"
+            return True
+
+    monkeypatch.setattr(
+        backup, "make_host_connector", lambda rec, _app_cfg: FakeConnector(rec)
+    )
+
+    app_cfg.workqueue.poll_interval = 0.01
+    results = list()
+    metrics = BackupMetrics()
+
+    coordinator = threading.Thread(
+        target=backup.exec_backup_coordinator,
+        args=(app_cfg, inventory_recs, "run1"),
+        kwargs=dict(on_result=lambda *result: results.append(result), metrics=metrics),
+    )
+    coordinator.start()
+    backup.exec_backup_worker(app_cfg)
+    coordinator.join(timeout=10)
+
+    assert not coordinator.is_alive()
+    assert len(results) == 5
+    by_host = {rec["host"]: res for rec, res, *_ in results}
+    assert by_host["switch1"] is True
+    assert by_host["switch0"].startswith("ConnectionRefusedError")
+    assert get_workqueue(app_cfg).open_run_id() is None
+
+    assert metrics.in_flight == 0
+    assert metrics.config_bytes == 400
+    assert sum(metrics.histograms[("get_config", "eos")][:-1]) == 4
+
+
+def test_workqueue_pass_journal(app_cfg):
+    """
+    Test the use-case where the work queue file is on shared storage; ensure
+    the rollback journal is used rather than WAL, including for a file that
+    was created in WAL mode.
+    """
+    filepath = app_cfg.defaults.state_dir / "workqueue.db"
+    db = sqlite3.connect(str(filepath))
+    db.execute("PRAGMA journal_mode=WAL")
+    db.close()
+
+    work_que = get_workqueue(app_cfg)
+    mode = work_que._db.execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "delete"
+    work_que.close()
+
+    # a file created before the results timing column is updated.
+
+    db = sqlite3.connect(str(filepath))
+    db.execute("DROP TABLE results")
+    db.execute(
+        "CREATE TABLE results (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "run_id TEXT NOT NULL, item_id INTEGER NOT NULL, ok INTEGER NOT NULL, "
+        "reason TEXT, raised INTEGER NOT NULL, attempts INTEGER NOT NULL, "
+        "save_status TEXT, worker_id TEXT NOT NULL)"
+    )
+    db.close()
+
+    work_que = get_workqueue(app_cfg)
+    work_que.publish("run1", [dict(host="switch1")])
+    ((item_id, _),) = work_que.claim("run1", "worker1", 1)
+    assert work_que.complete("run1", "worker1", item_id, True, timing=dict(x=1))
+    assert work_que.results("run1")[0].timing == dict(x=1)
+    work_que.close()
+
+
+def test_workqueue_pass_cli_worker(netcfgbu_envars, tmpdir, monkeypatch):
+    """
+    Test the use-case where a worker runs on a collector that does not have
+    the inventory file; ensure the worker is started, and uses all of the jump
+    hosts since the records are not known.
+    """
+    monkeypatch.setenv("NETCFGBU_INVENTORY", str(tmpdir.join("nosuchfile.csv")))
+    monkeypatch.setenv("NETCFGBU_CONFIG", str(tmpdir.join("netcfgbu.toml")))
+    tmpdir.join("netcfgbu.toml").write(
+        '[[jumphost]]\nproxy = "jh1"\ninclude = ["os_name=eos"]\n'
+    )
+
+    mock_worker = Mock()
+    monkeypatch.setattr(backup, "exec_backup_worker", mock_worker)
+
+    runner = CliRunner()
+    res = runner.invoke(backup.cli_backup, obj={}, args=["--worker"])
+    assert res.exit_code == 0, res.output
+    assert mock_worker.called
+    assert [jh.name for jh in jumphosts.JumpHost.available] == ["jh1"]
+    assert jumphosts.JumpHost.available[0].filter(dict(os_name="eos"))
+
+    res = runner.invoke(backup.cli_backup, obj={})
+    assert res.exit_code != 0
+    assert "Inventory file does not exist" in res.output
+
+    jumphosts.JumpHost.available = []